@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from app.shared.metrics import CONTENT_TYPE, get_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text exposition of this process's in-memory metrics (no DB queries).
+    """
+    return Response(content=get_metrics().render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
+from app.shared.dependencies import require_admin
+from app.shared.profiling import capture_profile, set_spans_enabled, spans_enabled
+from app.domain.exceptions.profiler_busy import ProfilerBusy
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = 10, mode: str = "cpu", limit: int = 30):
+    """
+    Profile the API process for `seconds` (capped by PROFILE_MAX_SECONDS) and return
+    a cProfile ("cpu") or tracemalloc ("memory") report plus the stage spans
+    recorded meanwhile. The worker serves the same report on its metrics port
+    at /debug/profile.
+    """
+    try:
+        return await capture_profile(seconds, mode, limit)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/tracing")
+async def get_tracing():
+    """
+    Whether stage spans are recorded into guesty_span_seconds.
+    """
+    return {"enabled": spans_enabled()}
+
+@router.post("/tracing")
+async def set_tracing(enabled: bool):
+    """
+    Turn stage spans on or off for this process until restart (TRACE_SPANS_ENABLED sets the default).
+    """
+    set_spans_enabled(enabled)
+    return {"enabled": spans_enabled()}
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+from typing import List
+from fastapi import APIRouter, HTTPException, Depends
+from api.v1.schemas.guesty_schema import BackfillJob, CreateBackfillJobRequest
+from app.shared.dependencies import get_calendar_backfill_service
+from app.application.calendar_backfill_service import CalendarBackfillService
+
+router = APIRouter()
+
+@router.post("/", response_model=BackfillJob, status_code=202)
+async def create_backfill_job(
+    request: CreateBackfillJobRequest,
+    service: CalendarBackfillService = Depends(get_calendar_backfill_service),
+):
+    """
+    Start backfilling the queue for a set of listings (all mapped listings by default)
+    over a date horizon. The job runs in the background; poll it for progress.
+    """
+    start_date = request.start_date or date.today().isoformat()
+    try:
+        end_date = request.end_date or (date.fromisoformat(start_date) + timedelta(days=request.horizon_days)).isoformat()
+        return await service.create_job(start_date, end_date, request.listing_ids, request.is_simple)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid backfill range: {str(e)}")
+
+@router.get("/", response_model=List[BackfillJob])
+async def list_backfill_jobs(
+    limit: int = 20,
+    service: CalendarBackfillService = Depends(get_calendar_backfill_service),
+):
+    """
+    Most recent backfill jobs first.
+    """
+    return await service.list_jobs(limit)
+
+@router.get("/{job_id}", response_model=BackfillJob)
+async def get_backfill_job(
+    job_id: int,
+    service: CalendarBackfillService = Depends(get_calendar_backfill_service),
+):
+    """
+    Progress, checkpoint and throughput of a backfill job.
+    """
+    job = await service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return job
+
+@router.post("/{job_id}/resume", response_model=BackfillJob, status_code=202)
+async def resume_backfill_job(
+    job_id: int,
+    service: CalendarBackfillService = Depends(get_calendar_backfill_service),
+):
+    """
+    Continue an interrupted or failed job; only unfinished chunks are fetched again.
+    """
+    job = await service.resume(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return job
+
+@router.post("/{job_id}/cancel", response_model=BackfillJob)
+async def cancel_backfill_job(
+    job_id: int,
+    service: CalendarBackfillService = Depends(get_calendar_backfill_service),
+):
+    """
+    Stop a running job. It can still be resumed later.
+    """
+    job = await service.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return job
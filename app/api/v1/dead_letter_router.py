@@ -0,0 +1,29 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends
+from api.v1.schemas.guesty_schema import DeadLetterRow, RequeueDeadLettersRequest, RequeueDeadLettersResult
+from app.shared.dependencies import get_dead_letter_service
+from app.application.dead_letter_service import DeadLetterService
+
+router = APIRouter()
+
+@router.get("/", response_model=List[DeadLetterRow])
+async def list_dead_letters(
+    limit: int = 100,
+    listing_id: Optional[str] = None,
+    service: DeadLetterService = Depends(get_dead_letter_service),
+):
+    """
+    Calendar days that Booking Experts rejected QUEUE_MAX_ATTEMPTS times, most recent first, with the last error.
+    """
+    return await service.list_dead_letters(limit, listing_id)
+
+@router.post("/requeue", response_model=RequeueDeadLettersResult)
+async def requeue_dead_letters(
+    request: RequeueDeadLettersRequest,
+    service: DeadLetterService = Depends(get_dead_letter_service),
+):
+    """
+    Send dead-lettered days again (e.g. after fixing a mapping). Without `ids`, every
+    dead-lettered day is requeued, or every day of `listing_id` when given.
+    """
+    return await service.requeue(request.ids, request.listing_id)
@@ -1,19 +1,53 @@
 from api.v1.schemas.guesty_schema import ListingCalendarUpdatedResponse, WorkerStatusSummary
-from fastapi import APIRouter
-from app.application.enqueue_calendar_prices_service import EnqueueCalendarPricesService
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from application.retrieve_calendar_prices import RetrieveCalendarPrices
 from fastapi import Depends
-from app.shared.dependencies import get_enqueue_calendar_prices_service, get_retrieve_calendar_prices, get_worker_status_service
+from app.shared.dependencies import get_calendar_ingestion_buffer, get_retrieve_calendar_prices, get_worker_status_service
+from app.application.calendar_ingestion_buffer import CalendarIngestionBuffer
+from app.domain.exceptions.ingestion_buffer_failing import IngestionBufferFailing
+from app.domain.exceptions.ingestion_buffer_full import IngestionBufferFull
 from app.application.worker_status_service import WorkerStatusService
+from app.shared.calendar_rows import rows_from_json, rows_from_ndjson
 
 router = APIRouter()
 
-@router.post("/listing-calendar-update")
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+@router.post(
+    "/listing-calendar-update",
+    status_code=202,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": ListingCalendarUpdatedResponse.model_json_schema()},
+                "application/x-ndjson": {"schema": {"type": "string", "description": "One calendar day object per line."}},
+            },
+        }
+    },
+)
 async def update_calendar_data(
-    data: ListingCalendarUpdatedResponse,
-    service: EnqueueCalendarPricesService = Depends(get_enqueue_calendar_prices_service),
+    request: Request,
+    buffer: CalendarIngestionBuffer = Depends(get_calendar_ingestion_buffer),
 ):
-    await service.enqueue(data.calendar)
+    """
+    Accepts Guesty's `listing.calendar.updated` payload, or an NDJSON body with one day per line.
+    Days are validated straight into queue rows; NDJSON is validated as it streams in and
+    queued only once every line is valid, so a rejected request has queued nothing.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        if content_type in NDJSON_MEDIA_TYPES:
+            await buffer.submit(await rows_from_ndjson(request.stream()))
+        else:
+            await buffer.submit(rows_from_json(await request.body()))
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+    except (IngestionBufferFull, IngestionBufferFailing) as e:
+        # Guesty retries failed deliveries; ask it to back off instead of queueing unbounded.
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     return {"status": "Calendar queued"}  # explicit return helps tests
 
 @router.get("/retrieve-calendar-prices")
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
+from typing_extensions import TypedDict
 
 class RegisterWebhookRequest(BaseModel):
     target_url: str
@@ -16,6 +17,17 @@ class ListingCalendarUpdatedResponse(BaseModel):
     calendar: list[Day]
     event: str = "listing.calendar.updated"
 
+class DayRow(TypedDict):
+    # Same fields as Day, validated into a plain dict (no model instance per day).
+    date: str
+    listingId: str
+    price: float
+    status: str
+    currency: str
+
+class CalendarPayload(TypedDict):
+    calendar: List[DayRow]
+
 class PendingPriceSummary(BaseModel):
     date: str  # YYYY-MM-DD
     hour: int  # 0-23
@@ -25,6 +37,8 @@ class PendingPriceSummary(BaseModel):
 class WorkerStatusSummary(BaseModel):
     total_pending: int
     pending_by_date_hour: List[PendingPriceSummary]
+    suppressed_unchanged: Dict[str, int] = {}  # rows skipped because the price was already pushed, by stage
+    ingest_dropped: Dict[str, int] = {}  # rows dropped by the ingest filter in this process, by reason
 
 class ListingPriceListMapping(BaseModel):
     id: int
@@ -39,4 +53,50 @@ class CreateListingMappingRequest(BaseModel):
     booking_experts_price_list_id: str
 
 class UpdateListingMappingRequest(BaseModel):
-    booking_experts_price_list_id: str
\ No newline at end of file
+    booking_experts_price_list_id: str
+
+class CreateBackfillJobRequest(BaseModel):
+    listing_ids: Optional[List[str]] = None  # defaults to every actively mapped listing
+    start_date: Optional[str] = None  # YYYY-MM-DD, defaults to today
+    end_date: Optional[str] = None  # YYYY-MM-DD, defaults to start_date + horizon_days
+    horizon_days: int = 365
+    is_simple: bool = False
+
+class BackfillJob(BaseModel):
+    id: int
+    status: str
+    start_date: str
+    end_date: str
+    is_simple: bool
+    total_chunks: int
+    completed_chunks: int
+    failed_chunks: int
+    rows_fetched: int
+    rows_queued: int
+    progress: float  # completed_chunks / total_chunks
+    rows_per_sec: Optional[float] = None  # only while/after running in this process
+    last_error: Optional[str] = None
+    created_at: str
+    updated_at: str
+    finished_at: Optional[str] = None
+
+class DeadLetterRow(BaseModel):
+    id: int
+    listing_id: str
+    date: str
+    currency: str
+    price: float
+    status: Optional[str] = None
+    is_simple: bool
+    attempts: int
+    last_error: Optional[str] = None
+    queued_at: str
+    dead_at: str
+
+class RequeueDeadLettersRequest(BaseModel):
+    ids: Optional[List[int]] = None  # defaults to every dead-lettered row (of listing_id, when given)
+    listing_id: Optional[str] = None
+
+class RequeueDeadLettersResult(BaseModel):
+    requeued: int
+    superseded: int  # dropped instead: Guesty sent a newer price for the day after it was dead-lettered
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import asyncio
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Set
+from loguru import logger
+from app.application.enqueue_calendar_prices_service import EnqueueCalendarPricesService
+from app.application.ingest_filter import IngestFilter, get_ingest_filter
+from app.infrastructure.guesty.guesty_client import GuestyClient
+from app.infrastructure.repositories.backfill_repository import BackfillChunk, BackfillRepository
+from app.shared.calendar_rows import rows_from_python
+
+
+class CalendarBackfillService:
+    """
+    Re-seeds the queue for many listings at once. A job is split into chunks of
+    `listings_per_request` listings x `chunk_days` days; each chunk is one Guesty
+    calendar request (listingIds=a,b,c). Up to `concurrency` chunks are fetched at a
+    time and their days go straight into the queue. Finished chunks are checkpointed
+    in SQLite, so resume() only refetches what is missing.
+    """
+
+    def __init__(
+        self,
+        guesty_client_factory: Callable[[], GuestyClient],
+        enqueue_service: EnqueueCalendarPricesService,
+        repository: BackfillRepository,
+        ingest_filter: Optional[IngestFilter] = None,
+        concurrency: int = 4,
+        listings_per_request: int = 10,
+        chunk_days: int = 90,
+    ):
+        self.guesty_client_factory = guesty_client_factory
+        self.enqueue_service = enqueue_service
+        self.repository = repository
+        self.ingest_filter = ingest_filter or get_ingest_filter()
+        self.concurrency = concurrency
+        self.listings_per_request = listings_per_request
+        self.chunk_days = chunk_days
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._throughput: Dict[int, Dict[str, float]] = {}
+        # Jobs cancelled on request; _run records them as "cancelled" rather than "interrupted".
+        self._cancelled: Set[int] = set()
+
+    def plan_chunks(self, listing_ids: Sequence[str], start_date: str, end_date: str) -> List[BackfillChunk]:
+        """Listing batches x date ranges (end dates inclusive, as Guesty expects)."""
+        first, last = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        if first > last:
+            raise ValueError("start_date must not be after end_date")
+        ranges = []
+        while first <= last:
+            chunk_end = min(first + timedelta(days=self.chunk_days - 1), last)
+            ranges.append((first.isoformat(), chunk_end.isoformat()))
+            first = chunk_end + timedelta(days=1)
+        batches = [
+            listing_ids[i:i + self.listings_per_request]
+            for i in range(0, len(listing_ids), self.listings_per_request)
+        ]
+        return [(batch, start, end) for start, end in ranges for batch in batches]
+
+    async def create_job(
+        self,
+        start_date: str,
+        end_date: str,
+        listing_ids: Optional[List[str]] = None,
+        is_simple: bool = False,
+    ) -> Dict:
+        """Plan and start a job. Without listing_ids every actively mapped listing is backfilled."""
+        if not listing_ids:
+            listing_ids = sorted(await self.ingest_filter.reload())
+        chunks = self.plan_chunks(list(dict.fromkeys(listing_ids)), start_date, end_date)
+        job_id = await self.repository.create_job(start_date, end_date, is_simple, chunks)
+        logger.info(f"Backfill job {job_id}: {len(listing_ids)} listing(s), {len(chunks)} chunk(s).")
+        self._start(job_id)
+        return await self.get_job(job_id)
+
+    async def resume(self, job_id: int) -> Optional[Dict]:
+        """Restart a stopped job from its checkpoint (no-op while it is running)."""
+        job = await self.repository.get_job(job_id)
+        if not job:
+            return None
+        if job["completed_chunks"] < job["total_chunks"]:
+            self._start(job_id)
+        return await self.get_job(job_id)
+
+    async def cancel(self, job_id: int) -> Optional[Dict]:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return await self.get_job(job_id)
+
+    async def stop(self) -> None:
+        """Interrupt running jobs (on shutdown); they stay resumable."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get_job(self, job_id: int) -> Optional[Dict]:
+        """Persisted progress plus live throughput for a job running in this process."""
+        job = await self.repository.get_job(job_id)
+        if not job:
+            return None
+        job["progress"] = job["completed_chunks"] / job["total_chunks"] if job["total_chunks"] else 1.0
+        job["rows_per_sec"] = None
+        stats = self._throughput.get(job_id)
+        if stats:
+            elapsed = (stats.get("finished") or time.monotonic()) - stats["started"]
+            job["rows_per_sec"] = round(stats["rows"] / elapsed, 1) if elapsed > 0 else None
+        return job
+
+    async def list_jobs(self, limit: int = 20) -> List[Dict]:
+        return [await self.get_job(job["id"]) for job in await self.repository.list_jobs(limit)]
+
+    def _start(self, job_id: int) -> None:
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            return
+        self._tasks[job_id] = asyncio.create_task(self._run(job_id))
+
+    async def _run(self, job_id: int) -> None:
+        stats = self._throughput[job_id] = {"started": time.monotonic(), "rows": 0, "finished": 0.0}
+        try:
+            job = await self.repository.get_job(job_id)
+            chunks = await self.repository.get_pending_chunks(job_id)
+            await self.repository.set_job_status(job_id, "running")
+
+            pending: asyncio.Queue = asyncio.Queue()
+            for chunk in chunks:
+                pending.put_nowait(chunk)
+            guesty = self.guesty_client_factory()
+
+            async def fetcher() -> None:
+                while not pending.empty():
+                    await self._run_chunk(guesty, job, pending.get_nowait(), stats)
+
+            await asyncio.gather(*[fetcher() for _ in range(min(self.concurrency, len(chunks)))])
+
+            failed = len(await self.repository.get_pending_chunks(job_id))
+            if failed:
+                await self.repository.set_job_status(job_id, "failed", f"{failed} chunk(s) failed; resume to retry.")
+            else:
+                await self.repository.set_job_status(job_id, "completed")
+            logger.info(f"Backfill job {job_id} finished: {stats['rows']} day(s) queued, {failed} chunk(s) failed.")
+        except asyncio.CancelledError:
+            status = "cancelled" if job_id in self._cancelled else "interrupted"
+            logger.warning(f"Backfill job {job_id} {status}.")
+            await self.repository.set_job_status(job_id, status)
+            raise
+        except Exception as e:
+            logger.exception(f"Backfill job {job_id} failed.")
+            await self.repository.set_job_status(job_id, "failed", str(e))
+        finally:
+            stats["finished"] = time.monotonic()
+            self._tasks.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+    async def _run_chunk(self, guesty: GuestyClient, job: Dict, chunk: Dict, stats: Dict[str, float]) -> None:
+        try:
+            payload = await guesty.list_calendars(chunk["listing_ids"].split(","), chunk["start_date"], chunk["end_date"])
+            days = payload.get("data", {}).get("days", []) if isinstance(payload, dict) else []
+            queued = await self.enqueue_service.queue_rows(rows_from_python(days), is_simple=bool(job["is_simple"]))
+            await self.repository.mark_chunk_done(job["id"], chunk["chunk_no"], len(days), queued)
+            stats["rows"] += queued
+        except Exception as e:
+            logger.warning(f"Backfill job {job['id']} chunk {chunk['chunk_no']} failed: {e}")
+            await self.repository.mark_chunk_failed(job["id"], chunk["chunk_no"], str(e))
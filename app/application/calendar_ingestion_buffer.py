@@ -0,0 +1,187 @@
+import asyncio
+from typing import List, Optional, Tuple
+from loguru import logger
+from app.application.enqueue_calendar_prices_service import EnqueueCalendarPricesService
+from app.domain.exceptions.ingestion_buffer_failing import IngestionBufferFailing
+from app.domain.exceptions.ingestion_buffer_full import IngestionBufferFull
+from app.shared.alert_dispatcher import get_alert_dispatcher
+from app.shared.calendar_rows import CalendarRow
+from app.shared.metrics import INGEST_DROPPED_ROWS, WEBHOOK_ROWS
+
+
+class CalendarIngestionBuffer:
+    """
+    Bounded in-process buffer between the calendar webhook and SQLite.
+    Days from concurrent webhooks are group-committed: the flusher waits a few
+    milliseconds (or until `flush_max_rows` are buffered) and writes everything
+    in one enqueue per is_simple flag, instead of one transaction per request.
+
+    The webhook has already answered 202 for buffered days, so a failed group commit
+    puts them back and retries up to `max_flush_attempts` times before alerting and
+    dropping them. While flushes keep failing, new submits are refused instead.
+    """
+
+    def __init__(
+        self,
+        enqueue_service: EnqueueCalendarPricesService,
+        max_rows: int = 20000,
+        flush_max_rows: int = 2000,
+        flush_interval_ms: int = 5,
+        backpressure_timeout_sec: float = 5.0,
+        max_flush_attempts: int = 5,
+        flush_retry_sec: float = 1.0,
+        failing_after: int = 3,
+    ):
+        self.enqueue_service = enqueue_service
+        self.max_rows = max_rows
+        self.flush_max_rows = flush_max_rows
+        self.flush_interval_ms = flush_interval_ms
+        self.backpressure_timeout_sec = backpressure_timeout_sec
+        self.max_flush_attempts = max_flush_attempts
+        self.flush_retry_sec = flush_retry_sec
+        self.failing_after = failing_after
+        # (days, is_simple, failed flush attempts)
+        self._pending: List[Tuple[List[CalendarRow], bool, int]] = []
+        self._pending_rows = 0
+        self._failed_flushes = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._has_items: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def pending_rows(self) -> int:
+        return self._pending_rows
+
+    @property
+    def failing(self) -> bool:
+        """True while accepted days are waiting on a write that has failed `failing_after` times in a row."""
+        return self._pending_rows > 0 and self._failed_flushes >= self.failing_after
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._flush_lock = asyncio.Lock()
+        if self._pending:
+            self._has_items.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write whatever was already accepted; alerts about days it could not write."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flush_lock is not None:
+            await self.flush()
+            if self._pending:
+                batch, self._pending, self._pending_rows = self._pending, [], 0
+                self._drop(batch, RuntimeError("Ingestion buffer stopped with unwritten days."))
+
+    async def submit(self, days: List[CalendarRow], is_simple: bool = False) -> None:
+        """
+        Accept queue rows for the next group commit. Waits while the buffer is full and
+        raises IngestionBufferFull if no room frees up within the backpressure timeout.
+        Raises IngestionBufferFailing while buffered days cannot be written.
+        """
+        if not days:
+            return
+        if self.failing:
+            raise IngestionBufferFailing(
+                f"Ingestion buffer cannot write to SQLite ({self._failed_flushes} failed flushes, {self._pending_rows} days waiting)."
+            )
+        await self.start()
+        async with self._space:
+            try:
+                await asyncio.wait_for(
+                    # An oversized payload is still accepted once the buffer is empty.
+                    self._space.wait_for(lambda: self._pending_rows == 0 or self._pending_rows + len(days) <= self.max_rows),
+                    self.backpressure_timeout_sec,
+                )
+            except asyncio.TimeoutError:
+                raise IngestionBufferFull(f"Ingestion buffer full ({self._pending_rows}/{self.max_rows} rows).")
+            self._pending.append((days, is_simple, 0))
+            self._pending_rows += len(days)
+        WEBHOOK_ROWS.inc(len(days))
+        self._has_items.set()
+        if self._pending_rows >= self.flush_max_rows:
+            self._batch_full.set()
+
+    async def flush(self) -> int:
+        """
+        Write everything buffered so far. Returns the number of days written; days whose
+        write failed go back to the buffer, or are alerted and dropped once out of attempts.
+        """
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            rows, self._pending_rows = self._pending_rows, 0
+            self._has_items.clear()
+            self._batch_full.clear()
+            async with self._space:
+                self._space.notify_all()
+            if not batch:
+                return 0
+
+            written = 0
+            failed: List[Tuple[List[CalendarRow], bool, int]] = []
+            error: Optional[Exception] = None
+            for flag in (False, True):
+                chunks = [chunk for chunk in batch if chunk[1] == flag]
+                days = [d for chunk, _, _ in chunks for d in chunk]
+                if not days:
+                    continue
+                try:
+                    await self.enqueue_service.queue_rows(days, is_simple=flag)
+                    written += len(days)
+                except Exception as e:
+                    logger.exception(f"Failed to group-commit {len(days)} day(s).")
+                    failed.extend(chunks)
+                    error = e
+
+            if not failed:
+                self._failed_flushes = 0
+                logger.info(f"Group-committed {rows} day(s) from {len(batch)} webhook(s).")
+                return written
+
+            self._failed_flushes += 1
+            retry = [(chunk, flag, attempts + 1) for chunk, flag, attempts in failed if attempts + 1 < self.max_flush_attempts]
+            self._drop([c for c in failed if c[2] + 1 >= self.max_flush_attempts], error)
+            if retry:
+                # Oldest first, ahead of anything submitted while this flush was running.
+                self._pending = retry + self._pending
+                self._pending_rows += sum(len(chunk) for chunk, _, _ in retry)
+                self._has_items.set()
+            return written
+
+    def _drop(self, chunks: List[Tuple[List[CalendarRow], bool, int]], error: Exception) -> None:
+        days = [d for chunk, _, _ in chunks for d in chunk]
+        if not days:
+            return
+        INGEST_DROPPED_ROWS.inc(len(days), reason="flush_failed")
+        logger.error(f"Dropping {len(days)} accepted day(s) that could not be written: {error}")
+        get_alert_dispatcher().alert("Error Syncing Prices (webhook buffer dropped days)", error, days)
+
+    async def _run(self) -> None:
+        while True:
+            await self._has_items.wait()
+            if self._failed_flushes:
+                await asyncio.sleep(self.flush_retry_sec)
+            # Group-commit window: let concurrent webhooks join this transaction.
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.flush_interval_ms / 1000.0)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush calendar ingestion buffer.")
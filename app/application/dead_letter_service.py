@@ -0,0 +1,26 @@
+from typing import List, Optional
+from app.infrastructure.repositories.dead_letter_repository import DeadLetterRepository
+from app.api.v1.schemas.guesty_schema import DeadLetterRow, RequeueDeadLettersResult
+
+
+class DeadLetterService:
+    """
+    Inspect and requeue calendar days that exhausted their send attempts.
+    """
+
+    def __init__(self, repository: DeadLetterRepository):
+        self.repository = repository
+
+    async def list_dead_letters(self, limit: int = 100, listing_id: Optional[str] = None) -> List[DeadLetterRow]:
+        rows = await self.repository.list_dead_letters(limit, listing_id)
+        return [DeadLetterRow(**{**row, "is_simple": bool(row["is_simple"])}) for row in rows]
+
+    async def requeue(
+        self, ids: Optional[List[int]] = None, listing_id: Optional[str] = None
+    ) -> RequeueDeadLettersResult:
+        """
+        Requeue the selected rows (all of them by default); the worker picks them up
+        with a fresh attempt budget.
+        """
+        result = await self.repository.requeue(ids, listing_id)
+        return RequeueDeadLettersResult(**result)
@@ -1,16 +1,26 @@
 from app.domain.booking_experts.services import BookingExpertsClient
-from app.shared.email_logger import send_execution_email
+from app.shared.alert_dispatcher import get_alert_dispatcher
 from app.config import get_settings
 from venv import logger
-from app.data.guesty_listings import guesty_listings
 from app.infrastructure.repositories.calendar_repository import CalendarRepository
+from app.shared.calendar_rows import CalendarRow, rows_from_days
+from app.application.ingest_filter import IngestFilter, get_ingest_filter
+from app.shared.metrics import ENQUEUE_COMMIT_SECONDS, ENQUEUED_ROWS, timed
+from app.shared.profiling import span
+from typing import List, Optional
 
 settings = get_settings()
 
 class EnqueueCalendarPricesService:
-    def __init__(self, booking_experts_client: BookingExpertsClient, repository: CalendarRepository):
+    def __init__(
+        self,
+        booking_experts_client: BookingExpertsClient,
+        repository: CalendarRepository,
+        ingest_filter: Optional[IngestFilter] = None,
+    ):
         self.booking_experts_client = booking_experts_client
         self.repository = repository
+        self.ingest_filter = ingest_filter or get_ingest_filter()
 
     async def enqueue(self, guesty_calendar: list = None, is_simple: bool = False) -> None:
         """
@@ -19,30 +29,37 @@ class EnqueueCalendarPricesService:
         """
         if not guesty_calendar:
             return
+        with span("enqueue.validate"):
+            rows = rows_from_days(guesty_calendar)
+        await self.enqueue_rows(rows, is_simple=is_simple)
+
+    async def enqueue_rows(self, rows: List[CalendarRow] = None, is_simple: bool = False) -> int:
+        """
+        Same as enqueue() for already-validated queue rows (listing_id, date, currency, price, status).
+        Returns the number of rows written; errors are emailed, not raised.
+        """
+        if not rows:
+            return 0
 
         try:
-            # Filter out listings you don't want to send at all
-            filtered = [d for d in guesty_calendar if d.listingId in guesty_listings()]
-            skipped = len(guesty_calendar) - len(filtered)
-            if skipped:
-                logger.info(f"Skipped {skipped} day(s) due to skip list.")
+            return await self.queue_rows(rows, is_simple=is_simple)
+        except Exception as e:
+            self._email_error("Error Syncing Prices (enqueue/process)", e, rows)
+            return 0
 
-            # 1) Enqueue (upsert into DB)
-            written = await self.repository.upsert_days(filtered, is_simple=is_simple)
-            logger.info(f"Queued {written} day(s) into SQLite.")
+    async def queue_rows(self, rows: List[CalendarRow], is_simple: bool = False) -> int:
+        """Filter and upsert rows, raising on failure. Returns the number of rows written."""
+        # Drop unmapped listings, out-of-horizon dates and filtered statuses
+        with span("enqueue.filter"):
+            filtered = await self.ingest_filter.apply(rows)
 
-        except Exception as e:
-            self._email_error("Error Syncing Prices (enqueue/process)", e, guesty_calendar)
+        # 1) Enqueue (upsert into DB)
+        with timed(ENQUEUE_COMMIT_SECONDS), span("enqueue.upsert"):
+            written = await self.repository.upsert_rows(filtered, is_simple=is_simple)
+        ENQUEUED_ROWS.inc(written, is_simple=int(is_simple))
+        logger.info(f"Queued {written} day(s) into SQLite.")
+        return written
     
     def _email_error(self, subject: str, err: Exception, guesty_calendar=None, details=None):
-        try:
-            send_execution_email(
-                subject=subject,
-                body=(
-                    f"Error: {str(err)}\n"
-                    f"Guesty calendar (truncated): {str(guesty_calendar) if guesty_calendar else '-'}\n"
-                    f"Details: {str(details) if details else '-'}"
-                )
-            )
-        except Exception:
-            pass
\ No newline at end of file
+        # Queued for the next aggregated alert email; never blocks the caller.
+        get_alert_dispatcher().alert(subject, err, details if details is not None else guesty_calendar)
\ No newline at end of file
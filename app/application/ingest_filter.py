@@ -0,0 +1,97 @@
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, List, Optional
+from loguru import logger
+from app.config import get_settings
+from app.infrastructure.repositories.listing_price_list_repository import ListingPriceListRepository
+from app.shared.calendar_rows import CalendarRow
+from app.shared.metrics import INGEST_DROPPED_ROWS
+
+settings = get_settings()
+
+
+class IngestFilter:
+    """
+    Drops calendar rows that should never reach the queue, in one pass with O(1) checks:
+      - not_mapped:      listing has no active row in listing_price_list_mapping
+      - out_of_horizon:  date before today - past_days or after today + horizon_days
+      - status:          status not in `statuses` (None accepts every status)
+    The listing allowlist is rebuilt only when the mapping snapshot changes.
+    """
+
+    def __init__(
+        self,
+        listing_price_list_repository: ListingPriceListRepository,
+        past_days: int = 0,
+        horizon_days: int = 730,
+        statuses: Optional[FrozenSet[str]] = None,
+    ):
+        self.listing_price_list_repository = listing_price_list_repository
+        self.past_days = past_days
+        self.horizon_days = horizon_days
+        self.statuses = statuses
+        self._allowlist: FrozenSet[str] = frozenset()
+        self._source: Optional[Dict[str, str]] = None
+        self._dropped: Dict[str, int] = {"not_mapped": 0, "out_of_horizon": 0, "status": 0}
+
+    async def reload(self) -> FrozenSet[str]:
+        """Refresh the allowlist if mappings changed (a single version lookup otherwise)."""
+        mapping = await self.listing_price_list_repository.get_price_list_map()
+        if mapping is not self._source:
+            self._allowlist = frozenset(mapping)
+            self._source = mapping
+        return self._allowlist
+
+    async def allows_listing(self, listing_id: str) -> bool:
+        return listing_id in await self.reload()
+
+    async def apply(self, rows: List[CalendarRow]) -> List[CalendarRow]:
+        """Return the rows that pass every check; dropped rows are counted per reason."""
+        allowlist = await self.reload()
+        today = date.today()
+        first = (today - timedelta(days=self.past_days)).isoformat()
+        last = (today + timedelta(days=self.horizon_days)).isoformat()
+        statuses = self.statuses
+
+        kept: List[CalendarRow] = []
+        not_mapped = out_of_horizon = status = 0
+        for row in rows:
+            if row[0] not in allowlist:
+                not_mapped += 1
+            elif not first <= row[1] <= last:
+                out_of_horizon += 1
+            elif statuses is not None and row[4] not in statuses:
+                status += 1
+            else:
+                kept.append(row)
+
+        if len(kept) != len(rows):
+            for reason, count in (("not_mapped", not_mapped), ("out_of_horizon", out_of_horizon), ("status", status)):
+                self._dropped[reason] += count
+                INGEST_DROPPED_ROWS.inc(count, reason=reason)
+            logger.info(
+                f"Ingest filter dropped {len(rows) - len(kept)} day(s): "
+                f"{not_mapped} not mapped, {out_of_horizon} out of horizon, {status} by status."
+            )
+        return kept
+
+    def dropped_counts(self) -> Dict[str, int]:
+        """Rows dropped per reason since the process started."""
+        return dict(self._dropped)
+
+
+def _parse_statuses(value: str) -> Optional[FrozenSet[str]]:
+    statuses = frozenset(s.strip() for s in value.split(",") if s.strip())
+    return statuses or None
+
+
+_ingest_filter = IngestFilter(
+    ListingPriceListRepository(),
+    past_days=settings.INGEST_PAST_DAYS,
+    horizon_days=settings.INGEST_HORIZON_DAYS,
+    statuses=_parse_statuses(settings.INGEST_STATUSES),
+)
+
+
+def get_ingest_filter() -> IngestFilter:
+    return _ingest_filter
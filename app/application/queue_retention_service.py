@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from loguru import logger
+from app.config import get_settings
+from app.infrastructure.db.sqlite import incremental_vacuum
+from app.infrastructure.repositories.calendar_repository import CalendarRepository
+
+settings = get_settings()
+
+
+class QueueRetentionService:
+    """
+    Deletes processed queue rows older than the retention window in small chunks,
+    then hands the freed pages back with an incremental vacuum.
+    """
+
+    def __init__(self, repository: CalendarRepository):
+        self.repository = repository
+
+    async def purge(
+        self,
+        retention_days: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        pause_ms: int = 20,
+        vacuum: bool = True,
+    ) -> Dict[str, int]:
+        """
+        Returns a dict with deleted_rows, deleted_ledger_rows and reclaimed_bytes.
+        """
+        retention_days = settings.QUEUE_RETENTION_DAYS if retention_days is None else retention_days
+        chunk_size = chunk_size or settings.QUEUE_PURGE_CHUNK_SIZE
+        now = datetime.utcnow()
+        created_before = (now - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+        # Prices for days already in the past will never be compared again.
+        ledger_before = (now - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+
+        deleted_rows = await self._delete_in_chunks(
+            lambda: self.repository.delete_processed_chunk(created_before, chunk_size), chunk_size, pause_ms
+        )
+        deleted_ledger_rows = await self._delete_in_chunks(
+            lambda: self.repository.delete_ledger_before(ledger_before, chunk_size), chunk_size, pause_ms
+        )
+        reclaimed_bytes = await incremental_vacuum() if vacuum else 0
+
+        logger.info(
+            f"Retention: deleted {deleted_rows} processed row(s) and {deleted_ledger_rows} ledger row(s), "
+            f"reclaimed {reclaimed_bytes} bytes."
+        )
+        return {
+            "deleted_rows": deleted_rows,
+            "deleted_ledger_rows": deleted_ledger_rows,
+            "reclaimed_bytes": reclaimed_bytes,
+        }
+
+    @staticmethod
+    async def _delete_in_chunks(delete_chunk, chunk_size: int, pause_ms: int) -> int:
+        total = 0
+        while True:
+            deleted = await delete_chunk()
+            total += deleted
+            if deleted < chunk_size:
+                return total
+            # Let other writers (enqueue, acks) take the lock between chunks.
+            await asyncio.sleep(pause_ms / 1000.0)
@@ -0,0 +1,121 @@
+import asyncio
+import math
+from typing import Dict, Tuple
+from loguru import logger
+from app.infrastructure.repositories.process_lock_repository import ProcessLockRepository
+from app.domain.exceptions.lease_lost import LeaseLostError
+
+
+class ShardLeaseService:
+    """
+    Splits the queue into `shard_count` shards (hash of the price list id) and keeps
+    this worker's fair share of them leased in process_lock. Each worker also holds a
+    membership lease, so the fair share shrinks when workers join and grows when
+    one dies and its leases expire.
+    """
+
+    def __init__(
+        self,
+        process_lock_repository: ProcessLockRepository,
+        worker_name: str,
+        owner: str,
+        shard_count: int,
+        ttl_seconds: int,
+    ):
+        self.process_lock_repository = process_lock_repository
+        self.worker_name = worker_name
+        self.owner = owner
+        self.shard_count = max(1, shard_count)
+        self.ttl_seconds = ttl_seconds
+        self.owned: Dict[int, int] = {}  # shard -> fencing token
+        self._member_token: int = 0
+
+    def lease_name(self, shard: int) -> str:
+        return f"{self.worker_name}:shard:{shard}"
+
+    @property
+    def _member_prefix(self) -> str:
+        return f"{self.worker_name}:member:"
+
+    def fence(self, shard: int) -> Tuple[str, int]:
+        return self.lease_name(shard), self.owned[shard]
+
+    def forget(self, shard: int) -> None:
+        """Drop a shard whose lease was taken over (e.g. after a LeaseLostError)."""
+        self.owned.pop(shard, None)
+
+    async def renew(self, shard: int) -> None:
+        """
+        Extend the lease on `shard` (and the membership heartbeat) before a batch, so a
+        drain stops as soon as the shard was taken over. Raises LeaseLostError if it was.
+        """
+        if self._member_token:
+            await self.process_lock_repository.renew_lease(
+                f"{self._member_prefix}{self.owner}", self.owner, self._member_token
+            )
+        token = self.owned.get(shard)
+        if token is None or not await self.process_lock_repository.renew_lease(self.lease_name(shard), self.owner, token):
+            raise LeaseLostError(f"Lease {self.lease_name(shard)} no longer held with token {token}.")
+
+    async def heartbeat(self) -> None:
+        """Renew the membership lease and every owned shard; drops shards that were taken over."""
+        if self._member_token:
+            await self.process_lock_repository.renew_lease(
+                f"{self._member_prefix}{self.owner}", self.owner, self._member_token
+            )
+        for shard, token in list(self.owned.items()):
+            if not await self.process_lock_repository.renew_lease(self.lease_name(shard), self.owner, token):
+                # rebalance() may have released it meanwhile; only a takeover is a loss.
+                if self.owned.get(shard) == token:
+                    logger.warning(f"[{self.worker_name}] Lost lease on shard {shard}.")
+                    self.owned.pop(shard)
+
+    async def keep_alive(self, interval_sec: float) -> None:
+        """Heartbeat every `interval_sec` until cancelled, however long a drain runs."""
+        while True:
+            await asyncio.sleep(interval_sec)
+            try:
+                await self.heartbeat()
+            except Exception:
+                logger.exception(f"[{self.worker_name}] Lease heartbeat failed.")
+
+    async def rebalance(self) -> Dict[int, int]:
+        """
+        Heartbeat, renew owned shards, release any above the fair share and pick up
+        free or expired ones. Returns the shards owned afterwards.
+        """
+        self._member_token = await self.process_lock_repository.acquire_lease(
+            f"{self._member_prefix}{self.owner}", self.owner, self.ttl_seconds
+        ) or 0
+        members = max(1, await self.process_lock_repository.count_live_leases(self._member_prefix, self.ttl_seconds))
+        fair_share = math.ceil(self.shard_count / members)
+
+        for shard, token in list(self.owned.items()):
+            if not await self.process_lock_repository.renew_lease(self.lease_name(shard), self.owner, token):
+                logger.warning(f"[{self.worker_name}] Lost lease on shard {shard}.")
+                self.owned.pop(shard)
+
+        for shard in sorted(self.owned, reverse=True)[: max(0, len(self.owned) - fair_share)]:
+            await self.process_lock_repository.release_lease(self.lease_name(shard), self.owner, self.owned.pop(shard))
+            logger.info(f"[{self.worker_name}] Released shard {shard} for rebalancing.")
+
+        for shard in range(self.shard_count):
+            if len(self.owned) >= fair_share:
+                break
+            if shard in self.owned:
+                continue
+            token = await self.process_lock_repository.acquire_lease(self.lease_name(shard), self.owner, self.ttl_seconds)
+            if token is not None:
+                self.owned[shard] = token
+                logger.info(f"[{self.worker_name}] Acquired shard {shard}/{self.shard_count} (token {token}).")
+
+        return self.owned
+
+    async def release_all(self) -> None:
+        for shard, token in list(self.owned.items()):
+            await self.process_lock_repository.release_lease(self.lease_name(shard), self.owner, token)
+        self.owned.clear()
+        if self._member_token:
+            await self.process_lock_repository.release_lease(
+                f"{self._member_prefix}{self.owner}", self.owner, self._member_token
+            )
@@ -1,14 +1,17 @@
 import asyncio
-import random
-from typing import Optional, Dict
+import httpx
+from typing import Awaitable, Callable, Optional, Dict, Tuple
 from app.config import get_settings
 from app.infrastructure.repositories.calendar_repository import CalendarRepository
 from app.infrastructure.repositories.process_lock_repository import ProcessLockRepository
 from app.infrastructure.repositories.listing_price_list_repository import ListingPriceListRepository
 from app.infrastructure.booking_experts.booking_experts_client import BookingExpertsClient
 from uuid import uuid4
-from app.shared.email_logger import send_execution_email
+from app.shared.alert_dispatcher import get_alert_dispatcher
 from app.domain.exceptions.max_batch_errors_exceeded import MaxBatchErrorsExceeded
+from app.domain.exceptions.lease_lost import LeaseLostError
+from app.shared.metrics import QUEUE_DB_SECONDS, timed
+from app.shared.profiling import span
 
 settings = get_settings()
 
@@ -31,68 +34,175 @@ class SyncCalendarPricesService:
         is_simple: bool,
         batch_size: int = 20,
         max_batches_this_tick: int = 5,
-        inter_batch_sleep_ms: int = 250,
-        max_errors_per_tick: int = 3
+        inter_batch_sleep_ms: int = 0,
+        max_errors_per_tick: int = 3,
+        max_concurrent_patches: int = 4,
+        lease_ttl_sec: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        fence: Optional[Tuple[str, int]] = None,
+        before_batch: Optional[Callable[[], Awaitable[None]]] = None
     ) -> int:
         """
         Process up to `max_batches_this_tick` batches, sleeping briefly between them.
+        Price lists within a batch are patched concurrently, up to `max_concurrent_patches`;
+        rows of the lists that were written are acked even when another list fails, and only
+        the failed lists' rows are rescheduled, with exponential backoff; rows that keep
+        get rejected end up in the dead-letter queue instead of blocking the tick; rejections
+        do not count towards `max_errors_per_tick`.
+        Rows left locked for longer than `lease_ttl_sec` (e.g. after a crash) are picked up again.
+        With `shard` = (index, count) only that shard's price lists are drained, and acks are
+        fenced with `fence` = (lease name, token); LeaseLostError propagates to the caller.
+        `before_batch` is awaited before every batch (the worker renews the shard lease there).
         Returns the number of rows processed in this tick.
         """
         processed_rows = 0
         consecutive_errors = 0
 
         for _ in range(max_batches_this_tick):
-            batch_rows = await self.repository.reserve_batch(limit=batch_size, is_simple=is_simple)
+            if before_batch is not None:
+                await before_batch()
+            with timed(QUEUE_DB_SECONDS, operation="reserve"), span("drain.reserve"):
+                batch_rows = await self.repository.reserve_batch(
+                    limit=batch_size, is_simple=is_simple, lease_ttl_sec=lease_ttl_sec, shard=shard
+                )
             if not batch_rows:
                 break
 
             try:
                 # Group prices by their respective price lists
-                price_lists_data = await self._group_prices_by_price_list(batch_rows, is_simple)
+                with span("drain.group"):
+                    price_lists_data = await self._group_prices_by_price_list(batch_rows, is_simple)
                 
                 # Process each price list separately
-                for price_list_id, price_data in price_lists_data.items():
-                    await self.booking_experts_client.patch_master_price_list(
-                        price_list_id=price_list_id,
-                        administration_id=settings.BOOKING_EXPERTS_ADMINISTRATION_ID,
-                        simple_prices=price_data["simple_prices"],
-                        complex_prices=price_data["complex_prices"]
-                    )
-                
-                await self.repository.mark_processed([r["id"] for r in batch_rows])
-                processed_rows += len(batch_rows)
+                with span("drain.patch"):
+                    results = await self._patch_price_lists(price_lists_data, max_concurrent_patches)
+                failures = {pl: err for pl, err in results.items() if err is not None}
 
-                consecutive_errors = 0
+                # Price lists that were written are acked now; only failed groups are retried.
+                # Rows without a price list were never sent: acked, but kept out of the ledger.
+                sent_ids = [
+                    row_id
+                    for pl, data in price_lists_data.items() if pl not in failures
+                    for row_id in data["row_ids"]
+                ]
+                mapped_ids = {row_id for data in price_lists_data.values() for row_id in data["row_ids"]}
+                unsent_ids = [r["id"] for r in batch_rows if r["id"] not in mapped_ids]
+                with timed(QUEUE_DB_SECONDS, operation="ack"), span("drain.ack"):
+                    await self.repository.mark_processed(sent_ids, fence=fence, unsent_ids=unsent_ids)
+                processed_rows += len(sent_ids) + len(unsent_ids)
 
-                # Rate limiting: tiny pause + jitter to avoid thundering herd / API timeout
-                sleep_ms = inter_batch_sleep_ms + random.randint(0, 200)
-                await asyncio.sleep(sleep_ms / 1000.0)
+            except LeaseLostError:
+                # The rows now belong to the shard's new owner; leave their locks alone.
+                raise
 
             except Exception as be_err:
-                await self.repository.release_locks([r["id"] for r in batch_rows])
+                with timed(QUEUE_DB_SECONDS, operation="release"), span("drain.release"):
+                    await self.repository.schedule_retry(
+                        [r["id"] for r in batch_rows],
+                        self._describe(be_err),
+                        permanent=self._is_rejection(be_err),
+                        fence=fence,
+                    )
                 self._email_error("Error sending batch to Booking Experts", be_err, details=batch_rows)
-
                 consecutive_errors += 1
-                if consecutive_errors >= max_errors_per_tick:
-                    # Stop this tick immediately
-                    raise MaxBatchErrorsExceeded(
-                        f"More than {max_errors_per_tick} errors occurred in this tick."
+                self._check_error_budget(consecutive_errors, max_errors_per_tick)
+                # continue to next batch; the client's rate limiter backs off on 429/5xx
+                continue
+
+            if failures:
+                for price_list_id, err in failures.items():
+                    failed_rows = set(price_lists_data[price_list_id]["row_ids"])
+                    with timed(QUEUE_DB_SECONDS, operation="release"), span("drain.release"):
+                        await self.repository.schedule_retry(
+                            sorted(failed_rows), self._describe(err), permanent=self._is_rejection(err), fence=fence
+                        )
+                    self._email_error(
+                        f"Error sending price list {price_list_id} to Booking Experts",
+                        err,
+                        details=[r for r in batch_rows if r["id"] in failed_rows],
                     )
-                # Backoff before trying the next batch
-                await asyncio.sleep(1.0 + random.random())
-                # continue to next batch
+                # Rejected rows are already rescheduled or dead-lettered; only transient or
+                # unexpected failures count towards the tick's error budget, so one poison
+                # price list cannot stop the worker.
+                if not all(self._is_rejection(err) for err in failures.values()):
+                    consecutive_errors += 1
+                    self._check_error_budget(consecutive_errors, max_errors_per_tick)
+                    continue
+
+            consecutive_errors = 0
+
+            # Pacing is done by the Booking Experts client's adaptive rate limiter;
+            # an extra fixed pause is only applied when explicitly configured.
+            if inter_batch_sleep_ms > 0:
+                await asyncio.sleep(inter_batch_sleep_ms / 1000.0)
         return processed_rows
 
+    @staticmethod
+    def _describe(err: Exception) -> str:
+        return f"{type(err).__name__}: {err}"
+
+    @staticmethod
+    def _is_rejection(err: Exception) -> bool:
+        """
+        True when Booking Experts rejected the rows themselves (4xx other than 408/429).
+        Only these count towards dead-lettering; throttling, 5xx, transport and local
+        errors are retried with backoff for as long as they last.
+        """
+        if not isinstance(err, httpx.HTTPStatusError):
+            return False
+        status = err.response.status_code
+        return 400 <= status < 500 and status not in (408, 429)
+
+    @staticmethod
+    def _check_error_budget(consecutive_errors: int, max_errors_per_tick: int) -> None:
+        if consecutive_errors >= max_errors_per_tick:
+            # Stop this tick immediately
+            raise MaxBatchErrorsExceeded(
+                f"More than {max_errors_per_tick} errors occurred in this tick."
+            )
+
+    async def _patch_price_lists(
+        self, price_lists_data: Dict[str, Dict], max_concurrent_patches: int
+    ) -> Dict[str, Optional[Exception]]:
+        """
+        PATCH every price list with bounded concurrency. Each price list appears once
+        per batch and ticks run one after another, so PATCHes to a list never overlap.
+        Returns a dictionary of price_list_id -> exception (None when the PATCH succeeded).
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrent_patches))
+
+        async def _patch(price_list_id: str, price_data: Dict) -> None:
+            async with semaphore:
+                await self.booking_experts_client.patch_master_price_list(
+                    price_list_id=price_list_id,
+                    administration_id=settings.BOOKING_EXPERTS_ADMINISTRATION_ID,
+                    simple_prices=price_data["simple_prices"],
+                    complex_prices=price_data["complex_prices"]
+                )
+
+        price_list_ids = list(price_lists_data.keys())
+        outcomes = await asyncio.gather(
+            *[_patch(pl, price_lists_data[pl]) for pl in price_list_ids],
+            return_exceptions=True,
+        )
+        return {
+            pl: (outcome if isinstance(outcome, Exception) else None)
+            for pl, outcome in zip(price_list_ids, outcomes)
+        }
+
     async def _group_prices_by_price_list(self, rows: list[dict], is_simple: bool) -> Dict[str, Dict]:
         """
         Group prices by their respective Booking Experts price list IDs.
-        Returns a dictionary where keys are price_list_ids and values contain simple_prices and complex_prices.
+        Returns a dictionary where keys are price_list_ids and values contain simple_prices, complex_prices
+        and the row_ids they were built from.
         """
         price_lists_data = {}
+        with span("drain.group.mapping"):
+            price_list_map = await self.listing_price_list_repository.get_price_list_map()
         
         for row in rows:
             # Get the price list ID for this listing
-            price_list_id = await self.listing_price_list_repository.get_price_list_for_listing(row["listing_id"])
+            price_list_id = price_list_map.get(row["listing_id"])
             
             # Skip if no price list mapping found
             if not price_list_id:
@@ -101,8 +211,10 @@ class SyncCalendarPricesService:
             if price_list_id not in price_lists_data:
                 price_lists_data[price_list_id] = {
                     "simple_prices": [],
-                    "complex_prices": []
+                    "complex_prices": [],
+                    "row_ids": [],
                 }
+            price_lists_data[price_list_id]["row_ids"].append(row["id"])
             
             # Create price data based on type
             if is_simple:
@@ -148,14 +260,5 @@ class SyncCalendarPricesService:
             return [], complex_prices
     
     def _email_error(self, subject: str, err: Exception, guesty_calendar=None, details=None):
-        try:
-            send_execution_email(
-                subject=subject,
-                body=(
-                    f"Error: {str(err)}\n"
-                    f"Guesty calendar (truncated): {str(guesty_calendar) if guesty_calendar else '-'}\n"
-                    f"Details: {str(details) if details else '-'}"
-                )
-            )
-        except Exception:
-            pass
\ No newline at end of file
+        # Queued for the next aggregated alert email; never blocks the caller.
+        get_alert_dispatcher().alert(subject, err, details if details is not None else guesty_calendar)
\ No newline at end of file
@@ -1,15 +1,30 @@
-from typing import List
+import asyncio
+import time
+from typing import List, Optional
 from app.infrastructure.repositories.calendar_repository import CalendarRepository
 from app.api.v1.schemas.guesty_schema import WorkerStatusSummary, PendingPriceSummary
+from app.application.ingest_filter import IngestFilter
 
 
 class WorkerStatusService:
     """
     Service for managing worker status and pending prices summary.
+    With `cache_ttl_sec` > 0 the summary is reused for that long, and concurrent
+    callers share a single refresh.
     """
     
-    def __init__(self, repository: CalendarRepository):
+    def __init__(
+        self,
+        repository: CalendarRepository,
+        ingest_filter: Optional[IngestFilter] = None,
+        cache_ttl_sec: float = 0.0,
+    ):
         self.repository = repository
+        self.ingest_filter = ingest_filter
+        self.cache_ttl_sec = cache_ttl_sec
+        self._cached: Optional[WorkerStatusSummary] = None
+        self._cached_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
     
     async def get_worker_status_summary(self) -> WorkerStatusSummary:
         """
@@ -18,10 +33,20 @@ class WorkerStatusService:
         Returns:
             WorkerStatusSummary: Contains total pending count and grouped data by date/hour
         """
-        # Get total pending count
-        total_pending = await self.repository.count_unprocessed()
-        
-        # Get pending prices grouped by date and hour
+        if self.cache_ttl_sec <= 0:
+            return await self._build_summary()
+        if self._cached is not None and time.monotonic() - self._cached_at < self.cache_ttl_sec:
+            return self._cached
+
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refresh_task = asyncio.create_task(self._build_summary())
+        summary = await asyncio.shield(task)
+        self._cached, self._cached_at = summary, time.monotonic()
+        return summary
+
+    async def _build_summary(self) -> WorkerStatusSummary:
+        # Get pending prices grouped by date and hour (from the hourly rollup)
         pending_summary_data = await self.repository.get_pending_prices_summary()
         
         # Convert to Pydantic models
@@ -36,6 +61,9 @@ class WorkerStatusService:
         ]
         
         return WorkerStatusSummary(
-            total_pending=total_pending,
-            pending_by_date_hour=pending_by_date_hour
+            # The rollup buckets add up to the queue depth; no separate count needed.
+            total_pending=sum(p.count for p in pending_by_date_hour),
+            pending_by_date_hour=pending_by_date_hour,
+            suppressed_unchanged=await self.repository.get_suppression_counters(),
+            ingest_dropped=self.ingest_filter.dropped_counts() if self.ingest_filter else {},
         )
@@ -9,6 +9,7 @@ class Settings(BaseSettings):
     GUESTY_CLIENT_SECRET: str
     GUESTY_AUTH_URL: str
     GUESTY_API_BASE_URL: str
+    GUESTY_TOKEN_REFRESH_AHEAD_SEC: int = 600
     BOOKING_EXPERTS_API_KEY: str
     BOOKING_EXPERTS_API_BASE_URL: str
     BOOKING_EXPERTS_ADMINISTRATION_ID: str
@@ -16,7 +17,50 @@ class Settings(BaseSettings):
     EMAIL_SENDER: str
     EMAIL_RECEIVER: str
     EMAIL_PASSWORD: str
+    ALERT_SINK: str = "smtp"  # smtp|file
+    ALERT_FILE_PATH: str = "alerts.log"
+    ALERT_WINDOW_SEC: float = 60.0
+    ALERT_MAX_PER_HOUR: int = 10
+    ALERT_MAX_PENDING: int = 100
     SQLITE_DB_PATH: str
+    SQLITE_READ_POOL_SIZE: int = 4
+    QUEUE_LEASE_TTL_SEC: int = 300
+    QUEUE_RETENTION_DAYS: int = 7
+    QUEUE_PURGE_CHUNK_SIZE: int = 500
+    QUEUE_MAX_ATTEMPTS: int = 8  # sends rejected by Booking Experts (4xx) before a row is dead-lettered
+    QUEUE_RETRY_BASE_SEC: int = 30  # backoff after the first failure, doubled per failed send
+    QUEUE_RETRY_MAX_SEC: int = 3600
+    WEBHOOK_BUFFER_MAX_ROWS: int = 20000
+    WEBHOOK_FLUSH_MAX_ROWS: int = 2000
+    WEBHOOK_FLUSH_INTERVAL_MS: int = 5
+    WEBHOOK_BACKPRESSURE_TIMEOUT_SEC: float = 5.0
+    WEBHOOK_FLUSH_MAX_ATTEMPTS: int = 5  # failed group commits before buffered days are dropped
+    WEBHOOK_FLUSH_RETRY_SEC: float = 1.0
+    HTTP_TIMEOUT_SEC: float = 30.0
+    HTTP_CONNECT_TIMEOUT_SEC: float = 10.0
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY_SEC: float = 60.0
+    HTTP2_ENABLED: bool = False
+    BOOKING_EXPERTS_RATE_INITIAL: float = 2.0
+    BOOKING_EXPERTS_RATE_MIN: float = 0.2
+    BOOKING_EXPERTS_RATE_MAX: float = 10.0
+    BOOKING_EXPERTS_RATE_INCREASE: float = 0.2
+    BOOKING_EXPERTS_RATE_DECREASE_FACTOR: float = 0.5
+    BOOKING_EXPERTS_MAX_RETRIES: int = 2
+    BOOKING_EXPERTS_PATCH_MAX_ITEMS: int = 500
+    BOOKING_EXPERTS_PATCH_MAX_BYTES: int = 1_000_000
+    BOOKING_EXPERTS_GZIP_REQUESTS: bool = False
+    BOOKING_EXPERTS_GZIP_MIN_BYTES: int = 1024
+    INGEST_PAST_DAYS: int = 0
+    INGEST_HORIZON_DAYS: int = 730
+    INGEST_STATUSES: str = ""  # comma-separated; empty accepts every status
+    BACKFILL_CONCURRENCY: int = 4
+    BACKFILL_LISTINGS_PER_REQUEST: int = 10
+    BACKFILL_CHUNK_DAYS: int = 90
+    WORKER_STATUS_CACHE_TTL_SEC: float = 5.0
+    TRACE_SPANS_ENABLED: bool = False
+    PROFILE_MAX_SECONDS: float = 120.0
 
     class Config:
         env_file = ".env"
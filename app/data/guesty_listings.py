@@ -1,10 +0,0 @@
-
-def guesty_listings():
-  return [
-    "6687e17c9d796c00126e6dda",
-    "668ba438f3d3dc0017059185",
-    "668bb2df8e4411005a83f526",
-    "668bb65bf3d3dc00170601f2",
-    "668bb786e75f650011473a9d",
-    "668bb883d64f540013b2fbac"
-  ]
\ No newline at end of file
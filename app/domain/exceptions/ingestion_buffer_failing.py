@@ -0,0 +1,4 @@
+
+class IngestionBufferFailing(Exception):
+    """Raised when the webhook ingestion buffer keeps failing to write accepted days to SQLite."""
+    pass
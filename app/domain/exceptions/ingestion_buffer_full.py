@@ -0,0 +1,4 @@
+
+class IngestionBufferFull(Exception):
+    """Raised when the webhook ingestion buffer stays full past the backpressure timeout."""
+    pass
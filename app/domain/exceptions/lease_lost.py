@@ -0,0 +1,4 @@
+
+class LeaseLostError(Exception):
+    """Raised when a worker tries to ack rows with a fencing token it no longer holds."""
+    pass
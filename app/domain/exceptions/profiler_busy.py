@@ -0,0 +1,3 @@
+class ProfilerBusy(Exception):
+    """Raised when a profile capture is requested while another one is still running."""
+    pass
@@ -1,13 +1,44 @@
 import httpx
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from loguru import logger
 from app.config import get_settings
 from app.domain.booking_experts.services import BookingExpertsClient
+from app.infrastructure.booking_experts.rate_limiter import AdaptiveRateLimiter
+from app.infrastructure.booking_experts.payload_encoder import MasterPriceListPayloadEncoder, gzip_body
+from app.shared.http_clients import BOOKING_EXPERTS, get_http_client_pool
+from app.shared.metrics import PATCH_RESPONSES, PATCH_SECONDS, timed
+from app.shared.profiling import span
 
 settings = get_settings()
 
+# Shared by every client instance so the pace reflects all traffic from this process.
+_rate_limiter = AdaptiveRateLimiter(
+    rate=settings.BOOKING_EXPERTS_RATE_INITIAL,
+    min_rate=settings.BOOKING_EXPERTS_RATE_MIN,
+    max_rate=settings.BOOKING_EXPERTS_RATE_MAX,
+    increase=settings.BOOKING_EXPERTS_RATE_INCREASE,
+    decrease_factor=settings.BOOKING_EXPERTS_RATE_DECREASE_FACTOR,
+)
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    return _rate_limiter
+
+# Set once Booking Experts answers a gzip-encoded PATCH with 415.
+_gzip_rejected = False
+
 class APIBookingExpertsClient(BookingExpertsClient):
-    def __init__(self):
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        encoder: Optional[MasterPriceListPayloadEncoder] = None,
+    ):
+        self._http_client = http_client
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.encoder = encoder or MasterPriceListPayloadEncoder(
+            max_items=settings.BOOKING_EXPERTS_PATCH_MAX_ITEMS,
+            max_bytes=settings.BOOKING_EXPERTS_PATCH_MAX_BYTES,
+        )
         self.base_url = settings.BOOKING_EXPERTS_API_BASE_URL
         self.headers = {
             "accept": "application/vnd.api+json",
@@ -15,6 +46,9 @@ class APIBookingExpertsClient(BookingExpertsClient):
             "X-API-KEY": settings.BOOKING_EXPERTS_API_KEY
         }
 
+    def _client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client_pool().get(BOOKING_EXPERTS)
+
     async def patch_master_price_list(
         self,
         price_list_id: str,
@@ -27,84 +61,60 @@ class APIBookingExpertsClient(BookingExpertsClient):
             f"/master_price_lists/{price_list_id}"
         )
 
-        data: Dict[str, Any] = {
-            "data": {
-                "id": price_list_id,
-                "type": "master_price_list",
-            }
-        }
-
-        included = []
-        relationships = {}
-
-        if simple_prices:
-            relationships["simple_prices"] = {
-                "data": [
-                    {
-                        "type": "simple_price",
-                        "meta": {"temp_id": sp["temp_id"], "method": "create"},
-                    }
-                    for sp in simple_prices
-                ]
-            }
-
-            included += [
-                {
-                    "type": "simple_price",
-                    "attributes": {
-                        "date": sp["date"],
-                        "price": {
-                            "currency": sp["currency"],
-                            "value": str(sp["value"]),
-                        },
-                    },
-                    "meta": {"temp_id": sp["temp_id"]},
-                }
-                for sp in simple_prices
-            ]
-
-        if complex_prices:
-            relationships["complex_prices"] = {
-                "data": [
-                    {
-                        "type": "complex_price",
-                        "meta": {"temp_id": cp["temp_id"], "method": "create"},
-                    }
-                    for cp in complex_prices
-                ]
-            }
-
-            included += [
-                {
-                    "type": "complex_price",
-                    "attributes": {
-                        "arrival_date": cp["arrival_date"],
-                        "length_of_stay": cp["length_of_stay"],
-                        "is_active": "true",
-                        "price": {
-                            "currency": cp["currency"],
-                            "value": str(cp["value"]),
-                        },
-                    },
-                    "meta": {"temp_id": cp["temp_id"]},
-                }
-                for cp in complex_prices
-            ]
-
-        if relationships:
-            data["data"]["relationships"] = relationships
-        if included:
-            data["included"] = included
-
+        # Large batches are split into several PATCHes; the last response is returned.
+        with span("be.encode"):
+            bodies = self.encoder.encode(price_list_id, simple_prices, complex_prices)
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.patch(url, json=data, headers=self.headers)
+            for body in bodies:
+                response = await self._send_patch(url, body, price_list_id)
                 response.raise_for_status()
-                return response.json()
+            return response.json()
         except httpx.HTTPError as e:
             logger.error(
                 f"[BookingExperts] Failed to patch price list {price_list_id}: {e}"
             )
-            if e.response is not None:
-                logger.debug(f"Response: {e.response.text}")
+            response = getattr(e, "response", None)
+            if response is not None:
+                logger.debug(f"Response: {response.text}")
             raise
+
+    async def _send_patch(self, url: str, body: bytes, price_list_id: str) -> httpx.Response:
+        """
+        Send the PATCH through the adaptive rate limiter, retrying 429s once the
+        limiter's Retry-After pause has elapsed. Bodies are gzipped when enabled,
+        until the server rejects a compressed body with 415.
+        """
+        global _gzip_rejected
+        max_retries = settings.BOOKING_EXPERTS_MAX_RETRIES
+        attempt = 0
+        while True:
+            compress = (
+                settings.BOOKING_EXPERTS_GZIP_REQUESTS
+                and not _gzip_rejected
+                and len(body) >= settings.BOOKING_EXPERTS_GZIP_MIN_BYTES
+            )
+            headers = {**self.headers, "content-encoding": "gzip"} if compress else self.headers
+            with span("be.rate_limit"):
+                await self.rate_limiter.acquire()
+            try:
+                with timed(PATCH_SECONDS, price_list=price_list_id), span("be.http"):
+                    response = await self._client().patch(
+                        url, content=gzip_body(body) if compress else body, headers=headers
+                    )
+            except httpx.TransportError:
+                PATCH_RESPONSES.inc(price_list=price_list_id, status="transport_error")
+                self.rate_limiter.on_throttle()
+                raise
+            PATCH_RESPONSES.inc(price_list=price_list_id, status=response.status_code)
+            self.rate_limiter.on_response(response.status_code, response.headers)
+            if compress and response.status_code == 415:
+                logger.warning("[BookingExperts] gzip request bodies rejected (415); sending uncompressed")
+                _gzip_rejected = True
+                continue
+            if response.status_code != 429 or attempt == max_retries:
+                return response
+            attempt += 1
+            logger.warning(
+                f"[BookingExperts] 429 for price list {price_list_id}; "
+                f"retrying ({attempt}/{max_retries})"
+            )
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import gzip
+import json
+from typing import Dict, List, Optional, Tuple
+
+try:  # optional: several times faster than the stdlib encoder
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def gzip_body(body: bytes, level: int = 5) -> bytes:
+    return gzip.compress(body, compresslevel=level)
+
+
+def _price_items(price_type: str, price: Dict) -> Tuple[Dict, Dict]:
+    """Relationship entry and `included` resource for one price."""
+    amount = {"currency": price["currency"], "value": str(price["value"])}
+    if price_type == "simple_price":
+        attributes = {"date": price["date"], "price": amount}
+    else:
+        attributes = {
+            "arrival_date": price["arrival_date"],
+            "length_of_stay": price["length_of_stay"],
+            "is_active": "true",
+            "price": amount,
+        }
+    temp_id = price["temp_id"]
+    return (
+        {"type": price_type, "meta": {"temp_id": temp_id, "method": "create"}},
+        {"type": price_type, "attributes": attributes, "meta": {"temp_id": temp_id}},
+    )
+
+
+class MasterPriceListPayloadEncoder:
+    """
+    Builds JSON:API master_price_list PATCH bodies as bytes. Relationships and
+    `included` are filled in the same pass over the prices and the document is
+    encoded once. Batches over `max_items` prices, or whose body would exceed
+    `max_bytes`, are split into several bodies.
+    """
+
+    def __init__(self, max_items: int = 500, max_bytes: int = 1_000_000):
+        self.max_items = max(1, max_items)
+        self.max_bytes = max_bytes
+
+    def encode(
+        self,
+        price_list_id: str,
+        simple_prices: Optional[List[Dict]] = None,
+        complex_prices: Optional[List[Dict]] = None,
+    ) -> List[bytes]:
+        prices = [("simple_price", p) for p in simple_prices or []]
+        prices += [("complex_price", p) for p in complex_prices or []]
+        if not prices:
+            return [self._encode_chunk(price_list_id, [])]
+
+        bodies: List[bytes] = []
+        for start in range(0, len(prices), self.max_items):
+            self._encode_within_size(price_list_id, prices[start:start + self.max_items], bodies)
+        return bodies
+
+    def _encode_within_size(self, price_list_id: str, prices: List[Tuple[str, Dict]], bodies: List[bytes]) -> None:
+        body = self._encode_chunk(price_list_id, prices)
+        if len(body) <= self.max_bytes or len(prices) == 1:
+            bodies.append(body)
+            return
+        middle = len(prices) // 2
+        self._encode_within_size(price_list_id, prices[:middle], bodies)
+        self._encode_within_size(price_list_id, prices[middle:], bodies)
+
+    def _encode_chunk(self, price_list_id: str, prices: List[Tuple[str, Dict]]) -> bytes:
+        relationships: Dict[str, Dict[str, List]] = {}
+        included: List[Dict] = []
+        for price_type, price in prices:
+            relationship, resource = _price_items(price_type, price)
+            relationships.setdefault(f"{price_type}s", {"data": []})["data"].append(relationship)
+            included.append(resource)
+
+        data: Dict = {"id": price_list_id, "type": "master_price_list"}
+        if relationships:
+            data["relationships"] = relationships
+        payload: Dict = {"data": data}
+        if included:
+            payload["included"] = included
+        return dumps(payload)
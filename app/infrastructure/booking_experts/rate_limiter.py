@@ -0,0 +1,109 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+from loguru import logger
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate follows AIMD: it grows additively while
+    Booking Experts answers healthily and is cut multiplicatively on 429/5xx.
+    Retry-After and rate-limit headers pause the bucket until the given time.
+    """
+
+    def __init__(
+        self,
+        rate: float = 2.0,
+        min_rate: float = 0.2,
+        max_rate: float = 10.0,
+        increase: float = 0.2,
+        decrease_factor: float = 0.5,
+        burst: float = 1.0,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        async with self._get_lock():
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    def block_for(self, seconds: float) -> None:
+        until = time.monotonic() + seconds
+        if until > self._blocked_until:
+            self._blocked_until = until
+            self._tokens = 0.0
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self) -> None:
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        logger.warning(f"[BookingExperts] Throttled; request rate lowered to {self.rate:.2f}/s")
+
+    def on_response(self, status_code: int, headers: Mapping[str, str]) -> None:
+        if status_code == 429 or status_code >= 500:
+            self.on_throttle()
+            retry_after = parse_retry_after(headers.get("retry-after"))
+            if retry_after is not None:
+                self.block_for(retry_after)
+            elif status_code == 429:
+                self.block_for(1.0 / self.rate)
+        elif status_code < 400:
+            self.on_success()
+
+        remaining = headers.get("x-ratelimit-remaining") or headers.get("ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset") or headers.get("ratelimit-reset")
+        if remaining is not None and reset is not None:
+            try:
+                if int(float(remaining)) <= 0:
+                    reset_value = float(reset)
+                    # Some APIs send an epoch timestamp, others the seconds left.
+                    wait = reset_value - time.time() if reset_value > 1_000_000_000 else reset_value
+                    self.block_for(max(0.0, wait))
+            except ValueError:
+                pass
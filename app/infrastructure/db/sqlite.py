@@ -1,7 +1,11 @@
 # app/db/sqlite.py
+import asyncio
 import os
+import zlib
 import aiosqlite
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator, List, Optional
 from app.config import get_settings
 
 settings = get_settings()
@@ -10,6 +14,9 @@ settings = get_settings()
 DB_PATH = settings.SQLITE_DB_PATH
 
 SCHEMA = """
+-- auto_vacuum is set by open_db() before WAL is enabled (SQLite ignores it afterwards)
+-- and only takes effect on a fresh database; existing files are converted with
+-- app/scripts/purge_processed.py --convert-incremental-vacuum.
 PRAGMA journal_mode=WAL;
 PRAGMA synchronous=NORMAL;
 PRAGMA foreign_keys=ON;
@@ -24,17 +31,137 @@ CREATE TABLE IF NOT EXISTS guesty_calendar_day (
   is_simple INTEGER NOT NULL DEFAULT 0,  -- 0=complex,1=simple
   processed INTEGER NOT NULL DEFAULT 0,  -- 0=pending,1=done
   locked_at TEXT DEFAULT NULL,           -- ISO datetime when reserved by a worker
+  reclaim_count INTEGER NOT NULL DEFAULT 0,  -- times the row was re-reserved after its lease expired
+  attempts INTEGER NOT NULL DEFAULT 0,       -- sends of the current value rejected by Booking Experts (4xx)
+  retries INTEGER NOT NULL DEFAULT 0,        -- failed sends of the current value for any reason; drives the backoff
+  next_attempt_at TEXT DEFAULT NULL,         -- not reserved before this (UTC); NULL = due now
+  last_error TEXT DEFAULT NULL,
   created_at TEXT NOT NULL DEFAULT (datetime('now')),
   UNIQUE(listing_id, date, is_simple) ON CONFLICT REPLACE
 );
 
-CREATE INDEX IF NOT EXISTS idx_gcd_processed ON guesty_calendar_day(processed, is_simple);
+-- Pending rows only, in reservation order; processed rows never enter it.
+CREATE INDEX IF NOT EXISTS idx_gcd_pending ON guesty_calendar_day(is_simple, created_at, locked_at) WHERE processed = 0;
+DROP INDEX IF EXISTS idx_gcd_processed;
 CREATE INDEX IF NOT EXISTS idx_gcd_locked ON guesty_calendar_day(locked_at);
 CREATE INDEX IF NOT EXISTS idx_gcd_created ON guesty_calendar_day(created_at);
 
+-- Rows rejected QUEUE_MAX_ATTEMPTS times; inspected and requeued through /api/v1/dead-letters.
+CREATE TABLE IF NOT EXISTS guesty_calendar_dead_letter (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  listing_id TEXT NOT NULL,
+  date TEXT NOT NULL,
+  currency TEXT NOT NULL,
+  price REAL NOT NULL,
+  status TEXT,
+  is_simple INTEGER NOT NULL DEFAULT 0,
+  attempts INTEGER NOT NULL,
+  last_error TEXT DEFAULT NULL,
+  queued_at TEXT NOT NULL,                 -- created_at of the queue row
+  dead_at TEXT NOT NULL DEFAULT (datetime('now')),
+  UNIQUE(listing_id, date, is_simple) ON CONFLICT REPLACE
+);
+CREATE INDEX IF NOT EXISTS idx_gcdl_dead_at ON guesty_calendar_dead_letter(dead_at);
+
+-- Last price successfully pushed to Booking Experts per calendar day.
+CREATE TABLE IF NOT EXISTS pushed_price_ledger (
+  listing_id TEXT NOT NULL,
+  date TEXT NOT NULL,
+  is_simple INTEGER NOT NULL,
+  price REAL NOT NULL,
+  currency TEXT NOT NULL,
+  pushed_at TEXT NOT NULL DEFAULT (datetime('now')),
+  PRIMARY KEY (listing_id, date, is_simple)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS pipeline_counter (
+  name TEXT PRIMARY KEY,
+  value INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO pipeline_counter (name, value) VALUES ('suppressed_unchanged_enqueue', 0);
+
+-- Queue depth per is_simple, seeded once from the table and kept current by triggers.
+-- The counter row is its own seeded marker: once it exists the COUNT(*) is never run again.
+INSERT INTO pipeline_counter (name, value)
+  SELECT 'pending_simple', (SELECT COUNT(*) FROM guesty_calendar_day WHERE processed = 0 AND is_simple = 1)
+  WHERE NOT EXISTS (SELECT 1 FROM pipeline_counter WHERE name = 'pending_simple');
+INSERT INTO pipeline_counter (name, value)
+  SELECT 'pending_complex', (SELECT COUNT(*) FROM guesty_calendar_day WHERE processed = 0 AND is_simple = 0)
+  WHERE NOT EXISTS (SELECT 1 FROM pipeline_counter WHERE name = 'pending_complex');
+
+CREATE TRIGGER IF NOT EXISTS trg_gcd_pending_insert AFTER INSERT ON guesty_calendar_day
+WHEN NEW.processed = 0
+BEGIN
+  UPDATE pipeline_counter SET value = value + 1
+  WHERE name = CASE NEW.is_simple WHEN 1 THEN 'pending_simple' ELSE 'pending_complex' END;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gcd_pending_delete AFTER DELETE ON guesty_calendar_day
+WHEN OLD.processed = 0
+BEGIN
+  UPDATE pipeline_counter SET value = value - 1
+  WHERE name = CASE OLD.is_simple WHEN 1 THEN 'pending_simple' ELSE 'pending_complex' END;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gcd_pending_update AFTER UPDATE OF processed, is_simple ON guesty_calendar_day
+WHEN (OLD.processed = 0) != (NEW.processed = 0) OR OLD.is_simple != NEW.is_simple
+BEGIN
+  UPDATE pipeline_counter SET value = value - 1
+  WHERE OLD.processed = 0 AND name = CASE OLD.is_simple WHEN 1 THEN 'pending_simple' ELSE 'pending_complex' END;
+  UPDATE pipeline_counter SET value = value + 1
+  WHERE NEW.processed = 0 AND name = CASE NEW.is_simple WHEN 1 THEN 'pending_simple' ELSE 'pending_complex' END;
+END;
+
+-- Pending rows per created_at hour, seeded once and kept current by triggers (worker-status).
+CREATE TABLE IF NOT EXISTS pending_hourly_rollup (
+  hour_bucket TEXT NOT NULL,             -- strftime('%Y-%m-%d %H', created_at)
+  is_simple INTEGER NOT NULL,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (hour_bucket, is_simple)
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO pending_hourly_rollup (hour_bucket, is_simple, count)
+  SELECT strftime('%Y-%m-%d %H', created_at), is_simple, COUNT(*) FROM guesty_calendar_day
+  WHERE processed = 0 AND NOT EXISTS (SELECT 1 FROM pipeline_counter WHERE name = 'pending_hourly_seeded')
+  GROUP BY 1, 2;
+INSERT OR IGNORE INTO pipeline_counter (name, value) VALUES ('pending_hourly_seeded', 1);
+
+CREATE TRIGGER IF NOT EXISTS trg_gcd_hourly_insert AFTER INSERT ON guesty_calendar_day
+WHEN NEW.processed = 0
+BEGIN
+  INSERT INTO pending_hourly_rollup (hour_bucket, is_simple, count)
+  VALUES (strftime('%Y-%m-%d %H', NEW.created_at), NEW.is_simple, 1)
+  ON CONFLICT(hour_bucket, is_simple) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_gcd_hourly_delete AFTER DELETE ON guesty_calendar_day
+WHEN OLD.processed = 0
+BEGIN
+  UPDATE pending_hourly_rollup SET count = count - 1
+  WHERE hour_bucket = strftime('%Y-%m-%d %H', OLD.created_at) AND is_simple = OLD.is_simple;
+  DELETE FROM pending_hourly_rollup
+  WHERE hour_bucket = strftime('%Y-%m-%d %H', OLD.created_at) AND is_simple = OLD.is_simple AND count <= 0;
+END;
+-- Ack (processed 0 -> 1), cancellation, and re-enqueue (created_at moves to the current hour).
+CREATE TRIGGER IF NOT EXISTS trg_gcd_hourly_update AFTER UPDATE OF processed, is_simple, created_at ON guesty_calendar_day
+WHEN (OLD.processed = 0 OR NEW.processed = 0)
+  AND NOT (
+    OLD.processed = NEW.processed AND OLD.is_simple = NEW.is_simple
+    AND strftime('%Y-%m-%d %H', OLD.created_at) = strftime('%Y-%m-%d %H', NEW.created_at)
+  )
+BEGIN
+  UPDATE pending_hourly_rollup SET count = count - 1
+  WHERE OLD.processed = 0
+    AND hour_bucket = strftime('%Y-%m-%d %H', OLD.created_at) AND is_simple = OLD.is_simple;
+  DELETE FROM pending_hourly_rollup
+  WHERE OLD.processed = 0
+    AND hour_bucket = strftime('%Y-%m-%d %H', OLD.created_at) AND is_simple = OLD.is_simple AND count <= 0;
+  INSERT INTO pending_hourly_rollup (hour_bucket, is_simple, count)
+  SELECT strftime('%Y-%m-%d %H', NEW.created_at), NEW.is_simple, 1 WHERE NEW.processed = 0
+  ON CONFLICT(hour_bucket, is_simple) DO UPDATE SET count = count + 1;
+END;
+
 CREATE TABLE IF NOT EXISTS process_lock (
   name TEXT PRIMARY KEY,
-  acquired_at TEXT NOT NULL
+  acquired_at TEXT NOT NULL,
+  owner TEXT DEFAULT NULL,                   -- worker holding a lease, NULL when free
+  fencing_token INTEGER NOT NULL DEFAULT 0   -- bumped every time the lease changes hands
 );
 
 CREATE TABLE IF NOT EXISTS listing_price_list_mapping (
@@ -48,8 +175,78 @@ CREATE TABLE IF NOT EXISTS listing_price_list_mapping (
 
 CREATE INDEX IF NOT EXISTS idx_lplm_listing ON listing_price_list_mapping(guesty_listing_id);
 CREATE INDEX IF NOT EXISTS idx_lplm_active ON listing_price_list_mapping(is_active);
+
+-- Bumped on every mapping write so processes can detect stale in-memory snapshots.
+CREATE TABLE IF NOT EXISTS listing_price_list_mapping_version (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO listing_price_list_mapping_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_lplm_version_insert AFTER INSERT ON listing_price_list_mapping
+BEGIN
+  UPDATE listing_price_list_mapping_version SET version = version + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_lplm_version_update AFTER UPDATE ON listing_price_list_mapping
+BEGIN
+  UPDATE listing_price_list_mapping_version SET version = version + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_lplm_version_delete AFTER DELETE ON listing_price_list_mapping
+BEGIN
+  UPDATE listing_price_list_mapping_version SET version = version + 1 WHERE id = 1;
+END;
+
+-- Calendar backfill jobs; each chunk (listing batch x date range) is the resume checkpoint.
+CREATE TABLE IF NOT EXISTS backfill_job (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  status TEXT NOT NULL DEFAULT 'pending',  -- pending|running|completed|failed|interrupted|cancelled
+  start_date TEXT NOT NULL,
+  end_date TEXT NOT NULL,
+  is_simple INTEGER NOT NULL DEFAULT 0,
+  total_chunks INTEGER NOT NULL DEFAULT 0,
+  last_error TEXT DEFAULT NULL,
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+  finished_at TEXT DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS backfill_chunk (
+  job_id INTEGER NOT NULL REFERENCES backfill_job(id) ON DELETE CASCADE,
+  chunk_no INTEGER NOT NULL,
+  listing_ids TEXT NOT NULL,               -- comma-separated, sent as Guesty's listingIds
+  start_date TEXT NOT NULL,
+  end_date TEXT NOT NULL,
+  done INTEGER NOT NULL DEFAULT 0,
+  rows_fetched INTEGER NOT NULL DEFAULT 0,
+  rows_queued INTEGER NOT NULL DEFAULT 0,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  last_error TEXT DEFAULT NULL,
+  PRIMARY KEY (job_id, chunk_no)
+) WITHOUT ROWID;
 """
 
+# Columns added after the first release. CREATE TABLE IF NOT EXISTS does not touch
+# existing tables, so init_db adds whichever of these are missing.
+COLUMN_MIGRATIONS = {
+    "guesty_calendar_day": [
+        ("reclaim_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+        ("retries", "INTEGER NOT NULL DEFAULT 0"),
+        ("next_attempt_at", "TEXT DEFAULT NULL"),
+        ("last_error", "TEXT DEFAULT NULL"),
+    ],
+    "process_lock": [
+        ("owner", "TEXT DEFAULT NULL"),
+        ("fencing_token", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+}
+
+def shard_of(key: Optional[str], shard_count: int) -> int:
+    """Stable shard for a price list (or listing) id; registered as SQL function shard_of()."""
+    if not key or shard_count <= 1:
+        return 0
+    return zlib.crc32(key.encode("utf-8")) % shard_count
+
 async def ensure_db_dir():
     Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
 
@@ -58,15 +255,197 @@ async def open_db():
     conn = await aiosqlite.connect(DB_PATH)
     conn.row_factory = aiosqlite.Row
     await conn.execute("PRAGMA foreign_keys=ON;")
+    # Must precede journal_mode=WAL: once WAL is on, a new file keeps auto_vacuum=NONE.
+    await conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
     await conn.execute("PRAGMA journal_mode=WAL;")
     await conn.execute("PRAGMA synchronous=NORMAL;")
     return conn
 
+async def apply_column_migrations(conn: aiosqlite.Connection) -> None:
+    for table, columns in COLUMN_MIGRATIONS.items():
+        existing = {r["name"] for r in await (await conn.execute(f"PRAGMA table_info({table})")).fetchall()}
+        if not existing:
+            continue  # table is created by SCHEMA with every column
+        for name, definition in columns:
+            if name not in existing:
+                await conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
 async def init_db():
     conn = await open_db()
     try:
+        await apply_column_migrations(conn)
         await conn.executescript(SCHEMA)
         await conn.commit()
     finally:
         await conn.close()
-    print("✅ SQLite database initialized.")
\ No newline at end of file
+    print("✅ SQLite database initialized.")
+
+
+async def database_size_bytes(conn: aiosqlite.Connection) -> int:
+    page_count = (await (await conn.execute("PRAGMA page_count")).fetchone())[0]
+    page_size = (await (await conn.execute("PRAGMA page_size")).fetchone())[0]
+    return int(page_count) * int(page_size)
+
+def wal_size_bytes() -> int:
+    wal = Path(f"{DB_PATH}-wal")
+    return wal.stat().st_size if wal.exists() else 0
+
+async def incremental_vacuum(max_pages: Optional[int] = None) -> int:
+    """
+    Return free pages to the filesystem and truncate the WAL.
+    Returns the number of bytes reclaimed (database file + WAL).
+    Needs auto_vacuum=INCREMENTAL; on other databases only the WAL is truncated.
+    """
+    async with db_writer() as conn:
+        before = await database_size_bytes(conn) + wal_size_bytes()
+        pragma = "PRAGMA incremental_vacuum" if max_pages is None else f"PRAGMA incremental_vacuum({int(max_pages)})"
+        # Each step frees pages; fetch until done.
+        await (await conn.execute(pragma)).fetchall()
+        await conn.commit()
+        await (await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")).fetchall()
+        after = await database_size_bytes(conn) + wal_size_bytes()
+    return max(before - after, 0)
+
+class DataVersionWatcher:
+    """
+    Dedicated connection polling PRAGMA data_version, which changes whenever another
+    connection (e.g. the API process) commits. Lets the worker notice new rows
+    without reading any table.
+    """
+
+    def __init__(self):
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._version: Optional[int] = None
+
+    async def open(self) -> None:
+        if self._conn is None:
+            self._conn = await open_db()
+            self._version = await self._read()
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    async def _read(self) -> int:
+        return (await (await self._conn.execute("PRAGMA data_version")).fetchone())[0]
+
+    async def changed(self) -> bool:
+        await self.open()
+        version = await self._read()
+        changed, self._version = version != self._version, version
+        return changed
+
+class SQLitePool:
+    """
+    Long-lived connection pool: one writer plus N readers.
+    PRAGMAs are applied once per connection when the pool opens. Writes are
+    serialized in-process through the writer lock; readers rely on WAL so they
+    never block the writer.
+    """
+
+    def __init__(self, db_path: str, readers: int = 4):
+        self.db_path = db_path
+        self.readers_count = max(1, readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_lock: Optional[asyncio.Lock] = None
+        self._readers: Optional[asyncio.Queue] = None
+        self._all: List[aiosqlite.Connection] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._open_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute("PRAGMA foreign_keys=ON;")
+        await conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")  # before WAL; see open_db()
+        await conn.execute("PRAGMA journal_mode=WAL;")
+        await conn.execute("PRAGMA synchronous=NORMAL;")
+        await conn.create_function("shard_of", 2, shard_of, deterministic=True)
+        return conn
+
+    async def open(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Pool was bound to another (closed) loop, e.g. between test cases.
+            self._discard()
+            self._loop = loop
+            self._open_lock = asyncio.Lock()
+        async with self._open_lock:
+            if self.is_open:
+                return
+            await ensure_db_dir()
+            self._writer = await self._connect()
+            self._all.append(self._writer)
+            self._writer_lock = asyncio.Lock()
+            self._readers = asyncio.Queue()
+            for _ in range(self.readers_count):
+                conn = await self._connect()
+                self._all.append(conn)
+                self._readers.put_nowait(conn)
+
+    async def close(self) -> None:
+        conns, self._all = self._all, []
+        self._writer = None
+        self._readers = None
+        for conn in conns:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+
+    def _discard(self) -> None:
+        for conn in self._all:
+            conn.stop()
+        self._all = []
+        self._writer = None
+        self._readers = None
+
+    async def _ensure_open(self) -> None:
+        if not self.is_open or self._loop is not asyncio.get_running_loop():
+            await self.open()
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Exclusive access to the writer connection. Any transaction left open by
+        a failing caller is rolled back before the connection is handed out again.
+        """
+        await self._ensure_open()
+        async with self._writer_lock:
+            conn = self._writer
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    await conn.rollback()
+                raise
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        await self._ensure_open()
+        readers = self._readers
+        conn = await readers.get()
+        try:
+            yield conn
+        finally:
+            readers.put_nowait(conn)
+
+
+_pool = SQLitePool(DB_PATH, readers=settings.SQLITE_READ_POOL_SIZE)
+
+
+def get_pool() -> SQLitePool:
+    return _pool
+
+
+def db_writer():
+    return _pool.writer()
+
+
+def db_reader():
+    return _pool.reader()
\ No newline at end of file
@@ -1,53 +1,44 @@
 import httpx
-from typing import Any
+from typing import Any, Optional, Sequence
 from diskcache import Cache
 from app.config import get_settings
+from app.shared.http_clients import GUESTY, get_http_client_pool
+from app.infrastructure.guesty.token_manager import TOKEN_KEY, GuestyTokenManager, get_token_manager
 from loguru import logger
 
 settings = get_settings()
 
 class GuestyClient:
-    def __init__(self, cache: Cache):
-        self.client_id = settings.GUESTY_CLIENT_ID
-        self.client_secret = settings.GUESTY_CLIENT_SECRET
-        self.auth_url = settings.GUESTY_AUTH_URL
+    def __init__(
+        self,
+        cache: Cache,
+        http_client: Optional[httpx.AsyncClient] = None,
+        token_manager: Optional[GuestyTokenManager] = None,
+    ):
+        self._http_client = http_client
         self.base_url = settings.GUESTY_API_BASE_URL
         self.cache = cache
-        self.TOKEN_KEY = "guesty_auth_info"
-        self._auth_info = self._validate_auth_info()
-
-    def _validate_auth_info(self) -> dict:
-
-        if token := self.cache.get(self.TOKEN_KEY):
-            return token
-
-        try:
-            response = httpx.post(
-                self.auth_url,
-                data={
-                    "grant_type": "client_credentials",
-                    "scope": "open-api",
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret
-                },
-                headers={"Content-Type": "application/x-www-form-urlencoded"}
-            )
-            response.raise_for_status()
-            auth_info = response.json()
-
-            # TTL: 24h - 5min buffer = 23h55min
-            self.cache.set(self.TOKEN_KEY, auth_info, expire=60 * 60 * 24 - 300)
-            return auth_info
-
-        except Exception as e:
-            logger.critical(f"[Guesty] Failed to authenticate: {e}")
-            raise
-
-    def _headers(self) -> dict:
-        return {
-            "Authorization": f"Bearer {self._auth_info['access_token']}",
-            "Content-Type": "application/json"
-        }
+        self.TOKEN_KEY = TOKEN_KEY
+        # No I/O here: the token is fetched (or refreshed) on the first request.
+        self.token_manager = token_manager or get_token_manager(cache)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Authenticated request; a 401 drops the token and retries once with a fresh one."""
+        for attempt in range(2):
+            token = await self.token_manager.get_token()
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            }
+            resp = await self._client().request(method, url, headers=headers, **kwargs)
+            if resp.status_code != 401 or attempt:
+                return resp
+            logger.warning("[Guesty] 401 Unauthorized, refreshing access token")
+            await self.clear_auth_cache(token)
+        return resp
+
+    def _client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client_pool().get(GUESTY)
 
     def _is_prod(self) -> bool:
         return settings.ENVIRONMENT == "production"
@@ -57,10 +48,9 @@ class GuestyClient:
             logger.warning("Guesty call skipped: not in production")
             return []
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.base_url}/webhooks", headers=self._headers())
-            resp.raise_for_status()
-            return resp.json()
+        resp = await self._request("GET", f"{self.base_url}/webhooks")
+        resp.raise_for_status()
+        return resp.json()
 
     async def register_webhook(self, target_url: str, events: list[str]) -> Any:
         if not self._is_prod():
@@ -68,20 +58,18 @@ class GuestyClient:
             return {}
 
         payload = {"url": target_url, "events": events}
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(f"{self.base_url}/webhooks", json=payload, headers=self._headers())
-            resp.raise_for_status()
-            return resp.json()
+        resp = await self._request("POST", f"{self.base_url}/webhooks", json=payload)
+        resp.raise_for_status()
+        return resp.json()
 
     async def remove_webhook(self, webhook_id: str) -> bool:
         if not self._is_prod():
             logger.warning("Webhook removal skipped: not in production")
             return False
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.delete(f"{self.base_url}/webhooks/{webhook_id}", headers=self._headers())
-            resp.raise_for_status()
-            return resp.status_code == 204
+        resp = await self._request("DELETE", f"{self.base_url}/webhooks/{webhook_id}")
+        resp.raise_for_status()
+        return resp.status_code == 204
 
     async def list_listings(self, limit: int = 25, offset: int = 0) -> Any:
         if not self._is_prod():
@@ -89,10 +77,9 @@ class GuestyClient:
             return []
 
         params = {"limit": limit, "offset": offset}
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.base_url}/listings", headers=self._headers(), params=params)
-            resp.raise_for_status()
-            return resp.json()
+        resp = await self._request("GET", f"{self.base_url}/listings", params=params)
+        resp.raise_for_status()
+        return resp.json()
         
     async def list_calendar(self, listing_id: str, start_date: str, end_date: str) -> Any:
         if not self._is_prod():
@@ -104,14 +91,14 @@ class GuestyClient:
             "startDate": start_date,
             "endDate": end_date
         }
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.base_url}/availability-pricing/api/calendar/listings/", headers=self._headers(), params=params)
-            resp.raise_for_status()
-            return resp.json()
+        resp = await self._request("GET", f"{self.base_url}/availability-pricing/api/calendar/listings/", params=params)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def list_calendars(self, listing_ids: Sequence[str], start_date: str, end_date: str) -> Any:
+        """Calendar days for several listings in one request (each day carries its listingId)."""
+        return await self.list_calendar(",".join(listing_ids), start_date, end_date)
         
-    def clear_auth_cache(self) -> None:
-            try:
-                self.cache.delete(self.TOKEN_KEY)
-                logger.info("[Guesty] Auth cache cleared")
-            except Exception as e:
-                logger.warning(f"[Guesty] Failed to clear auth cache: {e}")
\ No newline at end of file
+    async def clear_auth_cache(self, stale_token: Optional[str] = None) -> None:
+        """Forget the cached token (only `stale_token`, if given) in memory and on disk."""
+        await self.token_manager.invalidate(stale_token)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import Optional
+import httpx
+from diskcache import Cache
+from loguru import logger
+from app.config import get_settings
+from app.shared.http_clients import GUESTY, get_http_client_pool
+
+settings = get_settings()
+
+TOKEN_KEY = "guesty_auth_info"
+
+# Guesty tokens live 24h; used when the response has no expires_in.
+DEFAULT_TOKEN_TTL_SEC = 60 * 60 * 24
+
+
+class GuestyTokenManager:
+    """
+    Keeps the Guesty access token in memory; diskcache only persists it across
+    restarts and shares it between the API and the worker (Guesty rate-limits
+    the token endpoint). Within `refresh_ahead_sec` of expiry the current token is
+    still served while one background refresh runs; concurrent refreshes are
+    collapsed into a single auth call.
+    """
+
+    def __init__(
+        self,
+        cache: Cache,
+        refresh_ahead_sec: int = 600,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.cache = cache
+        self.refresh_ahead_sec = refresh_ahead_sec
+        self._http_client = http_client
+        self._token: Optional[str] = None
+        self._expires_at = 0.0  # epoch seconds
+        self._loaded = False
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get_token(self) -> str:
+        if not self._loaded:
+            await self._load_persisted()
+        now = time.time()
+        if self._token and now < self._expires_at - self.refresh_ahead_sec:
+            return self._token
+        if self._token and now < self._expires_at:
+            # Refresh ahead: keep serving the current token meanwhile.
+            self._refresh_in_flight()
+            return self._token
+        return await asyncio.shield(self._refresh_in_flight())
+
+    async def invalidate(self, stale_token: Optional[str] = None) -> None:
+        """
+        Drop a token Guesty rejected. Only the rejected token is dropped, so a token
+        another request (or process) already refreshed is kept.
+        """
+        if stale_token is None or stale_token == self._token:
+            self._token = None
+            self._expires_at = 0.0
+        await asyncio.to_thread(self._delete_persisted, stale_token)
+
+    def _refresh_in_flight(self) -> asyncio.Task:
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refresh_task = asyncio.create_task(self._refresh())
+        return task
+
+    async def _refresh(self) -> str:
+        # Another process may have refreshed already.
+        await self._load_persisted()
+        if self._token and time.time() < self._expires_at - self.refresh_ahead_sec:
+            return self._token
+
+        try:
+            client = self._http_client or get_http_client_pool().get(GUESTY)
+            response = await client.post(
+                settings.GUESTY_AUTH_URL,
+                data={
+                    "grant_type": "client_credentials",
+                    "scope": "open-api",
+                    "client_id": settings.GUESTY_CLIENT_ID,
+                    "client_secret": settings.GUESTY_CLIENT_SECRET
+                },
+                headers={"Content-Type": "application/x-www-form-urlencoded"}
+            )
+            response.raise_for_status()
+            auth_info = response.json()
+        except Exception as e:
+            logger.critical(f"[Guesty] Failed to authenticate: {e}")
+            raise
+
+        ttl = int(auth_info.get("expires_in") or DEFAULT_TOKEN_TTL_SEC)
+        self._token = auth_info["access_token"]
+        self._expires_at = time.time() + ttl
+        await asyncio.to_thread(self.cache.set, TOKEN_KEY, auth_info, expire=ttl)
+        logger.info("[Guesty] Access token refreshed")
+        return self._token
+
+    async def _load_persisted(self) -> None:
+        auth_info, expire_time = await asyncio.to_thread(self.cache.get, TOKEN_KEY, None, expire_time=True)
+        self._loaded = True
+        if not auth_info or not auth_info.get("access_token"):
+            return
+        expires_at = expire_time or time.time() + DEFAULT_TOKEN_TTL_SEC
+        if expires_at > self._expires_at:
+            self._token = auth_info["access_token"]
+            self._expires_at = expires_at
+
+    def _delete_persisted(self, stale_token: Optional[str]) -> None:
+        try:
+            auth_info = self.cache.get(TOKEN_KEY)
+            if stale_token is None or (auth_info and auth_info.get("access_token") == stale_token):
+                self.cache.delete(TOKEN_KEY)
+                logger.info("[Guesty] Auth cache cleared")
+        except Exception as e:
+            logger.warning(f"[Guesty] Failed to clear auth cache: {e}")
+
+
+_token_manager: Optional[GuestyTokenManager] = None
+
+
+def get_token_manager(cache: Cache) -> GuestyTokenManager:
+    """Process-wide token manager (created on first use)."""
+    global _token_manager
+    if _token_manager is None:
+        _token_manager = GuestyTokenManager(cache, refresh_ahead_sec=settings.GUESTY_TOKEN_REFRESH_AHEAD_SEC)
+    return _token_manager
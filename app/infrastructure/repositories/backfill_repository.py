@@ -0,0 +1,97 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.infrastructure.db.sqlite import db_reader, db_writer
+
+# (listing_ids, start_date, end_date) for one Guesty calendar request.
+BackfillChunk = Tuple[Sequence[str], str, str]
+
+
+class BackfillRepository:
+    """
+    Persists calendar backfill jobs and their chunks. A chunk is marked done only
+    after its days are queued, so a resumed job refetches exactly the unfinished chunks.
+    """
+
+    async def create_job(self, start_date: str, end_date: str, is_simple: bool, chunks: List[BackfillChunk]) -> int:
+        async with db_writer() as conn:
+            await conn.execute("BEGIN IMMEDIATE;")
+            cursor = await conn.execute(
+                "INSERT INTO backfill_job (start_date, end_date, is_simple, total_chunks) VALUES (?, ?, ?, ?)",
+                [start_date, end_date, 1 if is_simple else 0, len(chunks)],
+            )
+            job_id = cursor.lastrowid
+            await conn.executemany(
+                "INSERT INTO backfill_chunk (job_id, chunk_no, listing_ids, start_date, end_date) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, no, ",".join(ids), start, end) for no, (ids, start, end) in enumerate(chunks)],
+            )
+            await conn.commit()
+            return job_id
+
+    async def get_job(self, job_id: int) -> Optional[Dict]:
+        """Job row plus chunk progress totals."""
+        async with db_reader() as conn:
+            row = await (await conn.execute(
+                """
+                SELECT j.*,
+                       COALESCE(SUM(c.done), 0) AS completed_chunks,
+                       COALESCE(SUM(c.done = 0 AND c.last_error IS NOT NULL), 0) AS failed_chunks,
+                       COALESCE(SUM(c.rows_fetched), 0) AS rows_fetched,
+                       COALESCE(SUM(c.rows_queued), 0) AS rows_queued
+                FROM backfill_job j
+                LEFT JOIN backfill_chunk c ON c.job_id = j.id
+                WHERE j.id = ?
+                GROUP BY j.id
+                """,
+                [job_id],
+            )).fetchone()
+            return dict(row) if row else None
+
+    async def list_jobs(self, limit: int = 20) -> List[Dict]:
+        async with db_reader() as conn:
+            rows = await (await conn.execute(
+                "SELECT id FROM backfill_job ORDER BY id DESC LIMIT ?", [limit]
+            )).fetchall()
+        return [await self.get_job(r["id"]) for r in rows]
+
+    async def get_pending_chunks(self, job_id: int) -> List[Dict]:
+        async with db_reader() as conn:
+            rows = await (await conn.execute(
+                "SELECT chunk_no, listing_ids, start_date, end_date FROM backfill_chunk "
+                "WHERE job_id = ? AND done = 0 ORDER BY chunk_no",
+                [job_id],
+            )).fetchall()
+            return [dict(r) for r in rows]
+
+    async def mark_chunk_done(self, job_id: int, chunk_no: int, rows_fetched: int, rows_queued: int) -> None:
+        async with db_writer() as conn:
+            await conn.execute(
+                """
+                UPDATE backfill_chunk
+                SET done = 1, rows_fetched = ?, rows_queued = ?, attempts = attempts + 1, last_error = NULL
+                WHERE job_id = ? AND chunk_no = ?
+                """,
+                [rows_fetched, rows_queued, job_id, chunk_no],
+            )
+            await conn.commit()
+
+    async def mark_chunk_failed(self, job_id: int, chunk_no: int, error: str) -> None:
+        async with db_writer() as conn:
+            await conn.execute(
+                "UPDATE backfill_chunk SET attempts = attempts + 1, last_error = ? WHERE job_id = ? AND chunk_no = ?",
+                [error[:500], job_id, chunk_no],
+            )
+            await conn.commit()
+
+    async def set_job_status(self, job_id: int, status: str, last_error: Optional[str] = None) -> None:
+        finished = status in ("completed", "failed", "cancelled")
+        async with db_writer() as conn:
+            await conn.execute(
+                """
+                UPDATE backfill_job
+                SET status = ?, last_error = ?, updated_at = datetime('now'),
+                    finished_at = CASE WHEN ? THEN datetime('now') ELSE NULL END
+                WHERE id = ?
+                """,
+                [status, last_error, 1 if finished else 0, job_id],
+            )
+            await conn.commit()
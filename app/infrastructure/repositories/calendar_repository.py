@@ -1,7 +1,24 @@
 from __future__ import annotations
+import sqlite3
 from typing import Iterable, List, Optional, Sequence, Tuple
-from app.infrastructure.db.sqlite import open_db
-from datetime import datetime
+from loguru import logger
+from app.config import get_settings
+from app.infrastructure.db.sqlite import db_reader, db_writer
+from app.domain.exceptions.lease_lost import LeaseLostError
+from app.shared.metrics import QUEUE_PENDING
+from app.shared.calendar_rows import CalendarRow, rows_from_days
+from datetime import datetime, timedelta
+from operator import itemgetter
+
+settings = get_settings()
+
+# UPDATE ... RETURNING landed in SQLite 3.35.
+SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Columns the sender needs from a reserved row.
+RESERVED_COLUMNS = "id, listing_id, date, currency, price, is_simple, reclaim_count"
+
+_row_key = itemgetter(0, 1)
 
 class CalendarRepository:
     """
@@ -13,62 +30,165 @@ class CalendarRepository:
         Insert/replace days into the queue. Returns count written.
         'days' are objects with attributes: listingId, date, currency, price, status (optional).
         """
-        to_insert: List[Tuple[str, str, str, float, Optional[str], int, int]] = []
-        for d in days:
-            to_insert.append((
-                getattr(d, "listingId"),
-                getattr(d, "date"),
-                getattr(d, "currency"),
-                float(getattr(d, "price")),
-                getattr(d, "status", None),
-                1 if is_simple else 0,
-                0,  # processed
-            ))
-
-        if not to_insert:
+        return await self.upsert_rows(rows_from_days(days), is_simple)
+
+    async def upsert_rows(self, rows: Sequence[CalendarRow], is_simple: bool) -> int:
+        """
+        Insert/replace queue rows (listing_id, date, currency, price, status). Returns count written.
+        The tuples go to executemany as-is; is_simple is inlined into the statements.
+        Days whose price and currency match the last pushed value in pushed_price_ledger
+        are not queued again (and cancel any stale pending row for the same day).
+        """
+        if not rows:
             return 0
+        flag = 1 if is_simple else 0
 
-        sql = """
+        ledger_match = f"""
+          SELECT 1 FROM pushed_price_ledger l
+          WHERE l.listing_id = ?1 AND l.date = ?2 AND l.is_simple = {flag}
+            AND l.price = ?4 AND l.currency = ?3
+        """
+        # A row that is in flight may end up with a different price upstream,
+        # so its ledger entry can no longer be trusted.
+        forget_in_flight_sql = f"""
+        DELETE FROM pushed_price_ledger
+        WHERE listing_id = ?1 AND date = ?2 AND is_simple = {flag}
+          AND EXISTS (
+            SELECT 1 FROM guesty_calendar_day g
+            WHERE g.listing_id = ?1 AND g.date = ?2 AND g.is_simple = {flag}
+              AND g.processed = 0 AND g.locked_at IS NOT NULL
+          )
+        """
+        cancel_pending_sql = f"""
+        UPDATE guesty_calendar_day
+        SET currency = ?3, price = ?4, status = ?5, processed = 1
+        WHERE listing_id = ?1 AND date = ?2 AND is_simple = {flag}
+          AND processed = 0 AND locked_at IS NULL
+          AND EXISTS ({ledger_match})
+        """
+        upsert_sql = f"""
         INSERT INTO guesty_calendar_day (listing_id, date, currency, price, status, is_simple, processed)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        SELECT ?1, ?2, ?3, ?4, ?5, {flag}, 0
+        WHERE NOT EXISTS ({ledger_match})
         ON CONFLICT(listing_id, date, is_simple) DO UPDATE SET
           currency=excluded.currency,
           price=excluded.price,
           status=excluded.status,
           processed=0,
+          locked_at=NULL,
+          attempts=0,
+          retries=0,
+          next_attempt_at=NULL,
+          last_error=NULL,
           created_at=datetime('now')
         """
-        conn = await open_db()
-        try:
-            await conn.executemany(sql, to_insert)
+        async with db_writer() as conn:
+            await conn.execute("BEGIN IMMEDIATE;")
+            await conn.executemany(forget_in_flight_sql, map(_row_key, rows))
+            await conn.executemany(cancel_pending_sql, rows)
+            cursor = await conn.executemany(upsert_sql, rows)
+            written = max(cursor.rowcount, 0)
+            suppressed = len(rows) - written
+            if suppressed:
+                await self._bump_counter(conn, "suppressed_unchanged_enqueue", suppressed)
             await conn.commit()
-            return len(to_insert)
-        finally:
-            await conn.close()
+            if suppressed:
+                logger.info(f"Suppressed {suppressed} unchanged day(s) already pushed to Booking Experts.")
+            return written
 
-    async def reserve_batch(self, limit: int, is_simple: Optional[bool] = None) -> List[dict]:
+    async def reserve_batch(
+        self,
+        limit: int,
+        is_simple: Optional[bool] = None,
+        lease_ttl_sec: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> List[dict]:
         """
         Reserve a batch (mark locked_at) and return rows as dicts.
-        Uses a transaction to minimize double-reservations.
+        Picks and locks the rows in a single atomic UPDATE ... RETURNING statement.
+        Rows whose lease (locked_at) is older than `lease_ttl_sec` are reclaimed; rows
+        backing off after a failed send (next_attempt_at) are skipped until due.
+        `shard` = (index, count) restricts the pick to price lists hashed to that shard.
+        """
+        if not SUPPORTS_RETURNING:
+            return await self._reserve_batch_legacy(limit, is_simple, lease_ttl_sec, shard)
+
+        now_iso, stale_before = self._lease_bounds(lease_ttl_sec)
+        pick_where, pick_params = self._pick_filter(now_iso, stale_before, is_simple, shard)
+        sql = f"""
+        UPDATE guesty_calendar_day
+        SET locked_at = ?,
+            reclaim_count = reclaim_count + (locked_at IS NOT NULL)
+        WHERE id IN (
+          SELECT g.id FROM guesty_calendar_day g
+          WHERE {pick_where}
+          ORDER BY g.created_at
+          LIMIT ?
+        )
+        RETURNING {RESERVED_COLUMNS}
         """
-        where_flag = "AND is_simple = ?" if is_simple is not None else ""
-        params = [limit] if is_simple is None else [is_simple and 1 or 0, limit]
+        async with db_writer() as conn:
+            fetched = await (await conn.execute(sql, [now_iso, *pick_params, limit])).fetchall()
+            await conn.commit()
+            return [dict(r) for r in fetched]
+
+    @staticmethod
+    def _lease_bounds(lease_ttl_sec: Optional[int]) -> Tuple[str, str]:
+        ttl = settings.QUEUE_LEASE_TTL_SEC if lease_ttl_sec is None else lease_ttl_sec
+        now = datetime.utcnow()
+        return (
+            now.strftime("%Y-%m-%d %H:%M:%S"),
+            (now - timedelta(seconds=ttl)).strftime("%Y-%m-%d %H:%M:%S"),
+        )
+
+    @staticmethod
+    def _pick_filter(
+        now_iso: str, stale_before: str, is_simple: Optional[bool], shard: Optional[Tuple[int, int]]
+    ) -> Tuple[str, list]:
+        """WHERE clause (on alias g) selecting rows that may be reserved."""
+        clauses = [
+            "g.processed = 0",
+            "(g.locked_at IS NULL OR g.locked_at < ?)",
+            "(g.next_attempt_at IS NULL OR g.next_attempt_at <= ?)",
+        ]
+        params: list = [stale_before, now_iso]
+        if is_simple is not None:
+            clauses.append("g.is_simple = ?")
+            params.append(1 if is_simple else 0)
+        if shard is not None and shard[1] > 1:
+            # Unmapped listings hash on their own id so every row belongs to some shard.
+            clauses.append("""shard_of(COALESCE(
+              (SELECT m.booking_experts_price_list_id FROM listing_price_list_mapping m
+               WHERE m.guesty_listing_id = g.listing_id AND m.is_active = 1),
+              g.listing_id), ?) = ?""")
+            params += [shard[1], shard[0]]
+        return " AND ".join(clauses), params
+
+    async def _reserve_batch_legacy(
+        self,
+        limit: int,
+        is_simple: Optional[bool] = None,
+        lease_ttl_sec: Optional[int] = None,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> List[dict]:
+        """
+        Fallback for SQLite builds without RETURNING: pick, lock and fetch
+        inside one IMMEDIATE transaction.
+        """
+        now_iso, stale_before = self._lease_bounds(lease_ttl_sec)
+        pick_where, pick_params = self._pick_filter(now_iso, stale_before, is_simple, shard)
 
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             await conn.execute("BEGIN IMMEDIATE;")
 
             # 1) Pick ids
             pick_sql = f"""
-            SELECT id FROM guesty_calendar_day
-            WHERE processed = 0 AND locked_at IS NULL {where_flag}
-            ORDER BY created_at
+            SELECT g.id FROM guesty_calendar_day g
+            WHERE {pick_where}
+            ORDER BY g.created_at
             LIMIT ?
             """
-            if is_simple is None:
-                rows = await (await conn.execute(pick_sql, params)).fetchall()
-            else:
-                rows = await (await conn.execute(pick_sql, [1 if is_simple else 0, limit])).fetchall()
+            rows = await (await conn.execute(pick_sql, [*pick_params, limit])).fetchall()
 
             if not rows:
                 await conn.commit()
@@ -78,74 +198,216 @@ class CalendarRepository:
             ids_tuple = "(" + ",".join("?" * len(ids)) + ")"
 
             # 2) Lock them
-            now_iso = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-            lock_sql = f"UPDATE guesty_calendar_day SET locked_at=? WHERE id IN {ids_tuple}"
+            lock_sql = (
+                "UPDATE guesty_calendar_day "
+                "SET locked_at=?, reclaim_count = reclaim_count + (locked_at IS NOT NULL) "
+                f"WHERE id IN {ids_tuple}"
+            )
             await conn.execute(lock_sql, [now_iso, *ids])
-            await conn.commit()
 
-            # 3) Fetch locked rows
-            fetch_sql = f"SELECT * FROM guesty_calendar_day WHERE id IN {ids_tuple}"
+            # 3) Fetch locked rows before releasing the write lock
+            fetch_sql = f"SELECT {RESERVED_COLUMNS} FROM guesty_calendar_day WHERE id IN {ids_tuple}"
             fetched = await (await conn.execute(fetch_sql, ids)).fetchall()
+            await conn.commit()
             return [dict(r) for r in fetched]
-        finally:
-            await conn.close()
 
-    async def mark_processed(self, ids: Sequence[int]) -> None:
-        if not ids:
+    async def mark_processed(
+        self, ids: Sequence[int], fence: Optional[Tuple[str, int]] = None, unsent_ids: Sequence[int] = ()
+    ) -> None:
+        """
+        Ack reserved rows and record their values in pushed_price_ledger.
+        `unsent_ids` are acked without a ledger entry (e.g. listings without a price list
+        mapping), so their prices are still sent once a mapping exists.
+        Rows whose lock was cleared by a newer enqueue stay pending.
+        `fence` = (lease name, fencing token): raises LeaseLostError instead of acking
+        if that lease has changed hands since the rows were reserved.
+        """
+        if not ids and not unsent_ids:
             return
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             ids_tuple = "(" + ",".join("?" * len(ids)) + ")"
-            sql = f"UPDATE guesty_calendar_day SET processed=1, locked_at=NULL WHERE id IN {ids_tuple}"
-            await conn.execute(sql, list(ids))
+            all_ids = [*ids, *unsent_ids]
+            all_tuple = "(" + ",".join("?" * len(all_ids)) + ")"
+            ledger_sql = f"""
+            INSERT INTO pushed_price_ledger (listing_id, date, is_simple, price, currency, pushed_at)
+            SELECT listing_id, date, is_simple, price, currency, datetime('now')
+            FROM guesty_calendar_day
+            WHERE id IN {ids_tuple} AND processed = 0 AND locked_at IS NOT NULL
+            ON CONFLICT(listing_id, date, is_simple) DO UPDATE SET
+              price=excluded.price,
+              currency=excluded.currency,
+              pushed_at=excluded.pushed_at
+            """
+            sql = f"UPDATE guesty_calendar_day SET processed=1, locked_at=NULL WHERE id IN {all_tuple} AND locked_at IS NOT NULL"
+            await conn.execute("BEGIN IMMEDIATE;")
+            await self._check_fence(conn, fence)
+            if ids:
+                await conn.execute(ledger_sql, list(ids))
+            await conn.execute(sql, all_ids)
             await conn.commit()
-        finally:
-            await conn.close()
 
-    async def release_locks(self, ids: Sequence[int]) -> None:
-        """Unlock rows after a failure so they can be retried."""
+    async def release_locks(self, ids: Sequence[int], fence: Optional[Tuple[str, int]] = None) -> None:
+        """Unlock rows after a failure so they can be retried. `fence` as in mark_processed."""
         if not ids:
             return
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             ids_tuple = "(" + ",".join("?" * len(ids)) + ")"
             sql = f"UPDATE guesty_calendar_day SET locked_at=NULL WHERE id IN {ids_tuple}"
+            await conn.execute("BEGIN IMMEDIATE;")
+            await self._check_fence(conn, fence)
             await conn.execute(sql, list(ids))
             await conn.commit()
-        finally:
-            await conn.close()
+
+    @staticmethod
+    async def _check_fence(conn, fence: Optional[Tuple[str, int]]) -> None:
+        """
+        Inside the caller's write transaction: roll back and raise LeaseLostError if the
+        `fence` lease changed hands, so a worker that lost its shard leaves the rows alone.
+        """
+        if fence is None:
+            return
+        row = await (await conn.execute(
+            "SELECT owner, fencing_token FROM process_lock WHERE name = ?", [fence[0]]
+        )).fetchone()
+        if row is None or row["owner"] is None or row["fencing_token"] != fence[1]:
+            await conn.rollback()
+            raise LeaseLostError(f"Lease {fence[0]} no longer held with token {fence[1]}.")
+
+    async def schedule_retry(
+        self,
+        ids: Sequence[int],
+        error: str,
+        permanent: bool = True,
+        max_attempts: Optional[int] = None,
+        fence: Optional[Tuple[str, int]] = None,
+    ) -> int:
+        """
+        Unlock rows whose send failed and hold them back with exponential backoff:
+        QUEUE_RETRY_BASE_SEC * 2^(retries - 1), capped at QUEUE_RETRY_MAX_SEC.
+        Only `permanent` failures (Booking Experts rejected the rows) count as attempts;
+        rows that reach `max_attempts` (QUEUE_MAX_ATTEMPTS) move to guesty_calendar_dead_letter.
+        Transient failures (429, 5xx, transport or local errors) only back off, so an
+        outage cannot dead-letter the backlog. Rows whose lock was cleared by a newer
+        enqueue are left alone. `fence` as in mark_processed.
+        Returns the number of rows dead-lettered.
+        """
+        if not ids:
+            return 0
+        max_attempts = settings.QUEUE_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        ids_tuple = "(" + ",".join("?" * len(ids)) + ")"
+        retry_sql = f"""
+        UPDATE guesty_calendar_day
+        SET locked_at = NULL,
+            attempts = attempts + ?,
+            retries = retries + 1,
+            last_error = ?,
+            next_attempt_at = datetime('now', '+' || MIN(? * (1 << MIN(retries, 30)), ?) || ' seconds')
+        WHERE id IN {ids_tuple} AND processed = 0 AND locked_at IS NOT NULL
+        """
+        dead_letter_sql = f"""
+        INSERT INTO guesty_calendar_dead_letter
+          (listing_id, date, currency, price, status, is_simple, attempts, last_error, queued_at)
+        SELECT listing_id, date, currency, price, status, is_simple, attempts, last_error, created_at
+        FROM guesty_calendar_day
+        WHERE id IN {ids_tuple} AND processed = 0 AND attempts >= ?
+        """
+        delete_sql = f"DELETE FROM guesty_calendar_day WHERE id IN {ids_tuple} AND processed = 0 AND attempts >= ?"
+        async with db_writer() as conn:
+            await conn.execute("BEGIN IMMEDIATE;")
+            await self._check_fence(conn, fence)
+            await conn.execute(
+                retry_sql, [int(permanent), error[:1000], settings.QUEUE_RETRY_BASE_SEC, settings.QUEUE_RETRY_MAX_SEC, *ids]
+            )
+            await conn.execute(dead_letter_sql, [*ids, max_attempts])
+            cursor = await conn.execute(delete_sql, [*ids, max_attempts])
+            await conn.commit()
+            dead = max(cursor.rowcount, 0)
+        if dead:
+            logger.warning(f"Moved {dead} row(s) to the dead-letter queue after {max_attempts} failed attempts.")
+        return dead
+
+    async def get_suppression_counters(self) -> dict:
+        """Rows dropped because they matched the last pushed price, by stage."""
+        async with db_reader() as conn:
+            rows = await (await conn.execute(
+                "SELECT name, value FROM pipeline_counter WHERE name LIKE 'suppressed_unchanged_%'"
+            )).fetchall()
+            return {r["name"].replace("suppressed_unchanged_", ""): int(r["value"]) for r in rows}
+
+    @staticmethod
+    async def _bump_counter(conn, name: str, amount: int) -> None:
+        await conn.execute(
+            "INSERT INTO pipeline_counter (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [name, amount],
+        )
 
     async def count_unprocessed(self, is_simple: Optional[bool] = None) -> int:
-        where_flag = "WHERE processed = 0" + ("" if is_simple is None else " AND is_simple = ?")
-        conn = await open_db()
-        try:
-            if is_simple is None:
-                row = await (await conn.execute(f"SELECT COUNT(*) c FROM guesty_calendar_day {where_flag}")).fetchone()
-            else:
-                row = await (await conn.execute(f"SELECT COUNT(*) c FROM guesty_calendar_day {where_flag}", [1 if is_simple else 0])).fetchone()
-            return int(row["c"])
-        finally:
-            await conn.close()
+        """
+        Queue depth from the trigger-maintained pending counters (O(1), no table scan).
+        """
+        if is_simple is None:
+            names = ["pending_simple", "pending_complex"]
+        else:
+            names = ["pending_simple" if is_simple else "pending_complex"]
+        async with db_reader() as conn:
+            row = await (await conn.execute(
+                f"SELECT COALESCE(SUM(value), 0) c FROM pipeline_counter WHERE name IN ({','.join('?' * len(names))})",
+                names,
+            )).fetchone()
+            pending = max(int(row["c"]), 0)
+            QUEUE_PENDING.set(pending, is_simple="all" if is_simple is None else int(is_simple))
+            return pending
+
+    async def delete_processed_chunk(self, created_before: str, limit: int) -> int:
+        """
+        Delete up to `limit` processed rows last queued before `created_before`
+        ('%Y-%m-%d %H:%M:%S'). Kept small so the write lock is held briefly.
+        """
+        async with db_writer() as conn:
+            cursor = await conn.execute(
+                """
+                DELETE FROM guesty_calendar_day WHERE id IN (
+                  SELECT id FROM guesty_calendar_day
+                  WHERE processed = 1 AND created_at < ?
+                  LIMIT ?
+                )
+                """,
+                [created_before, limit],
+            )
+            await conn.commit()
+            return cursor.rowcount
+
+    async def delete_ledger_before(self, date: str, limit: int) -> int:
+        """Forget pushed prices for calendar days before `date` (yyyy-mm-dd)."""
+        async with db_writer() as conn:
+            cursor = await conn.execute(
+                """
+                DELETE FROM pushed_price_ledger WHERE (listing_id, date, is_simple) IN (
+                  SELECT listing_id, date, is_simple FROM pushed_price_ledger WHERE date < ? LIMIT ?
+                )
+                """,
+                [date, limit],
+            )
+            await conn.commit()
+            return cursor.rowcount
 
     async def get_pending_prices_summary(self) -> List[dict]:
         """
         Get pending prices grouped by created_at date and hour.
         Returns list of dicts with date, hour, count, and is_simple.
+        Reads the trigger-maintained pending_hourly_rollup, so the cost does not grow with the backlog.
         """
-        conn = await open_db()
-        try:
+        async with db_reader() as conn:
             sql = """
-            SELECT 
-                DATE(created_at) as date,
-                CAST(STRFTIME('%H', created_at) AS INTEGER) as hour,
+            SELECT
+                SUBSTR(hour_bucket, 1, 10) as date,
+                CAST(SUBSTR(hour_bucket, 12, 2) AS INTEGER) as hour,
                 is_simple,
-                COUNT(*) as count
-            FROM guesty_calendar_day 
-            WHERE processed = 0
-            GROUP BY DATE(created_at), STRFTIME('%H', created_at), is_simple
-            ORDER BY date DESC, hour DESC, is_simple
+                count
+            FROM pending_hourly_rollup
+            WHERE count > 0
+            ORDER BY hour_bucket DESC, is_simple
             """
             rows = await (await conn.execute(sql)).fetchall()
-            return [dict(r) for r in rows]
-        finally:
-            await conn.close()
\ No newline at end of file
+            return [dict(r) for r in rows]
\ No newline at end of file
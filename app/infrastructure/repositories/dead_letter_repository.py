@@ -0,0 +1,70 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.infrastructure.db.sqlite import db_reader, db_writer
+
+
+class DeadLetterRepository:
+    """
+    Calendar days that Booking Experts rejected QUEUE_MAX_ATTEMPTS times (moved here by
+    CalendarRepository.schedule_retry), kept for inspection and requeueing.
+    """
+
+    @staticmethod
+    def _filter(ids: Optional[Sequence[int]], listing_id: Optional[str]) -> Tuple[str, list]:
+        clauses, params = [], []
+        if ids is not None:
+            clauses.append(f"d.id IN ({','.join('?' * len(ids))})")
+            params += list(ids)
+        if listing_id is not None:
+            clauses.append("d.listing_id = ?")
+            params.append(listing_id)
+        return " AND ".join(clauses) or "1 = 1", params
+
+    async def list_dead_letters(self, limit: int = 100, listing_id: Optional[str] = None) -> List[Dict]:
+        """Most recently dead-lettered rows first."""
+        where, params = self._filter(None, listing_id)
+        async with db_reader() as conn:
+            rows = await (await conn.execute(
+                f"SELECT * FROM guesty_calendar_dead_letter d WHERE {where} ORDER BY d.dead_at DESC, d.id DESC LIMIT ?",
+                [*params, limit],
+            )).fetchall()
+            return [dict(r) for r in rows]
+
+    async def requeue(self, ids: Optional[Sequence[int]] = None, listing_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Put dead-lettered rows back in the queue with a fresh attempt budget and remove
+        them from the dead-letter table. Days Guesty re-sent after the row was dead-lettered
+        already have a newer queue row and are only removed ("superseded").
+        """
+        if ids is not None and not ids:
+            return {"requeued": 0, "superseded": 0}
+        where, params = self._filter(ids, listing_id)
+        requeue_sql = f"""
+        INSERT INTO guesty_calendar_day (listing_id, date, currency, price, status, is_simple, processed)
+        SELECT d.listing_id, d.date, d.currency, d.price, d.status, d.is_simple, 0
+        FROM guesty_calendar_dead_letter d
+        WHERE {where}
+          AND NOT EXISTS (
+            SELECT 1 FROM guesty_calendar_day g
+            WHERE g.listing_id = d.listing_id AND g.date = d.date AND g.is_simple = d.is_simple
+              AND g.created_at >= d.dead_at
+          )
+        ON CONFLICT(listing_id, date, is_simple) DO UPDATE SET
+          currency=excluded.currency,
+          price=excluded.price,
+          status=excluded.status,
+          processed=0,
+          locked_at=NULL,
+          attempts=0,
+          retries=0,
+          next_attempt_at=NULL,
+          last_error=NULL,
+          created_at=datetime('now')
+        """
+        delete_sql = f"DELETE FROM guesty_calendar_dead_letter AS d WHERE {where}"
+        async with db_writer() as conn:
+            await conn.execute("BEGIN IMMEDIATE;")
+            requeued = max((await conn.execute(requeue_sql, params)).rowcount, 0)
+            removed = max((await conn.execute(delete_sql, params)).rowcount, 0)
+            await conn.commit()
+            return {"requeued": requeued, "superseded": removed - requeued}
@@ -1,6 +1,28 @@
 from __future__ import annotations
 from typing import List, Optional, Dict
-from app.infrastructure.db.sqlite import open_db
+from app.infrastructure.db.sqlite import db_reader, db_writer
+
+
+class ListingPriceListMappingCache:
+    """
+    Process-wide snapshot of active guesty_listing_id -> booking_experts_price_list_id.
+    Local writes invalidate it directly; writes from other processes are detected
+    through the trigger-maintained listing_price_list_mapping_version row.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.mapping: Dict[str, str] = {}
+
+    def invalidate(self) -> None:
+        self.version = None
+
+
+_mapping_cache = ListingPriceListMappingCache()
+
+
+def get_mapping_cache() -> ListingPriceListMappingCache:
+    return _mapping_cache
 
 
 class ListingPriceListRepository:
@@ -17,8 +39,7 @@ class ListingPriceListRepository:
         Create a new listing to price list mapping.
         Returns the ID of the created mapping.
         """
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             sql = """
             INSERT INTO listing_price_list_mapping 
             (guesty_listing_id, booking_experts_price_list_id, is_active)
@@ -26,38 +47,31 @@ class ListingPriceListRepository:
             """
             cursor = await conn.execute(sql, [guesty_listing_id, booking_experts_price_list_id])
             await conn.commit()
+            get_mapping_cache().invalidate()
             return cursor.lastrowid
-        finally:
-            await conn.close()
 
     async def get_mapping(self, guesty_listing_id: str) -> Optional[Dict]:
         """
         Get the price list mapping for a specific Guesty listing ID.
         Returns None if not found or inactive.
         """
-        conn = await open_db()
-        try:
+        async with db_reader() as conn:
             sql = """
             SELECT * FROM listing_price_list_mapping 
             WHERE guesty_listing_id = ? AND is_active = 1
             """
             row = await (await conn.execute(sql, [guesty_listing_id])).fetchone()
             return dict(row) if row else None
-        finally:
-            await conn.close()
 
     async def get_all_mappings(self, active_only: bool = True) -> List[Dict]:
         """
         Get all listing to price list mappings.
         """
-        conn = await open_db()
-        try:
+        async with db_reader() as conn:
             where_clause = "WHERE is_active = 1" if active_only else ""
             sql = f"SELECT * FROM listing_price_list_mapping {where_clause} ORDER BY created_at DESC"
             rows = await (await conn.execute(sql)).fetchall()
             return [dict(row) for row in rows]
-        finally:
-            await conn.close()
 
     async def update_mapping(
         self, 
@@ -68,8 +82,7 @@ class ListingPriceListRepository:
         Update the price list for a specific Guesty listing ID.
         Returns True if updated, False if not found.
         """
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             sql = """
             UPDATE listing_price_list_mapping 
             SET booking_experts_price_list_id = ?, updated_at = datetime('now')
@@ -77,17 +90,15 @@ class ListingPriceListRepository:
             """
             cursor = await conn.execute(sql, [booking_experts_price_list_id, guesty_listing_id])
             await conn.commit()
+            get_mapping_cache().invalidate()
             return cursor.rowcount > 0
-        finally:
-            await conn.close()
 
     async def deactivate_mapping(self, guesty_listing_id: str) -> bool:
         """
         Deactivate a listing to price list mapping.
         Returns True if deactivated, False if not found.
         """
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             sql = """
             UPDATE listing_price_list_mapping 
             SET is_active = 0, updated_at = datetime('now')
@@ -95,32 +106,50 @@ class ListingPriceListRepository:
             """
             cursor = await conn.execute(sql, [guesty_listing_id])
             await conn.commit()
+            get_mapping_cache().invalidate()
             return cursor.rowcount > 0
-        finally:
-            await conn.close()
 
     async def get_price_list_for_listing(self, guesty_listing_id: str) -> Optional[str]:
         """
         Get the Booking Experts price list ID for a Guesty listing.
         Returns None if not found or inactive.
         """
-        mapping = await self.get_mapping(guesty_listing_id)
-        return mapping["booking_experts_price_list_id"] if mapping else None
+        price_lists = await self.get_price_list_map()
+        return price_lists.get(guesty_listing_id)
+
+    async def get_price_list_map(self) -> Dict[str, str]:
+        """
+        Get all active listing -> price list pairs from the in-memory snapshot.
+        Costs a single version lookup when the snapshot is still current.
+        """
+        cache = get_mapping_cache()
+        async with db_reader() as conn:
+            row = await (await conn.execute(
+                "SELECT version FROM listing_price_list_mapping_version WHERE id = 1"
+            )).fetchone()
+            version = row["version"] if row else 0
+            if cache.version == version:
+                return cache.mapping
+
+            rows = await (await conn.execute(
+                "SELECT guesty_listing_id, booking_experts_price_list_id "
+                "FROM listing_price_list_mapping WHERE is_active = 1"
+            )).fetchall()
+            cache.mapping = {r["guesty_listing_id"]: r["booking_experts_price_list_id"] for r in rows}
+            cache.version = version
+            return cache.mapping
 
     async def get_listings_for_price_list(self, booking_experts_price_list_id: str) -> List[str]:
         """
         Get all Guesty listing IDs that are mapped to a specific price list.
         """
-        conn = await open_db()
-        try:
+        async with db_reader() as conn:
             sql = """
             SELECT guesty_listing_id FROM listing_price_list_mapping 
             WHERE booking_experts_price_list_id = ? AND is_active = 1
             """
             rows = await (await conn.execute(sql, [booking_experts_price_list_id])).fetchall()
             return [row["guesty_listing_id"] for row in rows]
-        finally:
-            await conn.close()
 
     async def bulk_create_mappings(self, mappings: List[Dict[str, str]]) -> int:
         """
@@ -131,8 +160,7 @@ class ListingPriceListRepository:
         if not mappings:
             return 0
 
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             sql = """
             INSERT OR REPLACE INTO listing_price_list_mapping 
             (guesty_listing_id, booking_experts_price_list_id, is_active)
@@ -141,6 +169,5 @@ class ListingPriceListRepository:
             data = [(m["guesty_listing_id"], m["booking_experts_price_list_id"]) for m in mappings]
             await conn.executemany(sql, data)
             await conn.commit()
+            get_mapping_cache().invalidate()
             return len(data)
-        finally:
-            await conn.close()
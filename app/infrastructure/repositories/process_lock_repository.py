@@ -1,7 +1,6 @@
 from typing import Optional
 from datetime import datetime, timedelta
-import aiosqlite
-from app.infrastructure.db.sqlite import open_db
+from app.infrastructure.db.sqlite import db_reader, db_writer
 
 class ProcessLockRepository:
     async def acquire_worker_lock(self, name: str, ttl_seconds: int = 300) -> bool:
@@ -9,8 +8,7 @@ class ProcessLockRepository:
         Try to acquire a named lock with a TTL. Returns True if acquired.
         Safe for SQLite because we rely on a simple upsert + time check.
         """
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             await conn.execute("BEGIN IMMEDIATE;")
             row = await (await conn.execute(
                 "SELECT acquired_at FROM process_lock WHERE name = ?", [name]
@@ -33,22 +31,82 @@ class ProcessLockRepository:
                 )
             await conn.commit()
             return True
-        finally:
-            await conn.close()
 
     async def refresh_worker_lock(self, name: str) -> None:
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
             await conn.execute("UPDATE process_lock SET acquired_at=? WHERE name=?", [now, name])
             await conn.commit()
-        finally:
-            await conn.close()
 
     async def release_worker_lock(self, name: str) -> None:
-        conn = await open_db()
-        try:
+        async with db_writer() as conn:
             await conn.execute("DELETE FROM process_lock WHERE name=?", [name])
             await conn.commit()
-        finally:
-            await conn.close()
+
+    async def acquire_lease(self, name: str, owner: str, ttl_seconds: int) -> Optional[int]:
+        """
+        Acquire or renew a fenced lease. Returns the fencing token when `owner` holds
+        the lease afterwards, None when another live owner has it.
+        The token only changes when the lease changes hands.
+        """
+        async with db_writer() as conn:
+            await conn.execute("BEGIN IMMEDIATE;")
+            row = await (await conn.execute(
+                "SELECT acquired_at, owner, fencing_token FROM process_lock WHERE name = ?", [name]
+            )).fetchone()
+            now = datetime.utcnow()
+            now_iso = now.strftime("%Y-%m-%d %H:%M:%S")
+            if row is None:
+                token = 1
+                await conn.execute(
+                    "INSERT INTO process_lock (name, acquired_at, owner, fencing_token) VALUES (?, ?, ?, ?)",
+                    [name, now_iso, owner, token]
+                )
+            elif row["owner"] == owner:
+                token = row["fencing_token"]
+                await conn.execute("UPDATE process_lock SET acquired_at = ? WHERE name = ?", [now_iso, name])
+            else:
+                acquired_at = datetime.strptime(row["acquired_at"], "%Y-%m-%d %H:%M:%S")
+                if row["owner"] is not None and now - acquired_at < timedelta(seconds=ttl_seconds):
+                    await conn.commit()
+                    return None
+                # free or stale -> take over with a new token
+                token = row["fencing_token"] + 1
+                await conn.execute(
+                    "UPDATE process_lock SET acquired_at = ?, owner = ?, fencing_token = ? WHERE name = ?",
+                    [now_iso, owner, token, name]
+                )
+            await conn.commit()
+            return token
+
+    async def renew_lease(self, name: str, owner: str, fencing_token: int) -> bool:
+        """Extend a lease we still hold. Returns False if it was taken over."""
+        async with db_writer() as conn:
+            now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+            cursor = await conn.execute(
+                "UPDATE process_lock SET acquired_at = ? WHERE name = ? AND owner = ? AND fencing_token = ?",
+                [now, name, owner, fencing_token]
+            )
+            await conn.commit()
+            return cursor.rowcount > 0
+
+    async def release_lease(self, name: str, owner: str, fencing_token: int) -> None:
+        """
+        Free a lease without deleting its row, so the next owner gets a higher token.
+        """
+        async with db_writer() as conn:
+            await conn.execute(
+                "UPDATE process_lock SET owner = NULL, acquired_at = '1970-01-01 00:00:00' "
+                "WHERE name = ? AND owner = ? AND fencing_token = ?",
+                [name, owner, fencing_token]
+            )
+            await conn.commit()
+
+    async def count_live_leases(self, name_prefix: str, ttl_seconds: int) -> int:
+        async with db_reader() as conn:
+            cutoff = (datetime.utcnow() - timedelta(seconds=ttl_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+            row = await (await conn.execute(
+                "SELECT COUNT(*) c FROM process_lock WHERE name LIKE ? AND owner IS NOT NULL AND acquired_at >= ?",
+                [f"{name_prefix}%", cutoff]
+            )).fetchone()
+            return int(row["c"])
@@ -1,13 +1,35 @@
 from fastapi import FastAPI
 from app.api.v1.router import router
 from app.api.v1.listing_mappings_router import router as listing_mappings_router
-from app.infrastructure.db.sqlite import init_db
+from app.api.v1.backfill_router import router as backfill_router
+from app.api.v1.admin_router import router as admin_router
+from app.api.v1.dead_letter_router import router as dead_letter_router
+from app.api.metrics_router import router as metrics_router
+from app.infrastructure.db.sqlite import init_db, get_pool
+from app.shared.http_clients import get_http_client_pool
+from app.shared.alert_dispatcher import get_alert_dispatcher
+from app.shared.dependencies import get_calendar_backfill_service, get_calendar_ingestion_buffer
 
 app = FastAPI(title="Guesty Integration")
 
 app.include_router(router, prefix="/api/v1/listener", tags=["Listener"])
 app.include_router(listing_mappings_router, prefix="/api/v1/listing-mappings", tags=["Listing Mappings"])
+app.include_router(backfill_router, prefix="/api/v1/backfill-jobs", tags=["Backfill"])
+app.include_router(dead_letter_router, prefix="/api/v1/dead-letters", tags=["Dead Letters"])
+app.include_router(admin_router, prefix="/api/v1/admin", tags=["Admin"])
+app.include_router(metrics_router)
 
 @app.on_event("startup")
 async def _init():
     await init_db()
+    await get_pool().open()
+    await get_calendar_ingestion_buffer().start()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    # Flush accepted webhook data before the pool goes away.
+    await get_calendar_ingestion_buffer().stop()
+    await get_calendar_backfill_service().stop()
+    await get_alert_dispatcher().stop()
+    await get_http_client_pool().aclose()
+    await get_pool().close()
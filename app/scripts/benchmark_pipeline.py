@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark:
+  webhook (ASGI) -> EnqueueCalendarPricesService -> SQLite
+  -> SyncCalendarPricesService.drain_queue_tick -> APIBookingExpertsClient -> stub
+
+Booking Experts is an httpx.MockTransport with configurable latency. Reports
+rows/sec, p50/p99 webhook-to-ack latency and DB time per stage, writes the
+result as JSON and can compare it with a previous baseline:
+
+  python app/scripts/benchmark_pipeline.py --output bench.json
+  python app/scripts/benchmark_pipeline.py --compare bench.json
+
+Always runs against a scratch database (BENCHMARK_DB_PATH or a temp dir).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+# The API modules also import from the app directory itself (as uvicorn main:app does).
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Settings are read on import, so the scratch database must be set first.
+_scratch_dir = tempfile.mkdtemp(prefix="guesty-bench-")
+os.environ["SQLITE_DB_PATH"] = os.environ.get("BENCHMARK_DB_PATH") or os.path.join(_scratch_dir, "bench.sqlite")
+os.environ["ALERT_SINK"] = "file"
+os.environ["ALERT_FILE_PATH"] = os.path.join(_scratch_dir, "alerts.log")
+
+import httpx
+
+from app.main import app
+from app.infrastructure.db.sqlite import init_db, get_pool
+from app.infrastructure.booking_experts.booking_experts_client import APIBookingExpertsClient
+from app.infrastructure.booking_experts.rate_limiter import AdaptiveRateLimiter
+from app.infrastructure.repositories.calendar_repository import CalendarRepository
+from app.infrastructure.repositories.listing_price_list_repository import ListingPriceListRepository
+from app.infrastructure.repositories.process_lock_repository import ProcessLockRepository
+from app.application.sync_calendar_prices_service import SyncCalendarPricesService
+from app.shared.dependencies import get_calendar_ingestion_buffer
+
+
+class TimedCalendarRepository(CalendarRepository):
+    """Records time spent in each DB stage and when every row was acked."""
+
+    def __init__(self):
+        self.db_time = defaultdict(lambda: {"calls": 0, "total_ms": 0.0})
+        self.reserved = {}
+        self.acked_at = {}
+
+    async def _timed(self, stage, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            entry = self.db_time[stage]
+            entry["calls"] += 1
+            entry["total_ms"] += (time.perf_counter() - start) * 1000
+
+    async def upsert_rows(self, rows, is_simple):
+        return await self._timed("enqueue_upsert", super().upsert_rows(rows, is_simple))
+
+    async def reserve_batch(self, *args, **kwargs):
+        rows = await self._timed("reserve_batch", super().reserve_batch(*args, **kwargs))
+        for r in rows:
+            self.reserved[r["id"]] = (r["listing_id"], r["date"])
+        return rows
+
+    async def mark_processed(self, ids, fence=None, unsent_ids=()):
+        result = await self._timed("mark_processed", super().mark_processed(ids, fence=fence, unsent_ids=unsent_ids))
+        now = time.perf_counter()
+        for row_id in [*ids, *unsent_ids]:
+            self.acked_at[self.reserved.pop(row_id)] = now
+        return result
+
+    async def schedule_retry(self, ids, error, permanent=True, max_attempts=None, fence=None):
+        return await self._timed("schedule_retry", super().schedule_retry(ids, error, permanent, max_attempts, fence))
+
+
+def booking_experts_stub(latency_ms: float, patches: list) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        patches.append(len(request.content))
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000.0)
+        return httpx.Response(200, json={"data": {}})
+    return httpx.MockTransport(handler)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), text=True, stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return None
+
+
+async def run_benchmark(args) -> dict:
+    await init_db()
+    await get_pool().open()
+
+    listings = [f"bench-listing-{i}" for i in range(args.listings)]
+    await ListingPriceListRepository().bulk_create_mappings([
+        {"guesty_listing_id": l, "booking_experts_price_list_id": f"bench-pl-{i % args.price_lists}"}
+        for i, l in enumerate(listings)
+    ])
+
+    repository = TimedCalendarRepository()
+    buffer = get_calendar_ingestion_buffer()
+    buffer.enqueue_service.repository = repository
+
+    patches = []
+    limiter = AdaptiveRateLimiter(rate=1e6, min_rate=1e6, max_rate=1e6, increase=0, decrease_factor=1)
+    be_http = httpx.AsyncClient(transport=booking_experts_stub(args.be_latency_ms, patches))
+    sync_service = SyncCalendarPricesService(
+        repository, ProcessLockRepository(), ListingPriceListRepository(),
+        APIBookingExpertsClient(http_client=be_http, rate_limiter=limiter),
+    )
+    api = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    sent_at = {}
+    webhook_ms = []
+    first_day = date.today() + timedelta(days=1)
+    total_rows = args.webhooks * args.days_per_webhook
+
+    async def produce():
+        for n in range(args.webhooks):
+            listing = listings[n % len(listings)]
+            offset = (n // len(listings)) * args.days_per_webhook
+            days = [
+                {
+                    "date": (first_day + timedelta(days=offset + d)).isoformat(),
+                    "listingId": listing,
+                    "price": 100 + n,
+                    "status": "available",
+                    "currency": "EUR",
+                }
+                for d in range(args.days_per_webhook)
+            ]
+            now = time.perf_counter()
+            for day in days:
+                sent_at[(listing, day["date"])] = now
+            resp = await api.post("/api/v1/listener/listing-calendar-update", json={"calendar": days})
+            resp.raise_for_status()
+            webhook_ms.append((time.perf_counter() - now) * 1000)
+
+    async def drain(producer: asyncio.Task):
+        last_progress = time.perf_counter()
+        while len(repository.acked_at) < total_rows:
+            processed = await sync_service.drain_queue_tick(
+                is_simple=False,
+                batch_size=args.batch_size,
+                max_batches_this_tick=5,
+                max_concurrent_patches=args.patch_concurrency,
+            )
+            if processed:
+                last_progress = time.perf_counter()
+                continue
+            if producer.done() and time.perf_counter() - last_progress > args.stall_timeout_sec:
+                print(f"⚠️ No progress for {args.stall_timeout_sec}s; {total_rows - len(repository.acked_at)} row(s) never acked.")
+                return
+            await asyncio.sleep(0.005)
+
+    start = time.perf_counter()
+    producer = asyncio.create_task(produce())
+    await asyncio.gather(producer, drain(producer))
+    elapsed = time.perf_counter() - start
+
+    latencies = [(repository.acked_at[k] - t) * 1000 for k, t in sent_at.items() if k in repository.acked_at]
+    await api.aclose()
+    await be_http.aclose()
+    await buffer.stop()
+    await get_pool().close()
+
+    return {
+        "commit": git_commit(),
+        "config": vars(args) | {"output": None, "compare": None},
+        "rows": total_rows,
+        "rows_acked": len(latencies),
+        "elapsed_sec": round(elapsed, 3),
+        "rows_per_sec": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) or 0, 2),
+            "p99": round(percentile(latencies, 99) or 0, 2),
+        },
+        "webhook_ms": {
+            "p50": round(percentile(webhook_ms, 50) or 0, 2),
+            "p99": round(percentile(webhook_ms, 99) or 0, 2),
+        },
+        "db_time_ms": {
+            stage: {"calls": v["calls"], "total_ms": round(v["total_ms"], 1)}
+            for stage, v in sorted(repository.db_time.items())
+        },
+        "be_patches": len(patches),
+        "be_bytes": sum(patches),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the change against `baseline`; False if throughput or p99 regressed beyond `tolerance`."""
+    ok = True
+    checks = [
+        ("rows_per_sec", result["rows_per_sec"], baseline.get("rows_per_sec"), True),
+        ("latency p99 ms", result["latency_ms"]["p99"], baseline.get("latency_ms", {}).get("p99"), False),
+    ]
+    for name, now, before, higher_is_better in checks:
+        if not before:
+            continue
+        change = (now - before) / before
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        print(f"{'❌' if regressed else '✅'} {name}: {before} -> {now} ({change:+.1%}) vs {baseline.get('commit')}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--webhooks", type=int, default=200)
+    parser.add_argument("--days-per-webhook", type=int, default=30)
+    parser.add_argument("--listings", type=int, default=20)
+    parser.add_argument("--price-lists", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--patch-concurrency", type=int, default=4)
+    parser.add_argument("--be-latency-ms", type=float, default=20.0, help="Simulated Booking Experts latency")
+    parser.add_argument("--stall-timeout-sec", type=float, default=10.0)
+    parser.add_argument("--output", help="Write the result JSON here (e.g. a baseline)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression (fraction)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Baseline written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        sys.exit(0 if compare(result, baseline, args.tolerance) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Print a bearer token for the admin endpoints (/api/v1/admin/* on the API,
+/debug/profile on the worker's metrics port), signed with SECRET_KEY.
+
+  curl -H "Authorization: Bearer $(python app/scripts/issue_admin_token.py)" \
+       "http://localhost:9101/debug/profile?seconds=10&mode=cpu"
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from app.shared.security import create_admin_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subject", default=os.getenv("USER", "admin"))
+    parser.add_argument("--expires-minutes", type=int, help="Defaults to ACCESS_TOKEN_EXPIRE_MINUTES")
+    args = parser.parse_args()
+    print(create_admin_token(args.subject, args.expires_minutes))
+
+
+if __name__ == "__main__":
+    main()
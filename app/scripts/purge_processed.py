@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Delete processed calendar queue rows older than the retention window and
+reclaim the freed space with an incremental vacuum.
+The worker runs the same job every WORKER_RETENTION_INTERVAL_SEC.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from app.infrastructure.db.sqlite import init_db, get_pool, open_db
+from app.infrastructure.repositories.calendar_repository import CalendarRepository
+from app.application.queue_retention_service import QueueRetentionService
+
+
+async def convert_to_incremental_vacuum():
+    """
+    auto_vacuum can only change through a full VACUUM. Run once, while the
+    worker is stopped: it rewrites the whole file.
+    """
+    conn = await open_db()
+    try:
+        await conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+        await conn.execute("VACUUM;")
+        mode = (await (await conn.execute("PRAGMA auto_vacuum")).fetchone())[0]
+        print(f"✅ auto_vacuum mode is now {mode} (2 = incremental)")
+    finally:
+        await conn.close()
+
+
+async def run_purge(args) -> bool:
+    await init_db()
+    try:
+        if args.convert_incremental_vacuum:
+            await convert_to_incremental_vacuum()
+        service = QueueRetentionService(CalendarRepository())
+        result = await service.purge(
+            retention_days=args.days,
+            chunk_size=args.chunk_size,
+            vacuum=not args.no_vacuum,
+        )
+        print(f"🧹 Deleted {result['deleted_rows']} processed row(s)")
+        print(f"🧹 Deleted {result['deleted_ledger_rows']} ledger row(s)")
+        print(f"💾 Reclaimed {result['reclaimed_bytes']} bytes")
+        return True
+    except Exception as e:
+        print(f"❌ Purge failed: {e}")
+        return False
+    finally:
+        await get_pool().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=None, help="Retention in days (default: QUEUE_RETENTION_DAYS)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per delete (default: QUEUE_PURGE_CHUNK_SIZE)")
+    parser.add_argument("--no-vacuum", action="store_true", help="Skip PRAGMA incremental_vacuum")
+    parser.add_argument(
+        "--convert-incremental-vacuum",
+        action="store_true",
+        help="One-off VACUUM that switches an existing database to auto_vacuum=INCREMENTAL",
+    )
+    success = asyncio.run(run_purge(parser.parse_args()))
+    sys.exit(0 if success else 1)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, Optional, Tuple
+from loguru import logger
+from app.config import get_settings
+from app.shared.email_logger import send_execution_email
+
+settings = get_settings()
+
+DETAILS_MAX_CHARS = 1000
+
+
+class SmtpAlertSink:
+    def send(self, subject: str, body: str) -> None:
+        send_execution_email(subject=subject, body=body)
+
+
+class FileAlertSink:
+    """Appends alerts to a local file (development and tests)."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def send(self, subject: str, body: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(f"Subject: {subject}\n{body}\n\n")
+
+
+class AlertDispatcher:
+    """
+    Collects error alerts without blocking the caller and emails one summary per
+    window. Identical errors (same subject and message) are counted instead of
+    repeated, at most `max_pending` distinct errors are kept per window (the rest
+    are only counted), at most `max_per_hour` summaries are sent, and the sink runs
+    in a worker thread so SMTP never blocks the event loop.
+    """
+
+    def __init__(self, sink, window_sec: float = 60.0, max_per_hour: int = 10, max_pending: int = 100):
+        self.sink = sink
+        self.window_sec = window_sec
+        self.max_per_hour = max_per_hour
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        self._dropped = 0
+        self._sent_at: Deque[float] = deque()
+        self._task: Optional[asyncio.Task] = None
+
+    def alert(self, subject: str, err: Exception, details=None) -> None:
+        """Record an error; returns immediately."""
+        key = (subject, f"{type(err).__name__}: {err}"[:300])
+        now = time.time()
+        entry = self._pending.get(key)
+        if entry:
+            entry["count"] += 1
+            entry["last_seen"] = now
+        elif len(self._pending) >= self.max_pending:
+            self._dropped += 1
+        else:
+            self._pending[key] = {
+                "count": 1,
+                "first_seen": now,
+                "last_seen": now,
+                "details": str(details)[:DETAILS_MAX_CHARS] if details else "-",
+            }
+        self._ensure_flusher()
+
+    async def flush(self) -> bool:
+        """Send everything collected so far as one summary. Returns False when there was nothing to send or the hourly limit is reached."""
+        if not self._pending and not self._dropped:
+            return False
+        now = time.time()
+        while self._sent_at and now - self._sent_at[0] > 3600:
+            self._sent_at.popleft()
+        if len(self._sent_at) >= self.max_per_hour:
+            logger.warning(f"Alert rate limit reached; {len(self._pending)} error(s) held for the next window.")
+            return False
+
+        pending, self._pending = self._pending, {}
+        dropped, self._dropped = self._dropped, 0
+        self._sent_at.append(now)
+        subject, body = self._summarize(pending, dropped)
+        try:
+            await asyncio.to_thread(self.sink.send, subject, body)
+        except Exception as e:
+            logger.error(f"Failed to send alert '{subject}': {e}")
+        return True
+
+    async def stop(self) -> None:
+        """Stop the flusher and send what is left (still subject to the hourly limit)."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if not await self.flush() and self._pending:
+            logger.warning(f"Discarding {len(self._pending)} unsent alert(s) on shutdown.")
+
+    def _ensure_flusher(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop: sent by the next flush()/stop()
+        task = self._task
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._pending or self._dropped:
+            await asyncio.sleep(self.window_sec)
+            await self.flush()
+
+    def _summarize(self, pending: Dict[Tuple[str, str], dict], dropped: int) -> Tuple[str, str]:
+        total = sum(e["count"] for e in pending.values()) + dropped
+        if len(pending) == 1 and not dropped:
+            (subject, _), entry = next(iter(pending.items()))
+            subject = f"{subject} ({entry['count']}x)" if entry["count"] > 1 else subject
+        else:
+            subject = f"{total} errors ({len(pending)} distinct) in the Guesty integration"
+
+        parts = []
+        for (title, error), entry in sorted(pending.items(), key=lambda item: -item[1]["count"]):
+            parts.append(
+                f"{title}\n"
+                f"Error: {error}\n"
+                f"Occurrences: {entry['count']} "
+                f"(first {_fmt(entry['first_seen'])}, last {_fmt(entry['last_seen'])})\n"
+                f"Details (first occurrence, truncated): {entry['details']}"
+            )
+        if dropped:
+            parts.append(f"{dropped} more error(s) not itemized (more than {self.max_pending} distinct errors).")
+        return subject, "\n\n".join(parts)
+
+
+def _fmt(ts: float) -> str:
+    return datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def _build_sink():
+    if settings.ALERT_SINK == "file":
+        return FileAlertSink(settings.ALERT_FILE_PATH)
+    return SmtpAlertSink()
+
+
+_alert_dispatcher = AlertDispatcher(
+    _build_sink(),
+    window_sec=settings.ALERT_WINDOW_SEC,
+    max_per_hour=settings.ALERT_MAX_PER_HOUR,
+    max_pending=settings.ALERT_MAX_PENDING,
+)
+
+
+def get_alert_dispatcher() -> AlertDispatcher:
+    return _alert_dispatcher
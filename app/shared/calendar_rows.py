@@ -0,0 +1,63 @@
+from operator import itemgetter
+from typing import AsyncIterator, Iterable, List, Tuple
+
+from pydantic import TypeAdapter
+
+from app.api.v1.schemas.guesty_schema import CalendarPayload, DayRow
+
+# Queue row as handed to executemany: (listing_id, date, currency, price, status)
+CalendarRow = Tuple[str, str, str, float, str]
+
+_payload_adapter = TypeAdapter(CalendarPayload)
+_days_adapter = TypeAdapter(List[DayRow])
+_day_adapter = TypeAdapter(DayRow)
+_as_row = itemgetter("listingId", "date", "currency", "price", "status")
+
+
+def rows_from_json(body: bytes) -> List[CalendarRow]:
+    """Validate a `{"calendar": [...]}` webhook body in one pass and return queue rows."""
+    return list(map(_as_row, _payload_adapter.validate_json(body)["calendar"]))
+
+
+def rows_from_python(days: Iterable[dict]) -> List[CalendarRow]:
+    """Validate already-decoded day dicts (e.g. Guesty's calendar API response)."""
+    return list(map(_as_row, _days_adapter.validate_python(days)))
+
+
+def rows_from_days(days: Iterable) -> List[CalendarRow]:
+    """Queue rows from day objects (Day models or anything with the same attributes)."""
+    return [
+        (d.listingId, d.date, d.currency, float(d.price), getattr(d, "status", None))
+        for d in days
+    ]
+
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes], batch_size: int = 1000) -> AsyncIterator[List[CalendarRow]]:
+    """
+    Validate a streamed NDJSON body (one day object per line) and yield queue rows
+    in batches of about `batch_size`, so the raw request body never has to be buffered.
+    Raises pydantic.ValidationError on the first invalid line.
+    """
+    batch: List[CalendarRow] = []
+    tail = b""
+    async for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            if line.strip():
+                batch.append(_as_row(_day_adapter.validate_json(line)))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if tail.strip():
+        batch.append(_as_row(_day_adapter.validate_json(tail)))
+    if batch:
+        yield batch
+
+
+async def rows_from_ndjson(chunks: AsyncIterator[bytes]) -> List[CalendarRow]:
+    """
+    Validate a whole streamed NDJSON body and return its queue rows. Nothing is returned
+    unless every line is valid, so a rejected request never leaves part of itself queued.
+    """
+    return [row async for batch in iter_ndjson_rows(chunks) for row in batch]
@@ -1,4 +1,4 @@
-from fastapi import Depends
+from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from typing import Annotated
 from app.config import get_settings
@@ -13,6 +13,13 @@ from app.application.sync_calendar_prices_service import SyncCalendarPricesServi
 from app.application.worker_status_service import WorkerStatusService
 from app.application.listing_price_list_service import ListingPriceListService
 from app.infrastructure.repositories.listing_price_list_repository import ListingPriceListRepository
+from app.application.calendar_ingestion_buffer import CalendarIngestionBuffer
+from app.application.ingest_filter import get_ingest_filter
+from app.application.calendar_backfill_service import CalendarBackfillService
+from app.infrastructure.repositories.backfill_repository import BackfillRepository
+from app.shared.security import is_admin_token
+from app.application.dead_letter_service import DeadLetterService
+from app.infrastructure.repositories.dead_letter_repository import DeadLetterRepository
 
 settings = get_settings()
 
@@ -20,6 +27,14 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
+
+def require_admin(token: str = Depends(oauth2_scheme)) -> None:
+    if not is_admin_token(token):
+        raise HTTPException(
+            status_code=401,
+            detail="Admin token required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
 def get_booking_experts_client() -> APIBookingExpertsClient:
     return APIBookingExpertsClient()
@@ -51,18 +66,53 @@ def get_sync_calendar_prices_service(
     from app.application.sync_calendar_prices_service import SyncCalendarPricesService
     return SyncCalendarPricesService(repository, process_lock_repository, listing_price_list_repository, be_client)
 
+_calendar_ingestion_buffer = CalendarIngestionBuffer(
+    EnqueueCalendarPricesService(APIBookingExpertsClient(), CalendarRepository()),
+    max_rows=settings.WEBHOOK_BUFFER_MAX_ROWS,
+    flush_max_rows=settings.WEBHOOK_FLUSH_MAX_ROWS,
+    flush_interval_ms=settings.WEBHOOK_FLUSH_INTERVAL_MS,
+    backpressure_timeout_sec=settings.WEBHOOK_BACKPRESSURE_TIMEOUT_SEC,
+    max_flush_attempts=settings.WEBHOOK_FLUSH_MAX_ATTEMPTS,
+    flush_retry_sec=settings.WEBHOOK_FLUSH_RETRY_SEC,
+)
+
+def get_calendar_ingestion_buffer() -> CalendarIngestionBuffer:
+    return _calendar_ingestion_buffer
+
+# Jobs outlive the request that started them, so the service (and its task registry) is process-wide.
+_calendar_backfill_service = CalendarBackfillService(
+    lambda: GuestyClient(get_cache()),
+    EnqueueCalendarPricesService(APIBookingExpertsClient(), CalendarRepository()),
+    BackfillRepository(),
+    get_ingest_filter(),
+    concurrency=settings.BACKFILL_CONCURRENCY,
+    listings_per_request=settings.BACKFILL_LISTINGS_PER_REQUEST,
+    chunk_days=settings.BACKFILL_CHUNK_DAYS,
+)
+
+def get_calendar_backfill_service() -> CalendarBackfillService:
+    return _calendar_backfill_service
+
 def get_retrieve_calendar_prices(
     guesty: GuestyClient = Depends(get_guesty_client),
     sync_service: EnqueueCalendarPricesService = Depends(get_enqueue_calendar_prices_service),
 ) -> RetrieveCalendarPrices:
-    return RetrieveCalendarPrices(guesty, sync_service)
+    return RetrieveCalendarPrices(guesty, sync_service, get_ingest_filter())
 
-def get_worker_status_service(
-    repository: CalendarRepository = Depends(get_calendar_repository),
-) -> WorkerStatusService:
-    return WorkerStatusService(repository)
+# Process-wide so dashboards polling worker-status share one cached summary.
+_worker_status_service = WorkerStatusService(
+    CalendarRepository(),
+    get_ingest_filter(),
+    cache_ttl_sec=settings.WORKER_STATUS_CACHE_TTL_SEC,
+)
+
+def get_worker_status_service() -> WorkerStatusService:
+    return _worker_status_service
 
 def get_listing_price_list_service(
     repository: ListingPriceListRepository = Depends(get_listing_price_list_repository),
 ) -> ListingPriceListService:
-    return ListingPriceListService(repository)
\ No newline at end of file
+    return ListingPriceListService(repository)
+
+def get_dead_letter_service() -> DeadLetterService:
+    return DeadLetterService(DeadLetterRepository())
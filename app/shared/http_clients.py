@@ -0,0 +1,83 @@
+import asyncio
+from typing import Dict, Set, Tuple
+import httpx
+from loguru import logger
+from app.config import get_settings
+
+settings = get_settings()
+
+BOOKING_EXPERTS = "booking_experts"
+GUESTY = "guesty"
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpClientPool:
+    """
+    One keep-alive httpx.AsyncClient per upstream, shared by every request.
+    Owned by the FastAPI startup/shutdown hooks and by the worker process.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+        self._closing: Set[asyncio.Future] = set()
+
+    def _build(self) -> httpx.AsyncClient:
+        http2 = settings.HTTP2_ENABLED and _http2_available()
+        if settings.HTTP2_ENABLED and not http2:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        return httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SEC, connect=settings.HTTP_CONNECT_TIMEOUT_SEC),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SEC,
+            ),
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Must be called from a coroutine: pooled sockets belong to the running loop."""
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(name)
+        if entry is None or entry[1] is not loop:
+            if entry is not None:
+                self._retire(*entry)
+            self._clients[name] = (self._build(), loop)
+        return self._clients[name][0]
+
+    def _retire(self, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+        """Close a client left behind by another event loop, on that loop while it still runs."""
+        if loop.is_running() and not loop.is_closed():
+            future = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._close(client), loop))
+        else:
+            future = asyncio.ensure_future(self._close(client))
+        self._closing.add(future)
+        future.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(client: httpx.AsyncClient) -> None:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close HTTP client: {e}")
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client, _ in clients.values():
+            await self._close(client)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+_pool = HttpClientPool()
+
+
+def get_http_client_pool() -> HttpClientPool:
+    return _pool
@@ -0,0 +1,219 @@
+from __future__ import annotations
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+from loguru import logger
+
+# Seconds; covers a fast SQLite commit up to a slow upstream PATCH.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines += [f"{self.name}{self._labels(k)} {_fmt(v)}" for k, v in sorted(self._values.items())]
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """(count, sum) per label set."""
+        return {key: (sum(counts), self._sums[key]) for key, counts in self._counts.items()}
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(key, ('le', _fmt(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_fmt(self._sums[key])}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return _registry
+
+
+# Pipeline metrics shared by the API and the worker.
+WEBHOOK_ROWS = _registry.counter("guesty_webhook_rows_total", "Calendar days accepted by the webhook.")
+INGEST_DROPPED_ROWS = _registry.counter("guesty_ingest_dropped_rows_total", "Calendar days dropped by the ingest filter.", ["reason"])
+ENQUEUED_ROWS = _registry.counter("guesty_enqueued_rows_total", "Calendar days written to the queue.", ["is_simple"])
+ENQUEUE_COMMIT_SECONDS = _registry.histogram("guesty_enqueue_commit_seconds", "Time to upsert one enqueue batch into SQLite.")
+QUEUE_DB_SECONDS = _registry.histogram("guesty_queue_db_seconds", "SQLite time per queue operation.", ["operation"])
+QUEUE_PENDING = _registry.gauge("guesty_queue_pending_rows", "Pending queue rows, as last read by this process.", ["is_simple"])
+PATCH_SECONDS = _registry.histogram("booking_experts_patch_seconds", "Booking Experts PATCH latency.", ["price_list"])
+PATCH_RESPONSES = _registry.counter("booking_experts_patch_responses_total", "Booking Experts PATCH responses.", ["price_list", "status"])
+WORKER_TICKS = _registry.counter("guesty_worker_ticks_total", "Worker drain ticks by outcome.", ["outcome"])
+WORKER_TICK_SECONDS = _registry.histogram("guesty_worker_tick_seconds", "Worker drain tick duration.")
+SPAN_SECONDS = _registry.histogram("guesty_span_seconds", "Duration of traced pipeline stages (only while tracing is enabled).", ["span"])
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observe the duration of the `with` block (also around awaits)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+# (query, headers) -> (status, content type, body); headers are lower-cased.
+RouteHandler = Callable[[Dict[str, str], Dict[str, str]], Awaitable[Tuple[int, str, bytes]]]
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 405: "Method Not Allowed", 409: "Conflict"}
+
+
+async def serve_metrics(
+    host: str, port: int, routes: Optional[Dict[str, RouteHandler]] = None
+) -> Optional[asyncio.AbstractServer]:
+    """
+    Minimal HTTP exporter for processes without a web server (the worker).
+    GETs on a path in `routes` go to that handler, every other GET gets the
+    registry; returns None if the port is unavailable.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            headers: Dict[str, str] = {}
+            while (line := await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            method, _, rest = request_line.decode("latin-1").partition(" ")
+            path, _, query = rest.split(" ", 1)[0].partition("?")
+            if method != "GET":
+                status, content_type, body = 405, "text/plain", b""
+            elif routes and path in routes:
+                status, content_type, body = await routes[path](dict(parse_qsl(query)), headers)
+            else:
+                status, content_type, body = 200, CONTENT_TYPE, _registry.render().encode()
+            head = (
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+            )
+            writer.write(head.encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    try:
+        return await asyncio.start_server(handle, host, port)
+    except OSError as e:
+        logger.warning(f"Metrics exporter not started on {host}:{port}: {e}")
+        return None
@@ -0,0 +1,139 @@
+from __future__ import annotations
+import asyncio
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import nullcontext
+from typing import Dict, Tuple
+from loguru import logger
+from app.config import get_settings
+from app.domain.exceptions.profiler_busy import ProfilerBusy
+from app.shared.metrics import SPAN_SECONDS, timed
+from app.shared.security import bearer_token, is_admin_token
+
+settings = get_settings()
+
+PROFILE_MODES = ("cpu", "memory")
+
+_spans_enabled = settings.TRACE_SPANS_ENABLED
+_capturing = False
+_NOOP = nullcontext()
+
+
+def spans_enabled() -> bool:
+    return _spans_enabled
+
+
+def set_spans_enabled(enabled: bool) -> None:
+    global _spans_enabled
+    _spans_enabled = enabled
+
+
+def span(name: str):
+    """
+    Time a pipeline stage into guesty_span_seconds{span=name}. While tracing is
+    off a shared no-op context is returned, so spans left in hot paths cost one
+    function call.
+    """
+    return timed(SPAN_SECONDS, span=name) if _spans_enabled else _NOOP
+
+
+async def capture_profile(seconds: float, mode: str = "cpu", limit: int = 30) -> str:
+    """
+    Profile this process for `seconds` and return a text report: cProfile stats of
+    the event-loop thread ("cpu") or the allocation growth seen by tracemalloc
+    ("memory"), followed by the span timings recorded in the window (tracing is
+    switched on meanwhile). Only one capture runs at a time.
+    """
+    global _capturing
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}' (expected one of: {', '.join(PROFILE_MODES)}).")
+    if _capturing:
+        raise ProfilerBusy("A profile capture is already running.")
+
+    seconds = min(max(seconds, 0.1), settings.PROFILE_MAX_SECONDS)
+    _capturing = True
+    was_enabled = _spans_enabled
+    set_spans_enabled(True)
+    spans_before = SPAN_SECONDS.totals()
+    logger.info(f"Capturing a {mode} profile for {seconds}s")
+    try:
+        if mode == "cpu":
+            report = await _profile_cpu(seconds, limit)
+        else:
+            report = await _profile_memory(seconds, limit)
+    finally:
+        set_spans_enabled(was_enabled)
+        _capturing = False
+    return f"{report}\n{_span_report(spans_before)}"
+
+
+async def _profile_cpu(seconds: float, limit: int) -> str:
+    # SQLite work runs in aiosqlite's threads and shows up here as awaits; see the spans.
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # another profiler is active
+        raise ProfilerBusy(str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("tottime").print_stats(limit)
+    return f"CPU profile, {seconds}s, event-loop thread, sorted by own time\n{out.getvalue()}"
+
+
+async def _profile_memory(seconds: float, limit: int) -> str:
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    lines = [
+        f"Memory profile, {seconds}s: traced {current / 1024:.1f} KiB now, peak {peak / 1024:.1f} KiB",
+        "Top allocation changes:",
+    ]
+    lines += [str(stat) for stat in stats[:limit]]
+    return "\n".join(lines) + "\n"
+
+
+def _span_report(before: Dict[Tuple[str, ...], Tuple[int, float]]) -> str:
+    rows = []
+    for key, (count, total) in SPAN_SECONDS.totals().items():
+        count_before, total_before = before.get(key, (0, 0.0))
+        if count > count_before:
+            rows.append((key[0], count - count_before, total - total_before))
+    if not rows:
+        return "Spans: none recorded in this window.\n"
+    lines = ["Spans:", f"{'span':<36} {'calls':>8} {'total ms':>12} {'avg ms':>10}"]
+    for name, count, total in sorted(rows, key=lambda r: -r[2]):
+        lines.append(f"{name:<36} {count:>8} {total * 1000:>12.1f} {total * 1000 / count:>10.2f}")
+    return "\n".join(lines) + "\n"
+
+
+async def profile_route(query: Dict[str, str], headers: Dict[str, str]) -> Tuple[int, str, bytes]:
+    """
+    Metrics exporter route for processes without the API (the worker):
+    GET /debug/profile?seconds=10&mode=cpu|memory&limit=30 with an admin bearer token.
+    """
+    if not is_admin_token(bearer_token(headers.get("authorization"))):
+        return 401, "text/plain", b"Admin token required.\n"
+    try:
+        report = await capture_profile(
+            float(query.get("seconds", 10)), query.get("mode", "cpu"), int(query.get("limit", 30))
+        )
+    except ProfilerBusy as e:
+        return 409, "text/plain", f"{e}\n".encode()
+    except ValueError as e:
+        return 400, "text/plain", f"{e}\n".encode()
+    return 200, "text/plain; charset=utf-8", report.encode()
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from jose import JWTError, jwt
+from app.config import get_settings
+
+settings = get_settings()
+
+ADMIN_SCOPE = "admin"
+
+
+def create_admin_token(subject: str, expires_minutes: Optional[int] = None) -> str:
+    """Signed JWT carrying the admin scope (SECRET_KEY / ALGORITHM)."""
+    expires = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = {"sub": subject, "scope": ADMIN_SCOPE, "exp": expires}
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """True for an unexpired token signed with SECRET_KEY whose scopes include admin."""
+    if not token:
+        return False
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return False
+    return ADMIN_SCOPE in str(claims.get("scope", "")).split()
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    scheme, _, token = (authorization or "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else None
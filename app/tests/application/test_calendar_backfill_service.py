@@ -0,0 +1,85 @@
+import asyncio
+
+from app.application.calendar_backfill_service import CalendarBackfillService
+from app.infrastructure.db.sqlite import init_db
+from app.infrastructure.repositories.backfill_repository import BackfillRepository
+
+
+class FlakyGuestyClient:
+    def __init__(self, fail_once):
+        self.fail_once = set(fail_once)
+        self.calls = []
+
+    async def list_calendars(self, listing_ids, start_date, end_date):
+        self.calls.append((tuple(listing_ids), start_date))
+        if (tuple(listing_ids), start_date) in self.fail_once:
+            self.fail_once.discard((tuple(listing_ids), start_date))
+            raise RuntimeError("guesty unavailable")
+        days = [
+            {"date": start_date, "listingId": listing_id, "price": 100, "status": "available", "currency": "EUR"}
+            for listing_id in listing_ids
+        ]
+        return {"data": {"days": days}}
+
+
+class RecordingEnqueueService:
+    def __init__(self):
+        self.rows = []
+
+    async def queue_rows(self, rows, is_simple=False):
+        self.rows += rows
+        return len(rows)
+
+
+async def _wait(service, job_id):
+    while job_id in service._tasks:
+        await asyncio.sleep(0.01)
+    return await service.get_job(job_id)
+
+
+async def test_backfill_batches_listings_and_resumes_failed_chunks():
+    await init_db()
+    guesty = FlakyGuestyClient(fail_once={(("L3",), "2030-01-03")})
+    enqueue = RecordingEnqueueService()
+    service = CalendarBackfillService(
+        lambda: guesty, enqueue, BackfillRepository(), concurrency=2, listings_per_request=2, chunk_days=2
+    )
+
+    job = await service.create_job("2030-01-01", "2030-01-04", ["L1", "L2", "L3"])
+    assert job["total_chunks"] == 4  # 2 listing batches x 2 date ranges
+    job = await _wait(service, job["id"])
+    assert job["status"] == "failed"
+    assert (job["completed_chunks"], job["failed_chunks"], job["rows_queued"]) == (3, 1, 5)
+
+    guesty.calls.clear()
+    job = await _wait(service, (await service.resume(job["id"]))["id"])
+    assert job["status"] == "completed"
+    assert guesty.calls == [(("L3",), "2030-01-03")]
+    assert (job["progress"], job["rows_queued"], len(enqueue.rows)) == (1.0, 6, 6)
+
+
+class BlockingGuestyClient(FlakyGuestyClient):
+    def __init__(self):
+        super().__init__(fail_once=())
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def list_calendars(self, listing_ids, start_date, end_date):
+        self.started.set()
+        await self.release.wait()
+        return await super().list_calendars(listing_ids, start_date, end_date)
+
+
+async def test_cancelled_job_stays_cancelled_and_resumes():
+    guesty = BlockingGuestyClient()
+    enqueue = RecordingEnqueueService()
+    service = CalendarBackfillService(lambda: guesty, enqueue, BackfillRepository(), concurrency=1, chunk_days=2)
+
+    job = await service.create_job("2030-01-01", "2030-01-04", ["L1"])
+    await guesty.started.wait()
+    job = await service.cancel(job["id"])
+    assert (job["status"], job["completed_chunks"]) == ("cancelled", 0)
+
+    guesty.release.set()
+    job = await _wait(service, (await service.resume(job["id"]))["id"])
+    assert (job["status"], job["completed_chunks"], len(enqueue.rows)) == ("completed", 2, 2)
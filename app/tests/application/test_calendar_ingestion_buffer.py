@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from app.application.calendar_ingestion_buffer import CalendarIngestionBuffer
+from app.domain.exceptions.ingestion_buffer_failing import IngestionBufferFailing
+from app.domain.exceptions.ingestion_buffer_full import IngestionBufferFull
+from app.shared.calendar_rows import iter_ndjson_rows, rows_from_ndjson
+
+
+class RecordingEnqueueService:
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.calls = []
+
+    async def queue_rows(self, rows, is_simple=False):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.calls.append((list(rows), is_simple))
+        return len(rows)
+
+
+async def test_concurrent_webhooks_are_group_committed():
+    service = RecordingEnqueueService()
+    buffer = CalendarIngestionBuffer(service, max_rows=100, flush_max_rows=50, flush_interval_ms=20)
+
+    await asyncio.gather(*[buffer.submit([f"day-{i}-{j}" for j in range(3)]) for i in range(5)])
+    await asyncio.sleep(0.1)
+
+    assert len(service.calls) == 1
+    assert len(service.calls[0][0]) == 15
+    await buffer.stop()
+
+
+async def test_full_buffer_applies_backpressure_and_stop_flushes():
+    service = RecordingEnqueueService(delay=0.2)
+    buffer = CalendarIngestionBuffer(
+        service, max_rows=4, flush_max_rows=100, flush_interval_ms=1000, backpressure_timeout_sec=0.05
+    )
+
+    await buffer.submit(["a", "b", "c"])
+    with pytest.raises(IngestionBufferFull):
+        await buffer.submit(["d", "e"])
+
+    await buffer.submit(["d"], is_simple=True)
+    await buffer.stop()
+    assert sorted(service.calls) == [(["a", "b", "c"], False), (["d"], True)]
+
+
+async def test_failed_flush_keeps_rows_and_refuses_new_ones_while_failing():
+    service = RecordingEnqueueService(failures=3)
+    buffer = CalendarIngestionBuffer(service, flush_interval_ms=1000, max_flush_attempts=5, failing_after=3)
+    await buffer.start()
+
+    await buffer.submit(["a", "b"])
+    for _ in range(3):
+        assert await buffer.flush() == 0
+    assert buffer.pending_rows == 2
+    with pytest.raises(IngestionBufferFailing):
+        await buffer.submit(["c"])
+
+    assert await buffer.flush() == 2
+    assert service.calls == [(["a", "b"], False)]
+    await buffer.submit(["c"])
+    await buffer.stop()
+
+
+async def test_rows_are_dropped_after_max_flush_attempts():
+    service = RecordingEnqueueService(failures=2)
+    buffer = CalendarIngestionBuffer(service, flush_interval_ms=1000, max_flush_attempts=2)
+    await buffer.start()
+
+    await buffer.submit(["a"])
+    await buffer.flush()
+    assert buffer.pending_rows == 1
+    await buffer.flush()
+    assert buffer.pending_rows == 0
+    assert not buffer.failing
+    await buffer.stop()
+    assert service.calls == []
+
+
+async def test_streamed_ndjson_rows_reach_the_buffer_as_tuples():
+    async def chunks():
+        # Line boundaries deliberately fall inside chunks.
+        yield b'{"date": "2030-01-01", "listingId": "L1", "price": "100", "status": "available", "currency": "EUR"}\n{"date": "2030-'
+        yield b'01-02", "listingId": "L1", "price": 110.5, "status": "booked", "currency": "EUR", "extra": 1}'
+
+    service = RecordingEnqueueService()
+    buffer = CalendarIngestionBuffer(service, flush_interval_ms=1000)
+    async for rows in iter_ndjson_rows(chunks(), batch_size=1):
+        await buffer.submit(rows)
+    await buffer.stop()
+
+    assert service.calls == [([
+        ("L1", "2030-01-01", "EUR", 100.0, "available"),
+        ("L1", "2030-01-02", "EUR", 110.5, "booked"),
+    ], False)]
+
+
+async def test_ndjson_body_with_an_invalid_line_queues_nothing():
+    async def chunks():
+        yield b'{"date": "2030-01-01", "listingId": "L1", "price": 100, "status": "available", "currency": "EUR"}\n'
+        yield b'{"date": "2030-01-02", "listingId": "L1", "status": "booked"}\n'
+
+    service = RecordingEnqueueService()
+    buffer = CalendarIngestionBuffer(service, flush_interval_ms=1000)
+    with pytest.raises(ValidationError):
+        await buffer.submit(await rows_from_ndjson(chunks()))
+    await buffer.stop()
+
+    assert buffer.pending_rows == 0
+    assert service.calls == []
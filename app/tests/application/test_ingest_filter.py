@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+from app.application.ingest_filter import IngestFilter
+
+
+class FakeListingPriceListRepository:
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    async def get_price_list_map(self):
+        return self.mapping
+
+
+def _row(listing_id, days_ahead, status="available"):
+    return (listing_id, (date.today() + timedelta(days=days_ahead)).isoformat(), "EUR", 100.0, status)
+
+
+async def test_filter_drops_and_counts_by_reason_and_reloads_mappings():
+    repository = FakeListingPriceListRepository({"L1": "PL1"})
+    ingest_filter = IngestFilter(repository, past_days=0, horizon_days=30, statuses=frozenset({"available"}))
+
+    rows = [_row("L1", 1), _row("L2", 1), _row("L1", -1), _row("L1", 31), _row("L1", 2, status="booked")]
+    assert await ingest_filter.apply(rows) == [rows[0]]
+    assert ingest_filter.dropped_counts() == {"not_mapped": 1, "out_of_horizon": 2, "status": 1}
+
+    # A reloaded mapping snapshot is a new dict; the allowlist follows it.
+    repository.mapping = {"L1": "PL1", "L2": "PL2"}
+    assert await ingest_filter.apply([_row("L2", 1)]) == [_row("L2", 1)]
+    assert await ingest_filter.allows_listing("L2")
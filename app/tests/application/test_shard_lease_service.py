@@ -0,0 +1,98 @@
+import pytest
+
+from app.infrastructure.db.sqlite import init_db, db_writer
+from app.infrastructure.repositories.calendar_repository import CalendarRepository
+from app.infrastructure.repositories.process_lock_repository import ProcessLockRepository
+from app.application.shard_lease_service import ShardLeaseService
+from app.domain.exceptions.lease_lost import LeaseLostError
+
+WORKER = "shard-test-worker"
+
+
+async def _clear_leases():
+    async with db_writer() as conn:
+        await conn.execute("DELETE FROM process_lock WHERE name LIKE ?", [f"{WORKER}:%"])
+        await conn.commit()
+
+
+def _service(owner, shard_count=4):
+    return ShardLeaseService(ProcessLockRepository(), WORKER, owner, shard_count, ttl_seconds=60)
+
+
+async def test_shards_are_split_between_live_workers():
+    await init_db()
+    await _clear_leases()
+    a, b = _service("a"), _service("b")
+
+    assert sorted(await a.rebalance()) == [0, 1, 2, 3]
+    # b joins: a gives up its extra shards on its next round, b picks them up.
+    assert await b.rebalance() == {}
+    await a.rebalance()
+    await b.rebalance()
+    assert len(a.owned) == 2 and len(b.owned) == 2
+    assert set(a.owned).isdisjoint(b.owned)
+
+    # a stops: b takes over everything.
+    await a.release_all()
+    assert sorted(await b.rebalance()) == [0, 1, 2, 3]
+    await b.release_all()
+
+
+async def test_stale_fencing_token_cannot_ack():
+    await init_db()
+    await _clear_leases()
+    a, b = _service("a", shard_count=1), _service("b", shard_count=1)
+    await a.rebalance()
+    stale_fence = a.fence(0)
+
+    # a's lease expires and b takes the shard over with a higher token.
+    async with db_writer() as conn:
+        await conn.execute(
+            "UPDATE process_lock SET acquired_at = '2000-01-01 00:00:00' WHERE name LIKE ?", [f"{WORKER}:%a"]
+        )
+        await conn.execute(
+            "UPDATE process_lock SET acquired_at = '2000-01-01 00:00:00' WHERE name = ?", [stale_fence[0]]
+        )
+        await conn.commit()
+    await b.rebalance()
+    assert b.fence(0)[1] == stale_fence[1] + 1
+
+    with pytest.raises(LeaseLostError):
+        await CalendarRepository().mark_processed([-1], fence=stale_fence)
+    await CalendarRepository().mark_processed([-1], fence=b.fence(0))
+    await b.release_all()
+
+
+async def test_renew_fails_once_the_shard_was_taken_over():
+    a, b = _service("a", shard_count=1), _service("b", shard_count=1)
+    await a.rebalance()
+    await a.renew(0)
+
+    async with db_writer() as conn:
+        await conn.execute("UPDATE process_lock SET acquired_at = '2000-01-01 00:00:00'")
+        await conn.commit()
+    await b.rebalance()
+
+    with pytest.raises(LeaseLostError):
+        await a.renew(0)
+    await b.renew(0)
+
+
+async def test_heartbeat_keeps_leases_alive_and_drops_lost_shards():
+    a, b = _service("a", shard_count=2), _service("b", shard_count=2)
+    await a.rebalance()
+
+    # Leases past their TTL are extended by the heartbeat before anyone takes them over.
+    async with db_writer() as conn:
+        await conn.execute("UPDATE process_lock SET acquired_at = datetime('now', '-61 seconds')")
+        await conn.commit()
+    await a.heartbeat()
+    assert await b.rebalance() == {}
+
+    # a stalls past the TTL: b takes over and a's next heartbeat drops the shards.
+    async with db_writer() as conn:
+        await conn.execute("UPDATE process_lock SET acquired_at = '2000-01-01 00:00:00'")
+        await conn.commit()
+    assert sorted(await b.rebalance()) == [0, 1]
+    await a.heartbeat()
+    assert a.owned == {}
@@ -0,0 +1,160 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.application.sync_calendar_prices_service import SyncCalendarPricesService
+from app.domain.exceptions.max_batch_errors_exceeded import MaxBatchErrorsExceeded
+
+
+class FakeCalendarRepository:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.processed = []
+        self.unsent = []
+        self.released = []
+        self.rejected = []
+
+    async def reserve_batch(self, limit, is_simple=None, lease_ttl_sec=None, shard=None):
+        batch, self.rows = self.rows[:limit], self.rows[limit:]
+        return batch
+
+    async def mark_processed(self, ids, fence=None, unsent_ids=()):
+        self.processed.extend(ids)
+        self.unsent.extend(unsent_ids)
+
+    async def release_locks(self, ids, fence=None):
+        self.released.extend(ids)
+
+    async def schedule_retry(self, ids, error, permanent=True, max_attempts=None, fence=None):
+        self.released.extend(ids)
+        if permanent:
+            self.rejected.extend(ids)
+        return 0
+
+
+class FakeListingPriceListRepository:
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    async def get_price_list_map(self):
+        return self.mapping
+
+
+class SlowBookingExpertsClient:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def patch_master_price_list(self, price_list_id, administration_id, simple_prices=None, complex_prices=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            self.calls.append(price_list_id)
+        finally:
+            self.in_flight -= 1
+
+
+def _rows(listing_ids):
+    return [
+        {"id": i, "listing_id": listing_id, "date": "2030-01-01", "currency": "EUR", "price": 100.0}
+        for i, listing_id in enumerate(listing_ids, start=1)
+    ]
+
+
+def _service(repository, mapping, client):
+    return SyncCalendarPricesService(
+        repository=repository,
+        process_lock_repository=None,
+        listing_price_list_repository=FakeListingPriceListRepository(mapping),
+        booking_experts_client=client,
+    )
+
+
+async def test_price_lists_are_patched_concurrently_with_limit():
+    listings = [f"listing-{i}" for i in range(6)]
+    repository = FakeCalendarRepository(_rows(listings))
+    client = SlowBookingExpertsClient()
+    service = _service(repository, {l: f"pl-{l}" for l in listings}, client)
+
+    processed = await service.drain_queue_tick(
+        is_simple=False,
+        batch_size=10,
+        max_batches_this_tick=1,
+        inter_batch_sleep_ms=0,
+        max_concurrent_patches=3,
+    )
+
+    assert processed == 6
+    assert sorted(client.calls) == sorted(f"pl-{l}" for l in listings)
+    assert client.max_in_flight == 3
+    assert sorted(repository.processed) == [1, 2, 3, 4, 5, 6]
+
+
+class FailingBookingExpertsClient(SlowBookingExpertsClient):
+    def __init__(self, failing):
+        super().__init__(delay=0)
+        self.failing = failing
+
+    async def patch_master_price_list(self, price_list_id, administration_id, simple_prices=None, complex_prices=None):
+        if price_list_id in self.failing:
+            status = self.failing[price_list_id]
+            request = httpx.Request("PATCH", f"https://example.test/{price_list_id}")
+            raise httpx.HTTPStatusError(f"{status}", request=request, response=httpx.Response(status, request=request))
+        await super().patch_master_price_list(price_list_id, administration_id, simple_prices, complex_prices)
+
+
+async def test_only_failed_price_lists_are_released(monkeypatch):
+    alerts = []
+    monkeypatch.setattr(SyncCalendarPricesService, "_email_error", lambda self, subject, err, **kw: alerts.append(subject))
+    repository = FakeCalendarRepository(_rows(["listing-a", "listing-b", "listing-a", "listing-c", "unmapped"]))
+    client = FailingBookingExpertsClient(failing={"pl-b": 503})
+    service = _service(repository, {"listing-a": "pl-a", "listing-b": "pl-b", "listing-c": "pl-c"}, client)
+
+    processed = await service.drain_queue_tick(is_simple=False, batch_size=10, max_batches_this_tick=1)
+
+    assert processed == 4
+    assert sorted(repository.processed) == [1, 3, 4]
+    assert repository.unsent == [5]
+    assert repository.released == [2]
+    assert alerts == ["Error sending price list pl-b to Booking Experts"]
+
+
+async def test_only_rejections_count_as_attempts(monkeypatch):
+    monkeypatch.setattr(SyncCalendarPricesService, "_email_error", lambda self, subject, err, **kw: None)
+    repository = FakeCalendarRepository(_rows(["listing-a", "listing-b", "listing-c", "listing-d"]))
+    client = FailingBookingExpertsClient(failing={"pl-a": 422, "pl-b": 429, "pl-c": 502})
+    service = _service(repository, {f"listing-{c}": f"pl-{c}" for c in "abcd"}, client)
+
+    await service.drain_queue_tick(is_simple=False, batch_size=10, max_batches_this_tick=1)
+
+    assert repository.processed == [4]
+    assert sorted(repository.released) == [1, 2, 3]
+    assert repository.rejected == [1]
+
+
+async def test_rejected_price_list_does_not_stop_other_lists_draining(monkeypatch):
+    monkeypatch.setattr(SyncCalendarPricesService, "_email_error", lambda self, subject, err, **kw: None)
+    repository = FakeCalendarRepository(_rows(["listing-bad", "listing-good"] * 6))
+    client = FailingBookingExpertsClient(failing={"pl-bad": 422})
+    service = _service(repository, {"listing-bad": "pl-bad", "listing-good": "pl-good"}, client)
+
+    for _ in range(3):
+        await service.drain_queue_tick(is_simple=False, batch_size=2, max_batches_this_tick=2, max_errors_per_tick=1)
+
+    assert sorted(repository.processed) == [2, 4, 6, 8, 10, 12]
+    assert sorted(repository.rejected) == [1, 3, 5, 7, 9, 11]
+
+
+async def test_transient_failures_still_use_the_error_budget(monkeypatch):
+    monkeypatch.setattr(SyncCalendarPricesService, "_email_error", lambda self, subject, err, **kw: None)
+    repository = FakeCalendarRepository(_rows(["listing-a"] * 4))
+    client = FailingBookingExpertsClient(failing={"pl-a": 503})
+    service = _service(repository, {"listing-a": "pl-a"}, client)
+
+    with pytest.raises(MaxBatchErrorsExceeded):
+        await service.drain_queue_tick(is_simple=False, batch_size=2, max_batches_this_tick=2, max_errors_per_tick=2)
+    assert repository.rejected == []
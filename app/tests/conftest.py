@@ -0,0 +1,25 @@
+import pytest
+
+from app.config import get_settings
+from app.infrastructure.db import sqlite
+from app.infrastructure.db.sqlite import get_pool, init_db
+from app.infrastructure.repositories.listing_price_list_repository import get_mapping_cache
+
+
+@pytest.fixture(autouse=True)
+async def isolated_db(tmp_path, monkeypatch):
+    """
+    Every test gets its own SQLite file, never the configured SQLITE_DB_PATH.
+    Pooled connections run on non-daemon threads; they are closed after each test.
+    """
+    path = str(tmp_path / "test.sqlite")
+    pool = get_pool()
+    await pool.close()
+    monkeypatch.setattr(get_settings(), "SQLITE_DB_PATH", path)
+    monkeypatch.setattr(sqlite, "DB_PATH", path)
+    monkeypatch.setattr(pool, "db_path", path)
+    get_mapping_cache().invalidate()
+    await init_db()
+    yield
+    await pool.close()
+    get_mapping_cache().invalidate()
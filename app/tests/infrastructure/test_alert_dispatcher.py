@@ -0,0 +1,23 @@
+import asyncio
+
+from app.shared.alert_dispatcher import AlertDispatcher, FileAlertSink
+
+
+async def test_errors_are_aggregated_per_window_and_rate_limited(tmp_path):
+    path = tmp_path / "alerts.log"
+    dispatcher = AlertDispatcher(FileAlertSink(str(path)), window_sec=0.05, max_per_hour=1)
+
+    for _ in range(50):
+        dispatcher.alert("Error sending batch to Booking Experts", RuntimeError("503 from upstream"), details=[{"id": 1}] * 500)
+    dispatcher.alert("Error Syncing Prices (enqueue/process)", ValueError("disk I/O error"))
+    await asyncio.sleep(0.2)
+
+    text = path.read_text()
+    assert text.count("Subject:") == 1
+    assert "51 errors (2 distinct)" in text and "Occurrences: 50" in text
+    assert len(text) < 3000  # batch dumps are truncated
+
+    # Over the hourly limit: held back, not sent.
+    dispatcher.alert("Error Syncing Prices (enqueue/process)", ValueError("disk I/O error"))
+    await dispatcher.stop()
+    assert path.read_text().count("Subject:") == 1
@@ -0,0 +1,78 @@
+import json
+
+import httpx
+
+from app.infrastructure.booking_experts import booking_experts_client as client_module
+from app.infrastructure.booking_experts.booking_experts_client import APIBookingExpertsClient
+from app.infrastructure.booking_experts.payload_encoder import MasterPriceListPayloadEncoder
+from app.infrastructure.booking_experts.rate_limiter import AdaptiveRateLimiter
+
+
+async def test_patch_retries_after_429_and_slows_down():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"data": {}})
+
+    limiter = AdaptiveRateLimiter(rate=50.0, min_rate=1.0, max_rate=100.0, increase=1.0, decrease_factor=0.5)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+        client = APIBookingExpertsClient(http_client=http_client, rate_limiter=limiter)
+        await client.patch_master_price_list(
+            price_list_id="pl-1",
+            administration_id="adm",
+            simple_prices=[{"temp_id": "t1", "date": "2030-01-01", "currency": "EUR", "value": 10.0}],
+        )
+
+    assert len(calls) == 2
+    # Halved on the 429, then increased additively on the 200.
+    assert limiter.rate == 26.0
+
+
+def _simple(n):
+    return [{"temp_id": f"t{i}", "date": f"2030-01-{i + 1:02d}", "currency": "EUR", "value": 10.5} for i in range(n)]
+
+
+def test_encoder_builds_json_api_document_and_splits_large_batches():
+    body, = MasterPriceListPayloadEncoder().encode("pl-1", simple_prices=_simple(1))
+    assert json.loads(body) == {
+        "data": {
+            "id": "pl-1",
+            "type": "master_price_list",
+            "relationships": {"simple_prices": {"data": [{"type": "simple_price", "meta": {"temp_id": "t0", "method": "create"}}]}},
+        },
+        "included": [{
+            "type": "simple_price",
+            "attributes": {"date": "2030-01-01", "price": {"currency": "EUR", "value": "10.5"}},
+            "meta": {"temp_id": "t0"},
+        }],
+    }
+
+    assert len(MasterPriceListPayloadEncoder(max_items=4).encode("pl-1", simple_prices=_simple(10))) == 3
+    bodies = MasterPriceListPayloadEncoder(max_bytes=len(body) * 3).encode("pl-1", simple_prices=_simple(10))
+    assert all(len(b) <= len(body) * 3 for b in bodies)
+    assert sum(len(json.loads(b)["included"]) for b in bodies) == 10
+
+
+async def test_gzip_bodies_fall_back_to_plain_after_415(monkeypatch):
+    monkeypatch.setattr(client_module.settings, "BOOKING_EXPERTS_GZIP_REQUESTS", True)
+    monkeypatch.setattr(client_module.settings, "BOOKING_EXPERTS_GZIP_MIN_BYTES", 0)
+    monkeypatch.setattr(client_module, "_gzip_rejected", False)
+    encodings = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        encoding = request.headers.get("content-encoding")
+        encodings.append(encoding)
+        if encoding == "gzip":
+            return httpx.Response(415)
+        return httpx.Response(200, json={"data": {}})
+
+    limiter = AdaptiveRateLimiter(rate=50.0, min_rate=1.0, max_rate=100.0, increase=1.0, decrease_factor=0.5)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+        client = APIBookingExpertsClient(http_client=http_client, rate_limiter=limiter)
+        for _ in range(2):
+            await client.patch_master_price_list(price_list_id="pl-1", administration_id="adm", simple_prices=_simple(3))
+
+    assert encodings == ["gzip", None, None]
@@ -0,0 +1,247 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import get_settings
+from app.domain.exceptions.lease_lost import LeaseLostError
+from app.infrastructure.db.sqlite import db_writer
+from app.infrastructure.repositories import calendar_repository
+from app.infrastructure.repositories.calendar_repository import CalendarRepository
+
+
+def _day(listing_id, date, price, currency="EUR"):
+    return SimpleNamespace(listingId=listing_id, date=date, price=price, currency=currency, status="available")
+
+
+async def _reserve_listing(repo, listing_id):
+    """One reservation; each test runs on its own database, so only its rows are queued."""
+    rows = await repo.reserve_batch(limit=100, is_simple=False)
+    assert {r["listing_id"] for r in rows} <= {listing_id}
+    return rows
+
+
+async def test_unchanged_prices_are_not_requeued():
+    repo = CalendarRepository()
+    listing_id = "ledger-test-listing"
+
+    assert await repo.upsert_days([_day(listing_id, "2030-01-01", 100), _day(listing_id, "2030-01-02", 110)], is_simple=False) == 2
+    rows = await _reserve_listing(repo, listing_id)
+    await repo.mark_processed([r["id"] for r in rows])
+
+    before = (await repo.get_suppression_counters())["enqueue"]
+    # Guesty resends the whole calendar; only the changed day is queued.
+    written = await repo.upsert_days(
+        [_day(listing_id, "2030-01-01", 100), _day(listing_id, "2030-01-02", 120)], is_simple=False
+    )
+    assert written == 1
+    assert (await repo.get_suppression_counters())["enqueue"] == before + 1
+
+    rows = await _reserve_listing(repo, listing_id)
+    assert [(r["date"], r["price"]) for r in rows] == [("2030-01-02", 120.0)]
+    await repo.release_locks([r["id"] for r in rows])
+
+    # Reverting to the pushed price cancels the stale pending change.
+    assert await repo.upsert_days([_day(listing_id, "2030-01-02", 110)], is_simple=False) == 0
+    assert await _reserve_listing(repo, listing_id) == []
+
+
+@pytest.mark.parametrize("returning", [True, False], ids=["returning", "legacy"])
+async def test_reserve_batch_locks_oldest_rows_once(monkeypatch, returning):
+    monkeypatch.setattr(calendar_repository, "SUPPORTS_RETURNING", returning)
+    repo = CalendarRepository()
+    listing_id = "reserve-test-listing"
+    for date in ("2030-01-01", "2030-01-02", "2030-01-03"):
+        await repo.upsert_days([_day(listing_id, date, 100)], is_simple=False)
+
+    first = await repo.reserve_batch(limit=2, is_simple=False)
+    second = await repo.reserve_batch(limit=2, is_simple=False)
+    assert [r["date"] for r in first] == ["2030-01-01", "2030-01-02"]
+    assert [r["date"] for r in second] == ["2030-01-03"]
+    assert await repo.reserve_batch(limit=2, is_simple=False) == []
+
+    async with db_writer() as conn:
+        cursor = await conn.execute("SELECT COUNT(*) FROM guesty_calendar_day WHERE locked_at IS NOT NULL")
+        assert (await cursor.fetchone())[0] == 3
+
+
+async def test_update_while_in_flight_is_not_acked():
+    repo = CalendarRepository()
+    listing_id = "ledger-inflight-listing"
+
+    await repo.upsert_days([_day(listing_id, "2030-01-01", 100)], is_simple=False)
+    rows = await _reserve_listing(repo, listing_id)
+
+    # A newer price arrives while the first one is being pushed.
+    await repo.upsert_days([_day(listing_id, "2030-01-01", 200)], is_simple=False)
+    await repo.mark_processed([r["id"] for r in rows])
+
+    rows = await _reserve_listing(repo, listing_id)
+    assert [r["price"] for r in rows] == [200.0]
+
+
+async def test_expired_lease_is_reclaimed():
+    repo = CalendarRepository()
+    listing_id = "lease-test-listing"
+
+    await repo.upsert_days([_day(listing_id, "2030-01-01", 100)], is_simple=False)
+    rows = await _reserve_listing(repo, listing_id)
+    assert rows[0]["reclaim_count"] == 0
+
+    # Worker died after reserving: the row is skipped until its lease expires.
+    async with db_writer() as conn:
+        await conn.execute(
+            "UPDATE guesty_calendar_day SET locked_at = datetime('now', '-1 hour') WHERE id = ?", [rows[0]["id"]]
+        )
+        await conn.commit()
+    assert await repo.reserve_batch(limit=100, is_simple=False, lease_ttl_sec=7200) == []
+
+    reclaimed = await repo.reserve_batch(limit=100, is_simple=False, lease_ttl_sec=60)
+    assert [(r["id"], r["reclaim_count"]) for r in reclaimed] == [(rows[0]["id"], 1)]
+
+
+async def test_pending_counter_matches_table():
+    repo = CalendarRepository()
+    listing_id = "counter-test-listing"
+
+    await repo.upsert_days([_day(listing_id, f"2030-02-{d:02d}", 100 + d) for d in range(1, 6)], is_simple=False)
+    rows = await _reserve_listing(repo, listing_id)
+    await repo.mark_processed([r["id"] for r in rows[:2]])
+    await repo.release_locks([r["id"] for r in rows[2:]])
+
+    async with db_writer() as conn:
+        for flag in (0, 1):
+            row = await (await conn.execute(
+                "SELECT COUNT(*) c FROM guesty_calendar_day WHERE processed = 0 AND is_simple = ?", [flag]
+            )).fetchone()
+            assert await repo.count_unprocessed(is_simple=bool(flag)) == row["c"]
+
+
+async def _grouped_pending():
+    async with db_writer() as conn:
+        rows = await (await conn.execute(
+            """
+            SELECT DATE(created_at) date, CAST(STRFTIME('%H', created_at) AS INTEGER) hour, is_simple, COUNT(*) count
+            FROM guesty_calendar_day WHERE processed = 0
+            GROUP BY 1, 2, 3 ORDER BY date DESC, hour DESC, is_simple
+            """
+        )).fetchall()
+        return [dict(r) for r in rows]
+
+
+async def test_hourly_rollup_matches_pending_rows():
+    repo = CalendarRepository()
+    listing_id = "rollup-test-listing"
+    async with db_writer() as conn:
+        # An older bucket, as left by an enqueue an hour ago.
+        await conn.execute(
+            "INSERT INTO guesty_calendar_day (listing_id, date, currency, price, is_simple, created_at) "
+            "VALUES (?, '2030-02-01', 'EUR', 90, 0, datetime('now', '-1 hour'))",
+            [listing_id],
+        )
+        await conn.commit()
+
+    await repo.upsert_days([_day(listing_id, f"2030-02-0{d}", 100 + d) for d in range(2, 6)], is_simple=False)
+    rows = await _reserve_listing(repo, listing_id)
+    await repo.mark_processed([r["id"] for r in rows[:2]])
+    await repo.release_locks([r["id"] for r in rows[2:]])
+    # Re-enqueueing the old day moves it to the current hour.
+    await repo.upsert_days([_day(listing_id, "2030-02-01", 95)], is_simple=False)
+    assert await repo.get_pending_prices_summary() == await _grouped_pending()
+
+    async with db_writer() as conn:
+        await conn.execute("DELETE FROM guesty_calendar_day WHERE listing_id = ?", [listing_id])
+        await conn.commit()
+    assert await repo.get_pending_prices_summary() == await _grouped_pending() == []
+
+
+async def test_failed_rows_back_off_then_dead_letter_and_requeue():
+    from app.infrastructure.repositories.dead_letter_repository import DeadLetterRepository
+
+    repo = CalendarRepository()
+    dead_letters = DeadLetterRepository()
+    listing_id = "dead-letter-test-listing"
+
+    await repo.upsert_days([_day(listing_id, "2030-03-01", 100)], is_simple=False)
+    rows = await _reserve_listing(repo, listing_id)
+    assert await repo.schedule_retry([r["id"] for r in rows], "HTTPStatusError: 422", max_attempts=2) == 0
+    # Backing off: not reserved again until next_attempt_at.
+    assert await _reserve_listing(repo, listing_id) == []
+
+    async with db_writer() as conn:
+        await conn.execute(
+            "UPDATE guesty_calendar_day SET next_attempt_at = datetime('now', '-1 second') WHERE listing_id = ?",
+            [listing_id],
+        )
+        await conn.commit()
+    rows = await _reserve_listing(repo, listing_id)
+    assert len(rows) == 1
+    assert await repo.schedule_retry([r["id"] for r in rows], "HTTPStatusError: 422", max_attempts=2) == 1
+
+    [dead] = await dead_letters.list_dead_letters(listing_id=listing_id)
+    assert (dead["date"], dead["attempts"], dead["last_error"]) == ("2030-03-01", 2, "HTTPStatusError: 422")
+    assert await repo.count_unprocessed() == sum(r["count"] for r in await repo.get_pending_prices_summary())
+
+    assert await dead_letters.requeue(ids=[dead["id"]]) == {"requeued": 1, "superseded": 0}
+    assert await dead_letters.list_dead_letters(listing_id=listing_id) == []
+    assert [r["date"] for r in await _reserve_listing(repo, listing_id)] == ["2030-03-01"]
+
+
+async def test_transient_failures_back_off_without_using_attempts():
+    repo = CalendarRepository()
+    listing_id = "transient-failure-test-listing"
+
+    await repo.upsert_days([_day(listing_id, "2030-03-01", 100)], is_simple=False)
+    for _ in range(3):
+        rows = await _reserve_listing(repo, listing_id)
+        assert await repo.schedule_retry([r["id"] for r in rows], "HTTPStatusError: 503", permanent=False, max_attempts=1) == 0
+        async with db_writer() as conn:
+            cursor = await conn.execute(
+                "SELECT attempts, retries, (julianday(next_attempt_at) - julianday('now')) * 86400 FROM guesty_calendar_day WHERE listing_id = ?",
+                [listing_id],
+            )
+            attempts, retries, backoff = await cursor.fetchone()
+            await conn.execute(
+                "UPDATE guesty_calendar_day SET next_attempt_at = datetime('now', '-1 second') WHERE listing_id = ?",
+                [listing_id],
+            )
+            await conn.commit()
+    # Still queued after three failures with max_attempts=1; the backoff kept doubling.
+    assert (attempts, retries) == (0, 3)
+    assert 4 * get_settings().QUEUE_RETRY_BASE_SEC - 1 <= backoff <= 4 * get_settings().QUEUE_RETRY_BASE_SEC
+
+
+async def test_stale_fence_cannot_reschedule_or_release_rows():
+    repo = CalendarRepository()
+    listing_id = "fenced-retry-listing"
+    async with db_writer() as conn:
+        # The shard changed hands: token 2 belongs to another worker.
+        await conn.execute(
+            "INSERT INTO process_lock (name, acquired_at, owner, fencing_token) VALUES ('shard', datetime('now'), 'b', 2)"
+        )
+        await conn.commit()
+
+    await repo.upsert_days([_day(listing_id, "2030-03-01", 100)], is_simple=False)
+    ids = [r["id"] for r in await _reserve_listing(repo, listing_id)]
+    with pytest.raises(LeaseLostError):
+        await repo.schedule_retry(ids, "HTTPStatusError: 422", max_attempts=1, fence=("shard", 1))
+    with pytest.raises(LeaseLostError):
+        await repo.release_locks(ids, fence=("shard", 1))
+
+    async with db_writer() as conn:
+        cursor = await conn.execute(
+            "SELECT attempts, retries, locked_at IS NOT NULL FROM guesty_calendar_day WHERE listing_id = ?", [listing_id]
+        )
+        assert tuple(await cursor.fetchone()) == (0, 0, 1)
+    assert await repo.schedule_retry(ids, "HTTPStatusError: 422", max_attempts=1, fence=("shard", 2)) == 1
+
+
+async def test_unsent_rows_are_acked_without_ledger_entry():
+    repo = CalendarRepository()
+    listing_id = "unmapped-test-listing"
+    await repo.upsert_days([_day(listing_id, "2030-04-01", 100)], is_simple=False)
+    rows = await _reserve_listing(repo, listing_id)
+    await repo.mark_processed([], unsent_ids=[r["id"] for r in rows])
+
+    assert await _reserve_listing(repo, listing_id) == []
+    # Once the listing is mapped, the same price is still sent.
+    assert await repo.upsert_days([_day(listing_id, "2030-04-01", 100)], is_simple=False) == 1
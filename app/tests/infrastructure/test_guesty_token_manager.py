@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import httpx
+from diskcache import Cache
+
+from app.infrastructure.guesty.guesty_client import GuestyClient
+from app.infrastructure.guesty.token_manager import GuestyTokenManager
+
+
+def _auth_transport(calls, api_status=lambda token: 200):
+    async def handler(request):
+        if request.method == "POST":
+            calls.append("auth")
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"access_token": f"token-{len(calls)}", "expires_in": 3600})
+        token = request.headers["Authorization"].split()[-1]
+        calls.append(token)
+        return httpx.Response(api_status(token), json={})
+    return httpx.MockTransport(handler)
+
+
+async def test_concurrent_requests_share_one_refresh_and_refresh_ahead(tmp_path):
+    calls = []
+    async with httpx.AsyncClient(transport=_auth_transport(calls)) as http_client:
+        manager = GuestyTokenManager(Cache(str(tmp_path)), refresh_ahead_sec=600, http_client=http_client)
+
+        tokens = await asyncio.gather(*[manager.get_token() for _ in range(10)])
+        assert set(tokens) == {"token-1"} and calls == ["auth"]
+
+        # Inside the refresh-ahead window the old token is served while one refresh runs.
+        manager._expires_at = time.time() + 60
+        manager.cache.set("guesty_auth_info", {"access_token": "token-1"}, expire=60)
+        assert await manager.get_token() == "token-1"
+        await manager._refresh_task
+        assert await manager.get_token() == "token-2"
+
+        # A new process picks the token up from diskcache without authenticating.
+        fresh = GuestyTokenManager(manager.cache, http_client=http_client)
+        assert await fresh.get_token() == "token-2" and calls.count("auth") == 2
+
+
+async def test_401_refreshes_token_and_retries_once(tmp_path):
+    calls = []
+    transport = _auth_transport(calls, api_status=lambda token: 401 if token == "token-1" else 200)
+    async with httpx.AsyncClient(transport=transport) as http_client:
+        manager = GuestyTokenManager(Cache(str(tmp_path)), http_client=http_client)
+        client = GuestyClient(manager.cache, http_client=http_client, token_manager=manager)
+
+        resp = await client._request("GET", "http://guesty/listings")
+        assert resp.status_code == 200
+        assert calls == ["auth", "token-1", "auth", "token-3"]
@@ -0,0 +1,33 @@
+import asyncio
+
+from app.shared.http_clients import BOOKING_EXPERTS, GUESTY, HttpClientPool
+
+
+async def test_clients_are_reused_per_upstream_and_closed_on_shutdown():
+    pool = HttpClientPool()
+    client = pool.get(BOOKING_EXPERTS)
+    assert pool.get(BOOKING_EXPERTS) is client
+    assert pool.get(GUESTY) is not client
+
+    await pool.aclose()
+    assert client.is_closed
+    assert pool.get(BOOKING_EXPERTS) is not client
+    await pool.aclose()
+
+
+def test_client_from_a_previous_loop_is_closed_when_replaced():
+    pool = HttpClientPool()
+
+    async def get():
+        return pool.get(GUESTY)
+
+    old = asyncio.run(get())
+
+    async def replace_and_shut_down():
+        new = pool.get(GUESTY)
+        await pool.aclose()
+        return new
+
+    new = asyncio.run(replace_and_shut_down())
+    assert new is not old
+    assert old.is_closed and new.is_closed
@@ -0,0 +1,33 @@
+import sqlite3
+
+from app.infrastructure.db import sqlite as sqlite_db
+from app.infrastructure.db.sqlite import init_db
+from app.infrastructure.repositories.listing_price_list_repository import ListingPriceListRepository
+
+
+async def test_price_list_map_reloads_on_external_write():
+    """Writes from another process bump the version row and refresh the snapshot."""
+    await init_db()
+    repo = ListingPriceListRepository()
+    listing_id = "cache-test-listing"
+    await repo.deactivate_mapping(listing_id)
+
+    assert listing_id not in await repo.get_price_list_map()
+
+    # Simulate the migration script / another process writing directly.
+    conn = sqlite3.connect(sqlite_db.DB_PATH)
+    conn.execute(
+        "INSERT OR REPLACE INTO listing_price_list_mapping "
+        "(guesty_listing_id, booking_experts_price_list_id, is_active) VALUES (?, ?, 1)",
+        [listing_id, "pl-1"],
+    )
+    conn.commit()
+    conn.close()
+
+    assert await repo.get_price_list_for_listing(listing_id) == "pl-1"
+
+    await repo.update_mapping(listing_id, "pl-2")
+    assert await repo.get_price_list_for_listing(listing_id) == "pl-2"
+
+    await repo.deactivate_mapping(listing_id)
+    assert await repo.get_price_list_for_listing(listing_id) is None
@@ -0,0 +1,33 @@
+import asyncio
+
+from app.shared.metrics import MetricsRegistry, serve_metrics
+
+
+def test_prometheus_text_rendering():
+    registry = MetricsRegistry()
+    patches = registry.counter("patches_total", "PATCH responses.", ["price_list", "status"])
+    latency = registry.histogram("patch_seconds", "PATCH latency.", buckets=(0.1, 1.0))
+    patches.inc(price_list="pl-1", status=200)
+    patches.inc(2, price_list="pl-1", status=200)
+    latency.observe(0.1)
+    latency.observe(0.5)
+    latency.observe(3)
+
+    text = registry.render()
+    assert '# TYPE patches_total counter\npatches_total{price_list="pl-1",status="200"} 3\n' in text
+    assert 'patch_seconds_bucket{le="0.1"} 1\npatch_seconds_bucket{le="1"} 2\npatch_seconds_bucket{le="+Inf"} 3\n' in text
+    assert "patch_seconds_sum 3.6\npatch_seconds_count 3\n" in text
+
+
+async def test_worker_exporter_serves_registry():
+    server = await serve_metrics("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: worker\r\n\r\n")
+    response = await reader.read()
+    writer.close()
+    server.close()
+    await server.wait_closed()
+
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert b"# TYPE guesty_worker_ticks_total counter" in response
@@ -0,0 +1,37 @@
+import asyncio
+
+from app.shared.metrics import SPAN_SECONDS
+from app.shared import profiling
+from app.shared.security import create_admin_token
+
+
+async def test_spans_are_recorded_only_while_tracing():
+    with profiling.span("test.disabled"):
+        pass
+    assert SPAN_SECONDS.count(span="test.disabled") == 0
+
+    async def stage():
+        await asyncio.sleep(0.05)
+        with profiling.span("test.stage"):
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(stage())
+    report = await profiling.capture_profile(0.2, mode="cpu", limit=5)
+    await task
+
+    assert "CPU profile" in report
+    assert "test.stage" in report
+    assert not profiling.spans_enabled()
+
+
+async def test_worker_profile_route_requires_admin_token():
+    status, _, _ = await profiling.profile_route({"seconds": "0.1"}, {})
+    assert status == 401
+
+    headers = {"authorization": f"Bearer {create_admin_token('ops')}"}
+    status, _, body = await profiling.profile_route({"seconds": "0.1", "mode": "memory"}, headers)
+    assert status == 200
+    assert body.startswith(b"Memory profile")
+
+    status, _, _ = await profiling.profile_route({"mode": "disk"}, headers)
+    assert status == 400
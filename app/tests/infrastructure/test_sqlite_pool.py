@@ -0,0 +1,56 @@
+import asyncio
+
+from app.infrastructure.db.sqlite import init_db, get_pool, db_reader, db_writer
+from app.infrastructure.repositories.process_lock_repository import ProcessLockRepository
+
+
+async def test_pool_reuses_connections():
+    """Connections are opened once and handed out again on every acquire."""
+    await init_db()
+    pool = get_pool()
+    await pool.open()
+
+    async with db_writer() as first:
+        pass
+    async with db_writer() as second:
+        pass
+    assert first is second
+
+    readers = set()
+    for _ in range(pool.readers_count * 2):
+        async with db_reader() as conn:
+            readers.add(id(conn))
+    assert len(readers) <= pool.readers_count
+
+
+async def test_writer_rolls_back_failed_transaction():
+    await init_db()
+    name = "pool-test-lock"
+    await ProcessLockRepository().release_worker_lock(name)
+
+    try:
+        async with db_writer() as conn:
+            await conn.execute("BEGIN IMMEDIATE;")
+            await conn.execute(
+                "INSERT INTO process_lock (name, acquired_at) VALUES (?, datetime('now'))", [name]
+            )
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    async with db_reader() as conn:
+        row = await (await conn.execute("SELECT COUNT(*) c FROM process_lock WHERE name = ?", [name])).fetchone()
+    assert row["c"] == 0
+
+    # Concurrent writers are serialized instead of failing on the write lock.
+    repo = ProcessLockRepository()
+    results = await asyncio.gather(*[repo.acquire_worker_lock(name) for _ in range(5)])
+    assert results.count(True) == 1
+    await repo.release_worker_lock(name)
+
+
+async def test_new_database_uses_incremental_auto_vacuum():
+    # The fixture created this test's database through init_db().
+    async with db_reader() as conn:
+        assert (await (await conn.execute("PRAGMA auto_vacuum")).fetchone())[0] == 2
+        assert (await (await conn.execute("PRAGMA journal_mode")).fetchone())[0] == "wal"
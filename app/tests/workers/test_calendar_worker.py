@@ -0,0 +1,30 @@
+import asyncio
+import sqlite3
+
+from app.infrastructure.db import sqlite as sqlite_db
+from app.infrastructure.db.sqlite import DataVersionWatcher
+from app.infrastructure.repositories.calendar_repository import CalendarRepository
+from app.workers import calendar_worker
+
+
+async def test_idle_worker_wakes_on_commit_from_another_process(monkeypatch):
+    monkeypatch.setattr(calendar_worker, "WAKE_POLL_MS", 20)
+    watcher = DataVersionWatcher()
+    repository = CalendarRepository()
+    try:
+        # Nothing committed: waits out the timeout.
+        assert await calendar_worker.wait_for_work(0.2, watcher, repository) is False
+
+        waiting = asyncio.create_task(calendar_worker.wait_for_work(10, watcher, repository))
+        await asyncio.sleep(0.1)
+        # The API process enqueues through its own connection.
+        conn = sqlite3.connect(sqlite_db.DB_PATH)
+        conn.execute(
+            "INSERT INTO guesty_calendar_day (listing_id, date, currency, price, is_simple) "
+            "VALUES ('wake-listing', '2030-01-01', 'EUR', 100, 0)"
+        )
+        conn.commit()
+        conn.close()
+        assert await asyncio.wait_for(waiting, 2) is True
+    finally:
+        await watcher.close()
@@ -5,27 +5,81 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".
 import asyncio
 import os
 import random
+import socket
+import time
+from functools import partial
+from uuid import uuid4
 from venv import logger
-from app.infrastructure.db.sqlite import init_db 
+from app.infrastructure.db.sqlite import init_db, get_pool, DataVersionWatcher
 from app.infrastructure.repositories.process_lock_repository import ProcessLockRepository
 from app.infrastructure.repositories.calendar_repository import CalendarRepository
 from app.infrastructure.repositories.listing_price_list_repository import ListingPriceListRepository
 from app.application.sync_calendar_prices_service import SyncCalendarPricesService
+from app.application.queue_retention_service import QueueRetentionService
+from app.application.shard_lease_service import ShardLeaseService
 from app.infrastructure.booking_experts.booking_experts_client import APIBookingExpertsClient
 from app.domain.exceptions.max_batch_errors_exceeded import MaxBatchErrorsExceeded
+from app.domain.exceptions.lease_lost import LeaseLostError
+from app.shared.http_clients import get_http_client_pool
+from app.shared.alert_dispatcher import get_alert_dispatcher
+from app.shared.metrics import WORKER_TICK_SECONDS, WORKER_TICKS, serve_metrics
+from app.shared.profiling import profile_route
 
 WORKER_NAME = os.getenv("CALENDAR_WORKER_NAME", "calendar-worker")
 IS_SIMPLE = os.getenv("WORKER_IS_SIMPLE", "0") == "1"
 BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "30"))
+PATCH_CONCURRENCY = int(os.getenv("WORKER_PATCH_CONCURRENCY", "4"))
 MAX_BATCHES_PER_TICK = int(os.getenv("WORKER_MAX_BATCHES_PER_TICK", "2"))
-INTER_BATCH_SLEEP_MS = int(os.getenv("WORKER_INTER_BATCH_SLEEP_MS", "250"))
-IDLE_SLEEP_SEC = int(os.getenv("WORKER_IDLE_SLEEP_SEC", "30"))
-LOCK_TTL_SEC = int(os.getenv("WORKER_LOCK_TTL_SEC", "600"))
+INTER_BATCH_SLEEP_MS = int(os.getenv("WORKER_INTER_BATCH_SLEEP_MS", "0"))
+IDLE_SLEEP_SEC = int(os.getenv("WORKER_IDLE_SLEEP_SEC", "30"))  # longest idle wait before re-checking
+WAKE_POLL_MS = int(os.getenv("WORKER_WAKE_POLL_MS", "250"))
+# Shard leases are renewed by a background heartbeat, independent of how long a drain
+# takes, so a dead worker's shards are free again after LOCK_TTL_SEC.
+LOCK_TTL_SEC = int(os.getenv("WORKER_LOCK_TTL_SEC", "30"))
+LEASE_HEARTBEAT_SEC = float(os.getenv("WORKER_LEASE_HEARTBEAT_SEC", "0")) or LOCK_TTL_SEC / 3
+SHARD_COUNT = int(os.getenv("WORKER_SHARD_COUNT", "1"))
+LEASE_TTL_SEC = int(os.getenv("WORKER_LEASE_TTL_SEC", "300"))
+RETENTION_INTERVAL_SEC = int(os.getenv("WORKER_RETENTION_INTERVAL_SEC", "3600"))  # 0 disables
 MAX_ERRORS_PER_TICK = int(os.getenv("WORKER_MAX_ERRORS_PER_TICK", "2"))
 MAX_CONSECUTIVE_TICK_FAILURES = int(os.getenv("WORKER_MAX_CONSECUTIVE_TICK_FAILURES", "2"))
+METRICS_HOST = os.getenv("WORKER_METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9101"))  # Prometheus exporter (+ /debug/profile); 0 disables
+
+async def wait_for_work(
+    timeout_s: float,
+    watcher: DataVersionWatcher,
+    calendar_repository: CalendarRepository,
+) -> bool:
+    """
+    Sleep until rows are enqueued or `timeout_s` elapses. The API runs in another
+    process, so new work is noticed through PRAGMA data_version, polled every
+    WORKER_WAKE_POLL_MS: when another connection committed and the pending counter
+    grew (acks from other workers only shrink it). Returns True when woken by new work.
+    """
+    deadline = time.monotonic() + timeout_s
+    lowest_pending = await calendar_repository.count_unprocessed(is_simple=IS_SIMPLE)
+    while (remaining := deadline - time.monotonic()) > 0:
+        await asyncio.sleep(min(remaining, WAKE_POLL_MS / 1000.0))
+        if await watcher.changed():
+            pending = await calendar_repository.count_unprocessed(is_simple=IS_SIMPLE)
+            if pending > lowest_pending:
+                return True
+            lowest_pending = pending
+    return False
+
+def check_lease_ttl() -> None:
+    # One late heartbeat (a slow SQLite write, a busy loop) must not cost the leases.
+    if LOCK_TTL_SEC < 2 * LEASE_HEARTBEAT_SEC:
+        raise ValueError(
+            f"WORKER_LOCK_TTL_SEC={LOCK_TTL_SEC} must be at least twice "
+            f"WORKER_LEASE_HEARTBEAT_SEC={LEASE_HEARTBEAT_SEC:g}."
+        )
 
 async def run_worker():    
+    check_lease_ttl()
     await init_db()
+    pool = get_pool()
+    await pool.open()
     calendar_repository = CalendarRepository()
     process_lock_repository = ProcessLockRepository()
     listing_price_list_repository = ListingPriceListRepository()
@@ -36,41 +90,89 @@ async def run_worker():
         listing_price_list_repository=listing_price_list_repository,
         booking_experts_client=booking_experts_client
     )
-    acquired = await process_lock_repository.acquire_worker_lock(WORKER_NAME, ttl_seconds=LOCK_TTL_SEC)
-    if not acquired:
-        logger.info(f"[{WORKER_NAME}] Another worker holds the lock. Exiting.")
-        return
+    retention_service = QueueRetentionService(calendar_repository)
+    metrics_server = (
+        await serve_metrics(METRICS_HOST, METRICS_PORT, routes={"/debug/profile": profile_route})
+        if METRICS_PORT else None
+    )
+    last_retention_run = 0.0
+    watcher = DataVersionWatcher()
+    shards = ShardLeaseService(
+        process_lock_repository,
+        worker_name=WORKER_NAME,
+        owner=f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}",
+        shard_count=SHARD_COUNT,
+        ttl_seconds=LOCK_TTL_SEC,
+    )
 
-    logger.info(f"[{WORKER_NAME}] Started.")    
+    logger.info(f"[{WORKER_NAME}] Started ({SHARD_COUNT} shard(s)).")
     consecutive_tick_failures = 0
+    heartbeat = asyncio.create_task(shards.keep_alive(LEASE_HEARTBEAT_SEC))
 
     try:
         while True:
-            # refresh lock so it doesn't expire mid-run
-            await process_lock_repository.refresh_worker_lock(WORKER_NAME)
+            # heartbeat + renew/rebalance shard leases so they don't expire mid-run
+            owned = await shards.rebalance()
+            if not owned:
+                sleep_s = IDLE_SLEEP_SEC + random.randint(0, 5)
+                logger.info(f"[{WORKER_NAME}] No free shard. Sleeping {sleep_s}s.")
+                await asyncio.sleep(sleep_s)
+                continue
+
+            if (
+                0 in owned
+                and RETENTION_INTERVAL_SEC > 0
+                and time.monotonic() - last_retention_run >= RETENTION_INTERVAL_SEC
+            ):
+                last_retention_run = time.monotonic()
+                try:
+                    await retention_service.purge()
+                except Exception:
+                    logger.exception(f"[{WORKER_NAME}] Retention run failed.")
 
             # Check queue depth
             pending = await calendar_repository.count_unprocessed(is_simple=IS_SIMPLE)
             if pending <= 0:
-                # No work: sleep (with a little jitter) and loop
+                # No work: wait for an enqueue, with the idle timer as fallback
                 sleep_s = IDLE_SLEEP_SEC + random.randint(0, 5)
-                logger.info(f"[{WORKER_NAME}] No work. Sleeping {sleep_s}s.")
-                await asyncio.sleep(sleep_s)
+                logger.info(f"[{WORKER_NAME}] No work. Waiting up to {sleep_s}s for new rows.")
+                await wait_for_work(sleep_s, watcher, calendar_repository)
                 continue
 
             logger.info(f"[{WORKER_NAME}] Found {pending} pending rows. Draining...")
+            tick_started = time.perf_counter()
             try:
-                processed = await service.drain_queue_tick(
-                    is_simple=IS_SIMPLE,
-                    batch_size=BATCH_SIZE,
-                    max_batches_this_tick=MAX_BATCHES_PER_TICK,
-                    inter_batch_sleep_ms=INTER_BATCH_SLEEP_MS,
-                    max_errors_per_tick=MAX_ERRORS_PER_TICK
-                )
+                processed = 0
+                for shard in list(owned):
+                    try:
+                        processed += await service.drain_queue_tick(
+                            is_simple=IS_SIMPLE,
+                            batch_size=BATCH_SIZE,
+                            max_batches_this_tick=MAX_BATCHES_PER_TICK,
+                            inter_batch_sleep_ms=INTER_BATCH_SLEEP_MS,
+                            max_errors_per_tick=MAX_ERRORS_PER_TICK,
+                            max_concurrent_patches=PATCH_CONCURRENCY,
+                            lease_ttl_sec=LEASE_TTL_SEC,
+                            shard=(shard, SHARD_COUNT),
+                            fence=shards.fence(shard),
+                            before_batch=partial(shards.renew, shard)
+                        )
+                    except LeaseLostError as e:
+                        logger.warning(f"[{WORKER_NAME}] {e} Dropping shard {shard}.")
+                        WORKER_TICKS.inc(outcome="lease_lost")
+                        shards.forget(shard)
                 logger.info(f"[{WORKER_NAME}] Processed {processed} row(s) in this tick.")
+                WORKER_TICKS.inc(outcome="processed" if processed else "empty")
+                WORKER_TICK_SECONDS.observe(time.perf_counter() - tick_started)
                 consecutive_tick_failures = 0
 
+                if processed == 0:
+                    # Pending rows belong to other shards (or are all in flight).
+                    await wait_for_work(IDLE_SLEEP_SEC + random.randint(0, 5), watcher, calendar_repository)
+
             except MaxBatchErrorsExceeded as e:
+                WORKER_TICKS.inc(outcome="max_errors")
+                WORKER_TICK_SECONDS.observe(time.perf_counter() - tick_started)
                 consecutive_tick_failures += 1
                 logger.error(
                     f"[{WORKER_NAME}] Tick failed due to too many errors "
@@ -82,6 +184,8 @@ async def run_worker():
                 await asyncio.sleep(5.0)  # small backoff between failed ticks
 
             except Exception as e:
+                WORKER_TICKS.inc(outcome="error")
+                WORKER_TICK_SECONDS.observe(time.perf_counter() - tick_started)
                 consecutive_tick_failures += 1
                 logger.exception(
                     f"[{WORKER_NAME}] Unexpected error in tick "
@@ -92,12 +196,17 @@ async def run_worker():
                     break
                 await asyncio.sleep(5.0)
 
-            # Short pause between ticks to avoid hammering the API
-            await asyncio.sleep(1.0 + random.random())
-
     finally:
-        await process_lock_repository.release_worker_lock(WORKER_NAME)
-        logger.info(f"[{WORKER_NAME}] Stopped and lock released.")
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+        if metrics_server is not None:
+            metrics_server.close()
+        await shards.release_all()
+        await watcher.close()
+        await get_alert_dispatcher().stop()
+        await get_http_client_pool().aclose()
+        await pool.close()
+        logger.info(f"[{WORKER_NAME}] Stopped and shard leases released.")
 
 if __name__ == "__main__":
     asyncio.run(run_worker())